@@ -0,0 +1,698 @@
+"""
+邻接索引模块 (进程内只读图模型)
+把图的拓扑结构以 CSR (Compressed Sparse Row) 数组保存在内存中，路径 / 邻居查询不再访问数据库:
+  offsets[i] .. offsets[i+1] 为节点下标 i 的邻接边在 targets / edge_types / edge_out 中的区间
+每条关系按两个方向各存一次 (路径查询不区分方向)，edge_out 标记该条目是否为关系的原始方向。
+安装了 NumPy 时使用 int32 数组并用 argsort 构建，否则使用标准库 array。
+
+本进程的修改通过 mutation hooks (node_created 等) 直接写入增量 (overlay)；
+其他进程的修改通过图版本号发现 (最多每 ADJACENCY_REFRESH_SECONDS 秒检查一次)，随后整体重建
+"""
+import csv
+import heapq
+import threading
+import time
+from array import array
+from config import Config
+from checkpoint import open_checkpoint
+from storage import store
+from loader import parse_entity_row, parse_relation_row
+
+try:
+    import numpy
+except ImportError:  # NumPy 为可选依赖
+    numpy = None
+
+
+def build_csr(node_count, sources, targets, types):
+    """
+    由关系列表 (端点为节点下标) 构建无向 CSR
+    返回 (offsets, targets, edge_types, edge_out)
+    """
+    m = len(sources)
+    if numpy is not None:
+        heads = numpy.concatenate([numpy.asarray(sources, dtype=numpy.int32),
+                                   numpy.asarray(targets, dtype=numpy.int32)])
+        tails = numpy.concatenate([numpy.asarray(targets, dtype=numpy.int32),
+                                   numpy.asarray(sources, dtype=numpy.int32)])
+        kinds = numpy.asarray(types, dtype=numpy.int32)
+        order = numpy.argsort(heads, kind='stable')
+        offsets = numpy.zeros(node_count + 1, dtype=numpy.int32)
+        numpy.cumsum(numpy.bincount(heads, minlength=node_count), out=offsets[1:])
+        # 前 m 个条目来自 source -> target 方向
+        return offsets, tails[order], numpy.concatenate([kinds, kinds])[order], order < m
+
+    # 计数排序
+    counts = [0] * (node_count + 1)
+    for s in sources:
+        counts[s + 1] += 1
+    for t in targets:
+        counts[t + 1] += 1
+    for i in range(node_count):
+        counts[i + 1] += counts[i]
+    fill = counts[:-1]
+    out_targets = array('i', bytes(4 * 2 * m))
+    out_types = array('i', bytes(4 * 2 * m))
+    out_flags = array('b', bytes(2 * m))
+    for s, t, kind in zip(sources, targets, types):
+        for head, tail, flag in ((s, t, 1), (t, s, 0)):
+            pos = fill[head]
+            out_targets[pos] = tail
+            out_types[pos] = kind
+            out_flags[pos] = flag
+            fill[head] = pos + 1
+    return array('i', counts), out_targets, out_types, out_flags
+
+
+class Snapshot:
+    """
+    一次构建的图拓扑
+    ids[i] 为下标 i 的节点 id，names[i] 为名称；关系类型以下标保存在 edge_types 中
+    """
+
+    def __init__(self, version, nodes, relations):
+        self.version = version
+        self.ids = []
+        self.names = []
+        self.index_of = {}
+        self.name_index = {}  # 小写名称 -> 节点下标集合
+        for node_id, name in nodes:
+            if node_id not in self.index_of:
+                self.add_node(node_id, name)
+
+        self.type_names = []
+        self.type_index = {}
+        sources, targets, types = [], [], []
+        for source_id, target_id, rel_type in relations:
+            s = self.index_of.get(source_id)
+            t = self.index_of.get(target_id)
+            if s is None or t is None:
+                continue
+            if rel_type not in self.type_index:
+                self.type_index[rel_type] = len(self.type_names)
+                self.type_names.append(rel_type)
+            sources.append(s)
+            targets.append(t)
+            types.append(self.type_index[rel_type])
+        self.base_count = len(self.ids)
+        self.relationship_count = len(sources)
+        self.offsets, self.targets, self.edge_types, self.edge_out = build_csr(
+            self.base_count, sources, targets, types)
+
+    def add_node(self, node_id, name):
+        i = len(self.ids)
+        self.index_of[node_id] = i
+        self.ids.append(node_id)
+        self.names.append(name)
+        self._index_name(i, name)
+        return i
+
+    def rename_node(self, i, name):
+        self._unindex_name(i)
+        self.names[i] = name
+        self._index_name(i, name)
+
+    def remove_node(self, i):
+        self._unindex_name(i)
+        del self.index_of[self.ids[i]]
+
+    def _index_name(self, i, name):
+        if name is not None:
+            self.name_index.setdefault(str(name).lower(), set()).add(i)
+
+    def _unindex_name(self, i):
+        name = self.names[i]
+        if name is not None:
+            matches = self.name_index.get(str(name).lower())
+            if matches is not None:
+                matches.discard(i)
+                if not matches:
+                    del self.name_index[str(name).lower()]
+
+
+class AdjacencyIndex:
+    """
+    线程安全的邻接索引
+    查询前调用 ensure_fresh()；修改接口提交成功后调用对应的 hook 并传入新的图版本号
+    """
+
+    def __init__(self, refresh_seconds=None, max_overlay=None):
+        self.refresh_seconds = Config.ADJACENCY_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self.max_overlay = max_overlay or Config.ADJACENCY_MAX_OVERLAY
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._snapshot = None
+        self._files = None
+        self._checked = 0.0
+        # 每次 invalidate / 无法增量更新时加一，重建期间发生变化则重建结果仍视为过期
+        self._generation = 0
+        self._latest = 0  # hooks 收到的最大版本号
+        self.version = None
+        self.stale = True
+        self._reset_overlay()
+
+    def _reset_overlay(self):
+        self._added = {}            # 下标 -> [(邻居下标, 类型下标, 是否原始方向)]
+        self._removed_edges = set()  # (起点下标, 终点下标, 类型下标)
+        self._removed_nodes = set()
+        self._overlay_size = 0
+        self._weights = {}  # 关系属性名 -> (图版本号, 权重表)
+
+    # ---------- 加载 ----------
+
+    def use_files(self, entity_path, relation_path, version):
+        """
+        记录与图版本 version 内容一致的 CSV 文件 (/api/init、/api/import 之后调用)
+        下次查询时直接从文件重建，不必从数据库读取全图
+        """
+        with self._lock:
+            self._files = (entity_path, relation_path, version)
+            self._mark_stale()
+
+    def invalidate(self):
+        """标记索引过期 (无法增量更新的修改之后调用，例如批量修改)"""
+        with self._lock:
+            self._mark_stale()
+
+    def _mark_stale(self):
+        self.stale = True
+        self._generation += 1
+
+    def ensure_fresh(self, version=None):
+        """
+        保证索引与存储一致: 过期或图版本号变化时重建 (版本号最多每 refresh_seconds 秒读取一次)
+        version 为调用方刚读取的图版本号，与索引版本不一致时立即检查，不受检查间隔限制
+        """
+        with self._lock:
+            if not self.stale and (self.version == version if version is not None
+                                   else time.monotonic() - self._checked < self.refresh_seconds):
+                return
+        with self._build_lock:
+            version = store.version()
+            with self._lock:
+                self._checked = time.monotonic()
+                if not self.stale and version == self.version:
+                    return
+                files = self._files
+                generation = self._generation
+            snapshot = None
+            if files and files[2] == version:
+                try:
+                    snapshot = self._read_files(files[0], files[1], version)
+                except FileNotFoundError:
+                    # 检查点文件已被之后的保存或合并替换
+                    pass
+            if snapshot is None:
+                snapshot = Snapshot(*store.topology())
+            with self._lock:
+                self._snapshot = snapshot
+                self.version = snapshot.version
+                self._reset_overlay()
+                # 重建期间到达的修改无法应用到新快照上，下次查询再重建一次
+                self.stale = self._generation != generation or self._latest > snapshot.version
+                if not self.stale:
+                    self._files = None
+
+    @staticmethod
+    def _read_files(entity_path, relation_path, version):
+        with open_checkpoint(entity_path) as f:
+            nodes = []
+            for row in csv.DictReader(f):
+                _, properties = parse_entity_row(row)
+                nodes.append((properties['id'], properties['name']))
+        with open_checkpoint(relation_path) as f:
+            relations = []
+            for row in csv.DictReader(f):
+                rel_type, item = parse_relation_row(row)
+                relations.append((item['source_id'], item['target_id'], rel_type))
+        return Snapshot(version, nodes, relations)
+
+    # ---------- mutation hooks ----------
+
+    def _advance(self, version):
+        """新版本号紧接当前版本时可以增量更新，否则 (中间有其他修改) 标记过期"""
+        self._latest = max(self._latest, version or 0)
+        if self.stale or self._snapshot is None or version is None or version != self.version + 1:
+            self._mark_stale()
+            return False
+        self.version = version
+        self._overlay_size += 1
+        if self._overlay_size > self.max_overlay:
+            self._mark_stale()
+            return False
+        return True
+
+    def touched(self, version):
+        """不影响拓扑和名称的修改 (标签、属性)"""
+        with self._lock:
+            self._advance(version)
+
+    def node_created(self, node_id, name, version):
+        with self._lock:
+            if self._advance(version):
+                self._snapshot.add_node(node_id, name)
+
+    def node_renamed(self, node_id, name, version):
+        with self._lock:
+            if self._advance(version):
+                i = self._snapshot.index_of.get(node_id)
+                if i is not None:
+                    self._snapshot.rename_node(i, name)
+
+    def node_deleted(self, node_id, version):
+        with self._lock:
+            if self._advance(version):
+                i = self._snapshot.index_of.get(node_id)
+                if i is not None:
+                    self._snapshot.remove_node(i)
+                    self._removed_nodes.add(i)
+                    self._added.pop(i, None)
+
+    def relationship_created(self, source_id, target_id, rel_type, version):
+        with self._lock:
+            if not self._advance(version):
+                return
+            snapshot = self._snapshot
+            s = snapshot.index_of.get(source_id)
+            t = snapshot.index_of.get(target_id)
+            if s is None or t is None:
+                return
+            if rel_type not in snapshot.type_index:
+                snapshot.type_index[rel_type] = len(snapshot.type_names)
+                snapshot.type_names.append(rel_type)
+            kind = snapshot.type_index[rel_type]
+            if (s, t, kind) in self._removed_edges:
+                self._removed_edges.discard((s, t, kind))
+                return
+            if any(v == t and k == kind and out for v, k, out in self._edges(s)):
+                return  # MERGE 命中已有关系
+            self._added.setdefault(s, []).append((t, kind, True))
+            self._added.setdefault(t, []).append((s, kind, False))
+
+    def relationship_deleted(self, source_id, target_id, rel_type, version):
+        """删除 source -> target 的关系，rel_type 为 None 时删除两点间所有类型"""
+        with self._lock:
+            if not self._advance(version):
+                return
+            snapshot = self._snapshot
+            s = snapshot.index_of.get(source_id)
+            t = snapshot.index_of.get(target_id)
+            if s is None or t is None:
+                return
+            kinds = {k for v, k, out in self._edges(s) if v == t and out}
+            if rel_type is not None:
+                kinds &= {snapshot.type_index.get(rel_type)}
+            for kind in kinds:
+                self._removed_edges.add((s, t, kind))
+                for i, j, out in ((s, t, True), (t, s, False)):
+                    if (j, kind, out) in self._added.get(i, ()):
+                        self._added[i].remove((j, kind, out))
+
+    # ---------- 查询 ----------
+
+    def _edges(self, i):
+        """节点下标 i 的所有邻接条目 [(邻居下标, 类型下标, 是否原始方向)]"""
+        snapshot = self._snapshot
+        edges = []
+        if i < snapshot.base_count:
+            a, b = int(snapshot.offsets[i]), int(snapshot.offsets[i + 1])
+            removed_nodes = self._removed_nodes
+            removed_edges = self._removed_edges
+            for v, kind, out in zip(snapshot.targets[a:b].tolist(), snapshot.edge_types[a:b].tolist(),
+                                    snapshot.edge_out[a:b].tolist()):
+                if v in removed_nodes:
+                    continue
+                if removed_edges and ((i, v, kind) if out else (v, i, kind)) in removed_edges:
+                    continue
+                edges.append((v, kind, bool(out)))
+        edges.extend(edge for edge in self._added.get(i, ()) if edge[0] not in self._removed_nodes)
+        return edges
+
+    def resolve(self, value):
+        """
+        把节点 id 或名称解析为节点下标集合
+        整数按 id 查找，否则按名称 (不区分大小写) 匹配所有同名节点
+        """
+        snapshot = self._snapshot
+        try:
+            i = snapshot.index_of.get(int(value))
+            return {i} if i is not None else set()
+        except ValueError:
+            return set(snapshot.name_index.get(value.lower(), ()))
+
+    def find_paths(self, start, end, k=1, max_depth=None, types=None, weights=None):
+        """
+        路径查询 (不区分关系方向)
+        start / end:  节点 id 或名称
+        k:            返回前 k 条无环最短路径 (Yen 算法)
+        max_depth:    路径最多包含的关系数，None 表示不限
+        types:        只经过这些类型的关系，None 表示不限
+        weights:      edge_weights() 返回的权重表，提供时按权重和求最短路径 (Dijkstra)，否则按关系数
+        返回 [(代价, 节点 id 列表, 关系列表)]，按代价从小到大排列；关系为 {"source", "target", "type"}，
+        方向为关系的原始方向
+        """
+        with self._lock:
+            sources = self.resolve(start)
+            targets = self.resolve(end)
+            if not sources or not targets:
+                return []
+            search = _PathSearch(self, targets, self._allowed_types(types), max_depth, weights)
+            return [(cost, *self._path_result(path, steps)) for cost, path, steps in search.top_k(sources, k)]
+
+    def _allowed_types(self, types):
+        """关系类型名列表 -> 类型下标集合，None 表示不限"""
+        if types is None:
+            return None
+        type_index = self._snapshot.type_index
+        return {type_index[name] for name in types if name in type_index}
+
+    def _path_result(self, path, steps):
+        ids = self._snapshot.ids
+        types = self._snapshot.type_names
+        relationships = []
+        for u, v, kind, out in steps:
+            source, target = (u, v) if out else (v, u)
+            relationships.append({"source": ids[source], "target": ids[target], "type": types[kind]})
+        return [ids[i] for i in path], relationships
+
+    def edge_weights(self, prop):
+        """
+        读取关系属性 prop 作为边权 (按图版本缓存)，返回 {(起点下标, 终点下标, 类型下标): 权重}
+        属性不存在或不是数值的关系权重按 1 计算，负权重的关系不可通行
+        """
+        with self._lock:
+            cached = self._weights.get(prop)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            version = self.version
+        rows = store.edge_weights(prop)
+        with self._lock:
+            snapshot = self._snapshot
+            weights = {}
+            for source_id, target_id, rel_type, weight in rows:
+                if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+                    continue
+                s = snapshot.index_of.get(source_id)
+                t = snapshot.index_of.get(target_id)
+                kind = snapshot.type_index.get(rel_type)
+                if s is not None and t is not None and kind is not None:
+                    weights[(s, t, kind)] = float(weight)
+            self._weights[prop] = (version, weights)
+            return weights
+
+    def neighbors(self, node_id):
+        """
+        节点的直接邻居 [(邻居 id, 关系类型, 方向)]，方向为 'out' 或 'in'
+        节点不存在时返回 None
+        """
+        with self._lock:
+            i = self._snapshot.index_of.get(node_id)
+            if i is None:
+                return None
+            ids = self._snapshot.ids
+            types = self._snapshot.type_names
+            return [(ids[v], types[kind], 'out' if out else 'in') for v, kind, out in self._edges(i)]
+
+    def ego_network(self, node_id, depth, types=None, fanout=None, max_nodes=None):
+        """
+        节点的 k 跳邻域 (不区分关系方向)
+        depth:     展开的跳数
+        types:     只经过这些类型的关系，None 表示不限
+        fanout:    第 2 跳起每个节点最多引入的新邻居数 (取 id 最小的)，None 表示不限；
+                   中心节点的直接邻居全部保留，由调用方分页返回
+        max_nodes: 邻域最多包含的节点数 (含中心节点)，达到后停止展开
+        返回 (成员 [(跳数, 节点 id)] 按跳数、id 升序, 成员之间的关系 [{"source", "target", "type"}], 是否被截断)，
+        节点不存在时返回 None
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            center = snapshot.index_of.get(node_id)
+            if center is None:
+                return None
+            allowed = self._allowed_types(types)
+            ids = snapshot.ids
+            hops = {center: 0}
+            frontier = [center]
+            truncated = False
+            for hop in range(1, depth + 1):
+                next_frontier = []
+                # 按 id 顺序展开，fanout / max_nodes 截断的结果与请求次序无关，分页时保持一致
+                for u in frontier:
+                    new = sorted({v for v, kind, _ in self._edges(u)
+                                  if v not in hops and (allowed is None or kind in allowed)}, key=ids.__getitem__)
+                    if hop > 1 and fanout is not None and len(new) > fanout:
+                        new = new[:fanout]
+                        truncated = True
+                    if max_nodes is not None and len(hops) + len(new) > max_nodes:
+                        new = new[:max(max_nodes - len(hops), 0)]
+                        truncated = True
+                    for v in new:
+                        hops[v] = hop
+                    next_frontier.extend(new)
+                frontier = sorted(next_frontier, key=ids.__getitem__)
+                if not frontier:
+                    break
+
+            types = snapshot.type_names
+            relationships = [{"source": ids[u], "target": ids[v], "type": types[kind]}
+                             for u in hops for v, kind, out in self._edges(u)
+                             if out and v in hops and (allowed is None or kind in allowed)]
+            members = sorted((hop, ids[i]) for i, hop in hops.items())
+            return members, relationships, truncated
+
+    def topology(self):
+        """
+        当前拓扑的只读副本，供整图算法 (PageRank、社区划分等) 使用
+        没有增量修改时直接共享快照的数组，否则把存活节点重新编号并按 _edges 重建 CSR
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if not (self._added or self._removed_edges or self._removed_nodes) \
+                    and len(snapshot.ids) == snapshot.base_count:
+                return Topology(self.version, list(snapshot.ids), list(snapshot.names), list(snapshot.type_names),
+                                snapshot.offsets, snapshot.targets, snapshot.edge_types, snapshot.edge_out)
+
+            live = sorted(snapshot.index_of.values())
+            position = {i: p for p, i in enumerate(live)}
+            sources, targets, types = [], [], []
+            for i in live:
+                for v, kind, out in self._edges(i):
+                    if out:
+                        sources.append(position[i])
+                        targets.append(position[v])
+                        types.append(kind)
+            return Topology(self.version, [snapshot.ids[i] for i in live], [snapshot.names[i] for i in live],
+                            list(snapshot.type_names), *build_csr(len(live), sources, targets, types))
+
+    def stats(self):
+        """索引规模与状态"""
+        with self._lock:
+            snapshot = self._snapshot
+            return {
+                "version": self.version,
+                "stale": self.stale,
+                "nodes": len(snapshot.index_of) if snapshot else 0,
+                "relationships": snapshot.relationship_count if snapshot else 0,
+                "overlay": self._overlay_size,
+                "backend": "numpy" if numpy is not None else "array",
+            }
+
+
+class Topology:
+    """
+    某一图版本的 CSR 拓扑 (AdjacencyIndex.topology() 的返回值)
+    节点下标连续 (0 .. len(ids) - 1)，数组含义与 build_csr 相同
+    """
+
+    def __init__(self, version, ids, names, type_names, offsets, targets, edge_types, edge_out):
+        self.version = version
+        self.ids = ids
+        self.names = names
+        self.type_names = type_names
+        self.offsets = offsets
+        self.targets = targets
+        self.edge_types = edge_types
+        self.edge_out = edge_out
+
+    def __len__(self):
+        return len(self.ids)
+
+    def relationships(self):
+        """遍历所有关系 (每条一次，原始方向)，产生 (起点下标, 终点下标, 类型下标)"""
+        offsets = self.offsets.tolist()
+        targets, kinds, flags = self.targets.tolist(), self.edge_types.tolist(), self.edge_out.tolist()
+        for u in range(len(self.ids)):
+            for j in range(offsets[u], offsets[u + 1]):
+                if flags[j]:
+                    yield u, targets[j], kinds[j]
+
+
+class _PathSearch:
+    """
+    一次路径查询的搜索状态 (在 AdjacencyIndex 的锁内使用)
+    路径以 (节点下标列表, [(u, v, 类型下标, 是否原始方向)]) 表示
+    """
+
+    def __init__(self, index, targets, allowed, max_depth, weights):
+        self.index = index
+        self.targets = targets
+        self.allowed = allowed
+        self.max_depth = max_depth
+        self.weights = weights
+
+    def _steps(self, u, banned_nodes, banned_edges):
+        """从 u 出发可以经过的边 [(v, 类型下标, 是否原始方向, 权重)]"""
+        for v, kind, out in self.index._edges(u):
+            if self.allowed is not None and kind not in self.allowed:
+                continue
+            if v in banned_nodes or (banned_edges and (u, v, kind, out) in banned_edges):
+                continue
+            if self.weights is None:
+                yield v, kind, out, 1
+                continue
+            weight = self.weights.get((u, v, kind) if out else (v, u, kind), 1.0)
+            if weight >= 0:
+                yield v, kind, out, weight
+
+    def cost(self, steps):
+        if self.weights is None:
+            return len(steps)
+        return sum(self.weights.get((u, v, kind) if out else (v, u, kind), 1.0) for u, v, kind, out in steps)
+
+    def shortest(self, sources, depth_limit, banned_nodes=frozenset(), banned_edges=frozenset()):
+        """返回 (路径节点, 路径边) 或 None"""
+        if depth_limit is not None and depth_limit < 0:
+            return None
+        common = (sources & self.targets) - banned_nodes
+        if common:
+            return [min(common)], []
+        if depth_limit == 0:
+            return None
+        if self.weights is None:
+            return self._bfs(sources, depth_limit, banned_nodes, banned_edges)
+        return self._dijkstra(sources, depth_limit, banned_nodes, banned_edges)
+
+    def _bfs(self, sources, depth_limit, banned_nodes, banned_edges):
+        """双向 BFS；depth_limit 限制两侧深度之和"""
+        targets = self.targets - banned_nodes
+        # parents[side][节点] = (上一个节点, 类型下标, 是否原始方向)，起点为 None
+        parents = ({i: None for i in sources}, {i: None for i in targets})
+        frontiers = [list(sources), list(targets)]
+        depth = 0
+        while frontiers[0] and frontiers[1] and (depth_limit is None or depth < depth_limit):
+            # 每次扩展较小的一侧；两侧第一次相遇即为最短路径
+            # (另一侧已展开的节点若与本侧相邻，早在之前的扩展中就已相遇)
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            seen, other = parents[side], parents[1 - side]
+            next_frontier = []
+            depth += 1
+            for u in frontiers[side]:
+                for v, kind, out, _ in self._steps(u, banned_nodes, ()):
+                    # 被禁止的边按前进方向 (起点 -> 终点) 记录，后向一侧需要反过来检查
+                    edge = (u, v, kind, out) if side == 0 else (v, u, kind, not out)
+                    if v in seen or (banned_edges and edge in banned_edges):
+                        continue
+                    seen[v] = (u, kind, out)
+                    if v in other:
+                        return self._join(parents, v)
+                    next_frontier.append(v)
+            frontiers[side] = next_frontier
+        return None
+
+    @staticmethod
+    def _join(parents, meet):
+        """把两侧的父指针拼接为完整路径"""
+        steps = []
+        node = meet
+        while parents[0][node] is not None:
+            prev, kind, out = parents[0][node]
+            steps.append((prev, node, kind, out))
+            node = prev
+        steps.reverse()
+        path = [node] + [step[1] for step in steps]
+        node = meet
+        while parents[1][node] is not None:
+            nxt, kind, out = parents[1][node]
+            # 后向一侧记录的方向是从 nxt 看出去的，沿路径前进时方向相反
+            steps.append((node, nxt, kind, not out))
+            path.append(nxt)
+            node = nxt
+        return path, steps
+
+    def _dijkstra(self, sources, depth_limit, banned_nodes, banned_edges):
+        """
+        带跳数上限的 Dijkstra
+        状态为 (节点, 跳数)；同一节点已有跳数不多于当前的标签时 (代价必然不大于当前) 直接跳过
+        """
+        targets = self.targets
+        heap = [(0.0, 0, i) for i in sources]
+        heapq.heapify(heap)
+        best = {(i, 0): 0.0 for i in sources}
+        parents = {(i, 0): None for i in sources}
+        settled = {}  # 节点 -> 已确定标签的最小跳数
+        while heap:
+            cost, hops, u = heapq.heappop(heap)
+            if cost > best[(u, hops)] or (u in settled and settled[u] <= hops):
+                continue
+            settled[u] = hops
+            if u in targets:
+                steps = []
+                state = (u, hops)
+                while parents[state] is not None:
+                    prev_state, kind, out = parents[state]
+                    steps.append((prev_state[0], state[0], kind, out))
+                    state = prev_state
+                steps.reverse()
+                return [state[0]] + [step[1] for step in steps], steps
+            if depth_limit is not None and hops >= depth_limit:
+                continue
+            for v, kind, out, weight in self._steps(u, banned_nodes, banned_edges):
+                if v in settled and settled[v] <= hops + 1:
+                    continue
+                state = (v, hops + 1)
+                if cost + weight < best.get(state, float('inf')):
+                    best[state] = cost + weight
+                    parents[state] = ((u, hops), kind, out)
+                    heapq.heappush(heap, (cost + weight, hops + 1, v))
+        return None
+
+    def top_k(self, sources, k):
+        """
+        Yen 算法: 依次在上一条路径的每个偏离点 (spur node) 上，禁止已有路径的下一条边和根路径上的节点，
+        求偏离点到终点的最短路径，与根路径拼接成候选，从候选中取代价最小者
+        """
+        first = self.shortest(sources, self.max_depth)
+        if first is None:
+            return []
+        found = [(self.cost(first[1]), *first)]
+        # 同一对节点之间可能有多条关系，路径以经过的关系 (而不是节点序列) 区分
+        seen = {tuple(first[1])}
+        candidates = []
+        counter = 0  # 代价相同时保持插入顺序，避免比较列表
+        while len(found) < k:
+            _, prev_path, prev_steps = found[-1]
+            for i in range(len(prev_path) - 1):
+                spur = prev_path[i]
+                root_path, root_steps = prev_path[:i + 1], prev_steps[:i]
+                banned_edges = {step for _, path, steps in found if steps[:i] == root_steps
+                                for step in steps[i:i + 1]}
+                depth_limit = None if self.max_depth is None else self.max_depth - i
+                spur_result = self.shortest({spur}, depth_limit, frozenset(root_path[:-1]), banned_edges)
+                if spur_result is None:
+                    continue
+                path = root_path[:-1] + spur_result[0]
+                steps = root_steps + spur_result[1]
+                if tuple(steps) in seen:
+                    continue
+                seen.add(tuple(steps))
+                counter += 1
+                heapq.heappush(candidates, (self.cost(steps), counter, path, steps))
+            if not candidates:
+                break
+            cost, _, path, steps = heapq.heappop(candidates)
+            found.append((cost, path, steps))
+        return found
+
+
+# 全局邻接索引
+graph_index = AdjacencyIndex()
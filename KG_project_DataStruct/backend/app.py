@@ -1,6 +1,8 @@
 """
 Flask 应用入口
 """
+# 导入日志模块
+import logging
 # 导入 Flask 框架
 from flask import Flask
 # 导入 CORS 扩展，用于解决跨域问题
@@ -9,6 +11,12 @@ from flask_cors import CORS
 from routes import api_bp
 # 导入配置类
 from config import Config
+# 导入响应层 (orjson 编码与响应压缩)
+from response_layer import Compressor, OrjsonProvider
+# 导入监控指标 (请求计时中间件)
+import metrics
+# 导入存储后端 (Neo4j 或 SQLite，由 Config.STORAGE_BACKEND 选择)
+from storage import store
 
 # 创建 Flask 应用实例
 app = Flask(__name__)
@@ -16,10 +24,24 @@ app = Flask(__name__)
 # 启用 CORS，允许所有来源访问 API (生产环境应限制来源)
 CORS(app)
 
+# 使用 orjson 编码 JSON (未安装时与默认编码相同)，并按 Accept-Encoding 压缩响应
+app.json = OrjsonProvider(app)
+Compressor(app)
+
+# 记录每个路由的请求耗时与状态码，由 /api/metrics 输出
+metrics.init_app(app)
+
 # 注册 API Blueprint
 # url_prefix='/api' 表示所有路由都以 /api 开头，例如 /api/graph
 app.register_blueprint(api_bp, url_prefix='/api')
 
+# 启动时初始化存储 Schema (Neo4j: 基础标签、id 唯一约束、name 索引；SQLite: 建表与全文索引)
+# 数据库暂时不可用时只记录警告日志，不阻止应用启动；/api/init 会再次执行
+try:
+    store.bootstrap()
+except Exception as e:
+    logging.getLogger(__name__).warning("Schema bootstrap skipped: %s", e)
+
 if __name__ == '__main__':
     # 启动 Flask 开发服务器
     # debug=True: 代码修改后自动重启
@@ -0,0 +1,235 @@
+"""
+ASGI 入口 (异步服务模式)
+运行: uvicorn asgi:app --port 5000   (需要安装 a2wsgi 与 uvicorn)
+
+读密集且耗时的 GET /api/graph 与 GET /api/search 直接在事件循环上使用 Neo4j 异步驱动处理，
+多个请求的数据库 I/O 在同一个线程中并发等待，不再各占一个工作线程；
+它们与 Flask 路由共用同一份参数解析、ETag / 缓存逻辑和查询 (routes.graph.graph_steps 等步骤函数，见 steps.py)，
+只有执行数据库读取的方式不同 (AsyncGraphReader)；
+其余接口仍由 app.py 中的 Flask 应用 (同一个 Blueprint) 处理，经 a2wsgi 在线程池中运行
+(使用 SQLite 存储 (STORAGE_BACKEND=sqlite) 时没有异步驱动，这两个接口也由 Flask 处理)
+(/api/path、/api/node/<id>/neighbors 与 /api/graph?view=... 的摘要在进程内邻接索引上计算，
+不涉及耗时的数据库等待，因此也由 Flask 处理)
+"""
+import time
+from a2wsgi import WSGIMiddleware
+from flask_cors.core import get_cors_headers, get_cors_options, serialize_options
+from werkzeug.datastructures import Headers
+from werkzeug.sansio.request import Request
+from werkzeug.sansio.response import Response
+from app import app as flask_app
+from config import Config
+from db import async_db, is_unavailable
+from graph_cache import version_steps
+from columnar import negotiate
+from metrics import record_error, record_request_metrics
+from response_layer import StreamCompressor, compress, response_encoding
+from routes.graph import graph_request, graph_steps, ndjson_steps, search_body, search_params
+from search import search_steps
+from steps import run_async, run_queries_async, stream_async
+from storage.neo4j_store import full_graph_steps, graph_page_steps, scored_nodes
+
+
+# 与 app.py 中 CORS(app) 相同的 CORS 选项 (默认选项叠加 app.config 中的 CORS_* 配置)
+CORS_OPTIONS = serialize_options(get_cors_options(flask_app))
+
+
+class AsyncGraphReader:
+    """
+    读取步骤的异步执行器 (见 steps.py): 与 GraphStore 同名的读取方法，
+    在异步驱动上执行与 storage.neo4j_store.Neo4jStore 相同的查询步骤
+    """
+
+    async def version(self):
+        return await async_db.read_steps(version_steps)
+
+    async def graph_page(self, after, limit):
+        return await async_db.read_steps(graph_page_steps, after, limit)
+
+    async def full_graph(self):
+        return await async_db.read_steps(full_graph_steps)
+
+    async def search(self, term, limit=10, offset=0):
+        # 与同步实现相同，在只读会话而不是托管事务中执行 (全文索引不可用时在同一会话中回退查询)
+        async with async_db.get_session() as session:
+            return scored_nodes(await run_queries_async(session, search_steps(term, limit, offset)))
+
+    async def perform(self, request):
+        name, args = request
+        return await getattr(self, name)(*args)
+
+
+reader = AsyncGraphReader()
+
+
+async def compress_stream(chunks, encoding):
+    """逐块压缩异步生成器输出的响应体"""
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def json_response(payload, status=200):
+    """与 Flask jsonify 相同的序列化方式"""
+    response = Response(status=status, mimetype='application/json')
+    return response, flask_app.json.response(payload).get_data()
+
+
+def error_response(e):
+    """与 routes.api_error 相同: 数据库暂时不可用返回 503 并带 Retry-After，其他异常返回 500 并把异常堆栈写入日志"""
+    if is_unavailable(e):
+        response, body = json_response({"error": str(e)}, 503)
+        response.headers['Retry-After'] = str(Config.RETRY_AFTER)
+        return response, body
+    flask_app.logger.error("Unhandled error: %s", e, exc_info=e)
+    return json_response({"error": str(e)}, 500)
+
+
+async def get_graph(request):
+    """
+    GET /api/graph，与 routes.graph.get_graph 共用参数解析、ETag 与缓存逻辑 (routes.graph.graph_steps)
+    带 view 参数的摘要请求 (在进程内邻接索引上计算) 与非 Neo4j 存储后端返回 None，交给 Flask 处理
+    """
+    if 'view' in request.args or Config.STORAGE_BACKEND != 'neo4j':
+        return None
+    try:
+        params = graph_request(request.args, request.accept_mimetypes)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    after, limit, _, _, ndjson, mimetype = params
+    with flask_app.app_context():
+        status, etag, body = await run_async(graph_steps(request.args, params, request.if_none_match),
+                                             reader.perform)
+    if status == 304:
+        response, body = Response(status=304), b''
+    elif ndjson:
+        response = Response(mimetype='application/x-ndjson')
+        body = stream_async(ndjson_steps(after, limit), reader.perform)
+    else:
+        response = Response(mimetype=mimetype)
+
+    response.set_etag(etag, weak=True)
+    response.vary.add('Accept')
+    return response, body
+
+
+async def search(request):
+    """GET /api/search，参数与响应与 routes.graph.search_node 相同；非 Neo4j 存储后端交给 Flask 处理"""
+    if Config.STORAGE_BACKEND != 'neo4j':
+        return None
+    try:
+        query, limit, offset = search_params(request.args)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    mimetype = negotiate(request.accept_mimetypes)
+    nodes = await reader.search(query, limit=limit, offset=offset)
+    with flask_app.app_context():
+        body = search_body(nodes, mimetype)
+    response = Response(mimetype=mimetype)
+    response.vary.add('Accept')
+    return response, body
+
+
+class AsyncApp:
+    """
+    ASGI 应用
+    routes 中的 GET 路径由异步处理函数响应 (处理函数返回 None 时改由 Flask 处理)，
+    其他请求 (包括所有写操作) 交给 Flask 应用
+    """
+
+    routes = {
+        '/api/graph': get_graph,
+        '/api/search': search,
+    }
+
+    def __init__(self, wsgi_app, threads=None):
+        self.wsgi = WSGIMiddleware(wsgi_app, workers=threads or Config.ASGI_THREADS)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        handler = self.routes.get(scope['path']) if scope['type'] == 'http' and scope['method'] == 'GET' else None
+        if handler is None:
+            await self.wsgi(scope, receive, send)
+            return
+
+        request = Request(
+            method=scope['method'],
+            scheme=scope.get('scheme', 'http'),
+            server=scope.get('server'),
+            root_path=scope.get('root_path', ''),
+            path=scope['path'],
+            query_string=scope['query_string'],
+            headers=Headers([(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope['headers']]),
+            remote_addr=scope['client'][0] if scope.get('client') else None,
+        )
+        start = time.perf_counter()
+        try:
+            result = await handler(request)
+        except Exception as e:
+            record_error(e, scope['path'])
+            result = error_response(e)
+        if result is None:
+            await self.wsgi(scope, receive, send)
+            return
+        response, body = result
+        for key, value in get_cors_headers(CORS_OPTIONS, request.headers, request.method).items():
+            response.headers.add(key, value)
+        body = self.compress(request, response, body)
+        try:
+            await self.send(send, response, body)
+        except Exception as e:
+            # 流式响应在发送中途出错 (响应头已发出，无法再返回错误响应)
+            record_error(e, scope['path'])
+            flask_app.logger.error("Streaming response aborted: %s", e, exc_info=e)
+            raise
+        finally:
+            # 与 Flask 中间件 (metrics.init_app) 相同: 响应体发送完毕时记录耗时与状态码
+            record_request_metrics(request.method, scope['path'], response.status_code, start)
+
+    @staticmethod
+    def compress(request, response, body):
+        """按 app.py 中 Compressor 的规则 (response_layer.response_encoding) 压缩响应"""
+        encoding = response_encoding(request, response, len(body) if isinstance(body, bytes) else None)
+        if encoding is None:
+            return body
+        if isinstance(body, bytes):
+            body = compress(body, encoding)
+        else:
+            body = compress_stream(body, encoding)
+        response.headers['Content-Encoding'] = encoding
+        return body
+
+    async def send(self, send, response, body):
+        """发送响应；body 为异步生成器时逐块发送 (流式输出)"""
+        headers = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in response.headers.items()]
+        if isinstance(body, bytes):
+            headers.append((b'content-length', str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        if isinstance(body, bytes):
+            await send({"type": "http.response.body", "body": body})
+            return
+        async for chunk in body:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        # 只在正常结束时发送结束标记；中途出错时异常向上传播，由服务器中断连接，客户端可以发现响应不完整
+        await send({"type": "http.response.body", "body": b''})
+
+    async def lifespan(self, receive, send):
+        """进程退出时关闭异步驱动"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({"type": "lifespan.startup.complete"})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_db.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+app = AsyncApp(flask_app)
@@ -0,0 +1,274 @@
+"""
+批量修改模块
+把 /api/batch 提交的有序操作列表编译为少量按语句分组的 UNWIND 语句，
+并在同一个事务中执行：任何一个操作失败时整体回滚 (all-or-nothing)
+"""
+from config import Config
+from graph_cache import mark_graph_changed
+
+# 支持的操作及其必填字段
+OPERATIONS = {
+    'create_node': ('name',),
+    'update_node': ('id', 'name'),
+    'delete_node': ('id',),
+    'add_label': ('id', 'label'),
+    'remove_label': ('id', 'label'),
+    'set_property': ('id', 'key'),
+    'remove_property': ('id', 'key'),
+    'create_relationship': ('source_id', 'target_id', 'type'),
+    'delete_relationship': ('source_id', 'target_id'),
+    'set_relationship_property': ('source_id', 'target_id', 'type', 'key'),
+    'remove_relationship_property': ('source_id', 'target_id', 'type', 'key'),
+}
+
+# 属性修改类操作共用一条 SET n += row.props 语句 (值为 null 即删除该属性)
+NODE_PROPERTY_OPS = ('update_node', 'set_property', 'remove_property')
+RELATIONSHIP_PROPERTY_OPS = ('set_relationship_property', 'remove_relationship_property')
+
+
+class BatchError(ValueError):
+    """批量操作无法执行，status 为返回给客户端的 HTTP 状态码"""
+
+    def __init__(self, message, index=None, status=400):
+        if index is not None:
+            message = f"Operation {index}: {message}"
+        super().__init__(message)
+        self.status = status
+
+
+def _clean_name(value, what, index):
+    """校验标签 / 关系类型 (只能拼接到 Cypher 中，因此不允许反引号)"""
+    if not isinstance(value, str) or not value.strip():
+        raise BatchError(f"Missing {what}", index)
+    value = value.strip().replace(' ', '_')
+    if '`' in value:
+        raise BatchError(f"Invalid {what}", index)
+    return value
+
+
+def _check_key(key, index, protected=('id',)):
+    if not isinstance(key, str) or not key.isidentifier():
+        raise BatchError("Invalid property key", index)
+    if key in protected:
+        raise BatchError(f"Cannot modify property '{key}'", index)
+    return key
+
+
+def _properties(value, index):
+    """校验属性对象 (可省略，提供时必须是 JSON 对象)，返回副本"""
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise BatchError("Invalid properties", index)
+    return dict(value)
+
+
+class BatchCompiler:
+    """
+    批量操作编译器
+    相邻且语句相同的操作合并为一组，组内的行通过 UNWIND 一次提交；
+    只合并相邻操作，因此执行顺序与提交顺序一致
+    """
+
+    def __init__(self, operations):
+        if not isinstance(operations, list) or not operations:
+            raise BatchError("operations must be a non-empty list")
+        if len(operations) > Config.BATCH_MAX_OPERATIONS:
+            raise BatchError(f"Too many operations (max {Config.BATCH_MAX_OPERATIONS})")
+        self.operations = operations
+        # 新建节点的客户端引用名 -> 序号，后续操作可以用 "$引用名" 代替节点 id
+        self.refs = {}
+        self.create_count = 0
+
+    def compile(self):
+        """
+        校验并编译操作列表
+        返回 [(语句, 行列表, 是否要求每行都命中, 首个操作序号, 动作)]
+        动作为 (操作类别, 标签或关系类型)，供不执行 Cypher 的存储后端 (storage.sqlite_store) 逐行执行；
+        新建节点的行中 id 为占位序号，执行前由 bind_ids 替换为真实 id
+        """
+        groups = []
+        for index, op in enumerate(self.operations):
+            if not isinstance(op, dict) or op.get('op') not in OPERATIONS:
+                raise BatchError("Unknown op", index)
+            for field in OPERATIONS[op['op']]:
+                if op.get(field) in (None, ''):
+                    raise BatchError(f"Missing {field}", index)
+
+            statement, row, strict, action = self._compile_one(index, op)
+            if groups and groups[-1][0] == statement:
+                groups[-1][1].append(row)
+            else:
+                groups.append((statement, [row], strict, index, action))
+        return groups
+
+    def _node_id(self, value, index):
+        """解析节点 id: 整数，或 "$引用名" 指向本批次中先前创建的节点"""
+        if isinstance(value, str) and value.startswith('$'):
+            if value[1:] not in self.refs:
+                raise BatchError(f"Unknown reference '{value}'", index)
+            return {"ref": self.refs[value[1:]]}
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise BatchError("Invalid node id", index)
+
+    def _compile_one(self, index, op):
+        kind = op['op']
+
+        if kind == 'create_node':
+            properties = _properties(op.get('properties'), index)
+            properties['name'] = op['name']
+            slot = self.create_count
+            self.create_count += 1
+            if op.get('ref'):
+                self.refs[str(op['ref'])] = slot
+            label = _clean_name(op['label'], 'label', index) if op.get('label') else None
+            labels = ':KGNode' + (f":`{label}`" if label else '')
+            statement = f"""
+                UNWIND $rows AS row
+                CREATE (n{labels})
+                SET n = row.props
+                RETURN count(n) AS matched
+            """
+            return statement, {"slot": slot, "props": properties}, True, ('create_node', label)
+
+        if kind in ('create_relationship', 'delete_relationship') or kind in RELATIONSHIP_PROPERTY_OPS:
+            row = {
+                "source_id": self._node_id(op['source_id'], index),
+                "target_id": self._node_id(op['target_id'], index),
+            }
+            rel_type = _clean_name(op['type'], 'type', index) if op.get('type') else None
+            pattern = f"-[r:`{rel_type}`]->" if rel_type else "-[r]->"
+
+            if kind == 'create_relationship':
+                row["props"] = _properties(op.get('properties'), index)
+                statement = f"""
+                    UNWIND $rows AS row
+                    MATCH (a:KGNode) WHERE a.id = row.source_id
+                    MATCH (b:KGNode) WHERE b.id = row.target_id
+                    MERGE (a){pattern}(b)
+                    SET r += row.props
+                    RETURN count(r) AS matched
+                """
+                return statement, row, True, ('merge_relationship', rel_type)
+
+            if kind == 'delete_relationship':
+                # 与 DELETE /api/relationship 一致：关系不存在时不报错
+                statement = f"""
+                    UNWIND $rows AS row
+                    MATCH (a:KGNode){pattern}(b:KGNode)
+                    WHERE a.id = row.source_id AND b.id = row.target_id
+                    DELETE r
+                """
+                return statement, row, False, ('delete_relationship', rel_type)
+
+            key = _check_key(op['key'], index)
+            value = op.get('value') if kind == 'set_relationship_property' else None
+            row["props"] = {key: value}
+            statement = f"""
+                UNWIND $rows AS row
+                MATCH (a:KGNode){pattern}(b:KGNode)
+                WHERE a.id = row.source_id AND b.id = row.target_id
+                SET r += row.props
+                RETURN count(DISTINCT row) AS matched
+            """
+            return statement, row, True, ('relationship_properties', rel_type)
+
+        row = {"id": self._node_id(op['id'], index)}
+
+        if kind == 'delete_node':
+            statement = """
+                UNWIND $rows AS row
+                MATCH (n:KGNode) WHERE n.id = row.id
+                DETACH DELETE n
+                RETURN count(n) AS matched
+            """
+            return statement, row, True, ('delete_node', None)
+
+        if kind in ('add_label', 'remove_label'):
+            label = _clean_name(op['label'], 'label', index)
+            if label == 'KGNode':
+                raise BatchError("Cannot change base label", index)
+            clause = 'SET' if kind == 'add_label' else 'REMOVE'
+            statement = f"""
+                UNWIND $rows AS row
+                MATCH (n:KGNode) WHERE n.id = row.id
+                {clause} n:`{label}`
+                RETURN count(n) AS matched
+            """
+            return statement, row, True, (kind, label)
+
+        # NODE_PROPERTY_OPS
+        if kind == 'update_node':
+            row["props"] = {"name": op['name']}
+        elif kind == 'set_property':
+            row["props"] = {_check_key(op['key'], index): op.get('value')}
+        else:
+            row["props"] = {_check_key(op['key'], index, protected=('id', 'name')): None}
+        statement = """
+            UNWIND $rows AS row
+            MATCH (n:KGNode) WHERE n.id = row.id
+            SET n += row.props
+            RETURN count(n) AS matched
+        """
+        return statement, row, True, ('node_properties', None)
+
+
+def bind_ids(groups, new_ids):
+    """把编译结果中的新建节点占位序号替换为分配到的真实 id"""
+    def resolve(value):
+        return new_ids[value["ref"]] if isinstance(value, dict) else value
+
+    for _, rows, _, _, _ in groups:
+        for row in rows:
+            if "slot" in row:
+                row["props"]["id"] = new_ids[row.pop("slot")]
+            for field in ("id", "source_id", "target_id"):
+                if field in row:
+                    row[field] = resolve(row[field])
+
+
+def execute(tx, groups):
+    """
+    事务函数: 依次执行各组语句，最后在同一事务中递增图版本号，返回新版本号
+    要求逐行命中的语句若命中行数不足 (节点 / 关系不存在)，抛出 BatchError 使事务回滚
+    """
+    for statement, rows, strict, index, _ in groups:
+        result = tx.run(statement, rows=rows)
+        if strict:
+            record = result.single()
+            matched = record['matched'] if record else 0
+            if matched < len(rows):
+                raise BatchError("Node or relationship not found", index, status=404)
+        else:
+            result.consume()
+    return mark_graph_changed(tx)
+
+
+def change_records(groups):
+    """把已执行 (bind_ids 之后) 的操作组转换为修改日志记录 (格式见 changelog.py)，顺序与提交顺序一致"""
+    records = []
+    for _, rows, _, _, (action, name) in groups:
+        for row in rows:
+            if action == 'create_node':
+                props = dict(row["props"])
+                node_id, node_name = props.pop("id"), props.pop("name")
+                records.append({"op": "node_created", "id": node_id, "name": node_name,
+                                "labels": [name] if name else [], "properties": props})
+            elif action == 'delete_node':
+                records.append({"op": "node_deleted", "id": row["id"]})
+            elif action in ('add_label', 'remove_label'):
+                op = 'label_added' if action == 'add_label' else 'label_removed'
+                records.append({"op": op, "id": row["id"], "label": name})
+            elif action == 'node_properties':
+                records.append({"op": "node_updated", "id": row["id"], "properties": row["props"]})
+            else:
+                op = {'merge_relationship': 'relationship_created',
+                      'delete_relationship': 'relationship_deleted',
+                      'relationship_properties': 'relationship_updated'}[action]
+                record = {"op": op, "source": row["source_id"], "target": row["target_id"], "type": name}
+                if "props" in row:
+                    record["properties"] = row["props"]
+                records.append(record)
+    return records
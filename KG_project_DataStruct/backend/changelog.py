@@ -0,0 +1,261 @@
+"""
+修改日志模块 (change data capture)
+每次成功的修改 (节点、关系、批量修改、导入) 追加一条记录到本地的 JSON Lines 段文件，
+下游 (检查点、缓存、搜索索引、分析任务) 通过 /api/changes?since= 增量读取，而不必重新读取全图
+
+记录格式 (每行一个 JSON 对象，seq 总是第一个字段):
+  {"seq": 序号, "version": 图版本号, "time": 时间戳, "op": 操作, ...操作参数}
+  seq 从 1 开始单调递增 (按写入文件的顺序，跨进程、跨重启保持递增)，
+  version 为修改后的图版本号 (与 ETag 对应)，批量修改的所有操作共用同一个版本号
+
+操作:
+  node_created          id, name, labels, properties
+  node_updated          id, properties (值为 null 表示删除该属性)
+  node_deleted          id (节点的所有关系随之删除)
+  label_added           id, label
+  label_removed         id, label
+  relationship_created  source, target, type, properties (已存在同类型关系时为合并属性)
+  relationship_updated  source, target, type, properties (值为 null 表示删除该属性)
+  relationship_deleted  source, target, type (为 null 时删除两点间所有类型)
+  graph_replaced        mode, source (全量 / 差异导入，读取方应重新读取全图)
+  changes_lost          之前有记录写入失败 (读取结果带 reset 标记)，读取方应重新读取全图
+
+日志在修改提交之后写入，写入失败只记录错误 (kg_changelog_write_errors_total) 而不使请求失败，
+因此记录可能丢失: 写入失败时在下一条成功写入的记录之前插入 changes_lost；进程在提交与写入之间退出时
+无法标记，读取方可以检查 version 是否连续 (增量检查点即据此决定是否全量保存)
+
+段文件名为 changes-<首条记录 seq>.jsonl，当前段超过 CHANGELOG_SEGMENT_BYTES 后新建一段，
+只保留最近 CHANGELOG_MAX_SEGMENTS 段；since 早于最早保留的记录时读取结果带 reset 标记
+"""
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from config import Config
+from checkpoint import file_lock
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_NAME = re.compile(r'^changes-(\d+)\.jsonl$')
+# 从行首直接读出 seq，跳过 since 之前的记录时不必解析整行 JSON
+SEQ_PREFIX = re.compile(rb'^\{"seq":(\d+)')
+# 从段文件末尾向前查找最后一行时每次读取的字节数
+TAIL_BLOCK = 64 * 1024
+LOCK_FILE = 'changes.lock'
+
+
+def segment_path(directory, first_seq):
+    return os.path.join(directory, f'changes-{first_seq:020d}.jsonl')
+
+
+def line_seq(line):
+    """读取一行记录的 seq，不是完整记录 (进程崩溃时写了一半的行) 时返回 None"""
+    match = SEQ_PREFIX.match(line)
+    if not match or not line.endswith(b'\n'):
+        return None
+    return int(match.group(1))
+
+
+def last_seq_in(path):
+    """段文件中最后一条完整记录的 seq，从文件末尾向前读取；没有完整记录时返回 None"""
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        data = b''
+        pos = end
+        while pos > 0:
+            step = min(TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+            lines = data.splitlines(keepends=True)
+            # 第一行可能不完整 (pos > 0)，只检查其后的行
+            for line in reversed(lines[1:] if pos > 0 else lines):
+                seq = line_seq(line)
+                if seq is not None:
+                    return seq
+            data = lines[0] if pos > 0 and lines else b''
+        return None
+
+
+class ChangeLog:
+    """
+    追加写入的修改日志
+    写入时先取得进程内锁和目录下的文件锁 (见 checkpoint.file_lock)，由段文件最后一行得出下一个 seq，
+    因此多个工作进程可以共用同一个目录；本进程上次写入后文件未被其他进程修改时直接使用缓存的 seq
+    """
+
+    def __init__(self, directory=None, segment_bytes=None, max_segments=None, enabled=None, fsync=None):
+        self.directory = directory or Config.CHANGELOG_DIR
+        self.segment_bytes = segment_bytes or Config.CHANGELOG_SEGMENT_BYTES
+        self.max_segments = max_segments or Config.CHANGELOG_MAX_SEGMENTS
+        self.enabled = Config.CHANGELOG_ENABLED if enabled is None else enabled
+        self.fsync = Config.CHANGELOG_FSYNC if fsync is None else fsync
+        self._lock = threading.Lock()
+        # 本进程最后一次写入后的 (段文件, 文件大小, seq)
+        self._tail = None
+        # 写入失败的次数，以及是否需要在下一次写入时插入 changes_lost
+        self.failures = 0
+        self._lost = False
+
+    def segments(self):
+        """已保留的段文件 [(首条记录 seq, 路径)]，按 seq 排序"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        segments = []
+        for name in names:
+            match = SEGMENT_NAME.match(name)
+            if match:
+                segments.append((int(match.group(1)), os.path.join(self.directory, name)))
+        segments.sort()
+        return segments
+
+    def _locked(self):
+        """取得写锁: 进程内锁 + 跨进程文件锁"""
+        return file_lock(os.path.join(self.directory, LOCK_FILE), self._lock)
+
+    def _last(self, segments):
+        """持有写锁时调用: 返回 (当前段文件, 文件大小, 最后一个 seq)，没有段文件时为 (None, 0, 0)"""
+        if not segments:
+            return None, 0, 0
+        first, path = segments[-1]
+        size = os.path.getsize(path)
+        if self._tail is not None and self._tail[:2] == (path, size):
+            return self._tail
+        seq = last_seq_in(path)
+        if seq is None:
+            # 当前段还没有完整记录，序号接在上一段之后
+            seq = first - 1
+        return path, size, seq
+
+    def append(self, version, op, **data):
+        """追加一条修改记录，返回分配的 seq；日志被禁用时返回 None"""
+        if not self.enabled:
+            return None
+        seqs = self.extend(version, [dict(data, op=op)])
+        return seqs[-1] if seqs else None
+
+    def extend(self, version, changes):
+        """
+        在一次写入中追加多条修改记录 (如批量修改的全部操作)，它们获得连续的 seq
+        changes 为 [{"op": 操作, ...操作参数}]，返回分配的 seq 列表
+        修改已经提交，写入失败时只记录错误并返回空列表，不向调用方抛出异常
+        """
+        if not self.enabled or not changes:
+            return []
+        try:
+            return self._write(version, changes)
+        except Exception:
+            self.failures += 1
+            self._lost = True
+            logger.exception("Failed to append %d change log records", len(changes))
+            return []
+
+    def _write(self, version, changes):
+        now = round(time.time(), 3)
+        with self._locked():
+            if self._lost:
+                changes = [{"op": "changes_lost"}] + list(changes)
+            segments = self.segments()
+            path, size, seq = self._last(segments)
+            # 文件在本进程上次写入后被修改过 (其他进程写入或上次写入中断)，需要检查末尾是否完整
+            foreign = size and self._tail != (path, size, seq)
+            first = seq + 1
+
+            lines = []
+            for change in changes:
+                seq += 1
+                entry = {"seq": seq, "version": version, "time": now, "op": change["op"]}
+                entry.update((k, v) for k, v in change.items() if k != "op")
+                lines.append(json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str) + '\n')
+            payload = ''.join(lines).encode('utf-8')
+
+            if path is None or (size and size + len(payload) > self.segment_bytes):
+                os.makedirs(self.directory, exist_ok=True)
+                path, size = segment_path(self.directory, first), 0
+                segments.append((first, path))
+            with open(path, 'ab') as f:
+                if size and foreign and not self._ends_with_newline(path):
+                    # 上一次写入中断留下了不完整的行，新记录从下一行开始
+                    payload = b'\n' + payload
+                f.write(payload)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            self._tail = (path, size + len(payload), seq)
+            self._lost = False
+
+            # 超出保留段数时删除最旧的段
+            for _, old in segments[:-self.max_segments]:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+        return list(range(first, seq + 1))
+
+    @staticmethod
+    def _ends_with_newline(path):
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def latest(self):
+        """最后一条记录的 seq，没有记录时为 0"""
+        with self._locked():
+            return self._last(self.segments())[2]
+
+    def read(self, since=0, limit=1000):
+        """
+        读取 seq > since 的前 limit 条记录
+        返回 {"changes", "next", "latest", "reset"}:
+          next 为本次读到的最后一个 seq (下次以 since=next 继续读取)，
+          reset 为 true 表示 since 之后的部分记录已被清理、损坏或丢失 (changes_lost)，或日志被重置，
+          读取方应重新读取全图后从 latest 继续
+        """
+        latest = self.latest()
+        segments = self.segments()
+        firsts = [first for first, _ in segments]
+        reset = since > latest or (bool(segments) and firsts[0] > since + 1)
+
+        changes = []
+        start = max(bisect.bisect_right(firsts, since + 1) - 1, 0)
+        for _, path in segments[start:]:
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                # 读取期间被其他进程清理
+                reset = True
+                continue
+            with f:
+                for line in f:
+                    seq = line_seq(line)
+                    if seq is None or seq <= since or seq > latest:
+                        continue
+                    try:
+                        change = json.loads(line)
+                    except ValueError:
+                        logger.warning("Skipping corrupt change log record %d in %s", seq, path)
+                        reset = True
+                        continue
+                    if change["op"] == 'changes_lost':
+                        reset = True
+                    changes.append(change)
+                    if len(changes) >= limit:
+                        break
+            if len(changes) >= limit:
+                break
+
+        return {
+            "changes": changes,
+            "next": changes[-1]["seq"] if changes else max(min(since, latest), 0),
+            "latest": latest,
+            "reset": reset,
+        }
+
+
+# 全局修改日志实例
+change_log = ChangeLog()
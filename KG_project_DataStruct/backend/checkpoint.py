@@ -0,0 +1,231 @@
+"""
+检查点文件读写模块
+保存时先写入同目录下的临时文件，fsync 后再原子重命名 (os.replace) 为正式文件，
+写入中途崩溃也不会破坏上一次的检查点；支持可选的 gzip / zstd 压缩
+同时写入的一组文件 (如 entity.csv 与 relation.csv) 在依次重命名前先写入提交日志，
+重命名中途崩溃时由 recover_files 补完，不会留下新旧混合的文件组
+"""
+import gzip
+import io
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:  # zstd 压缩为可选功能
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，file_lock 只在进程内加锁
+    fcntl = None
+
+# 压缩方式与文件后缀
+COMPRESSION_SUFFIXES = {
+    '': '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+# 多文件提交日志 (<第一个目标>.commit) 与提交锁文件 (位于第一个目标所在目录)
+COMMIT_SUFFIX = '.commit'
+COMMIT_LOCK = '.commit.lock'
+_commit_lock = threading.Lock()
+
+
+def checkpoint_path(base_path, compression=''):
+    """根据压缩方式返回检查点文件路径，例如 saved_entity.csv.gz"""
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unsupported compression: {compression}")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression requires the 'zstandard' package")
+    return base_path + COMPRESSION_SUFFIXES[compression]
+
+
+def find_checkpoint(base_path):
+    """
+    查找已存在的检查点文件 (任意压缩方式)
+    存在多个时返回最新修改的一个，不存在时返回 None
+    """
+    candidates = [base_path + suffix for suffix in COMPRESSION_SUFFIXES.values()]
+    existing = [path for path in candidates if os.path.exists(path)]
+    if not existing:
+        return None
+    return max(existing, key=os.path.getmtime)
+
+
+def remove_checkpoint(base_path, keep=None):
+    """删除所有压缩方式的检查点文件 (keep 指定的文件除外)"""
+    for suffix in COMPRESSION_SUFFIXES.values():
+        path = base_path + suffix
+        if path != keep and os.path.exists(path):
+            os.remove(path)
+
+
+def open_checkpoint(path):
+    """以文本模式打开检查点文件 (根据后缀自动解压)"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ValueError("Reading .zst checkpoints requires the 'zstandard' package")
+        raw = open(path, 'rb')
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+class AtomicWriter:
+    """
+    原子文件写入器
+    通过 file 写入临时文件，flush_to_disk() 刷盘，commit() 重命名为目标文件，abort() 删除临时文件
+    """
+
+    def __init__(self, path, compression=''):
+        self.path = path
+        # 临时文件名不会与崩溃的进程留下的临时文件重复 (提交日志按文件名恢复)
+        self.tmp_path = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex}"
+        self._raw = open(self.tmp_path, 'wb')
+        if compression == 'gzip':
+            self._compressed = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        elif compression == 'zstd':
+            self._compressed = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._compressed = None
+        self.file = io.TextIOWrapper(self._compressed or self._raw, encoding='utf-8', newline='',
+                                     write_through=False)
+
+    def flush_to_disk(self):
+        """关闭压缩流并将临时文件内容 fsync 到磁盘 (重命名前调用)"""
+        self.file.flush()
+        self.file.detach()
+        if self._compressed is not None:
+            # 关闭压缩流以写入文件尾，底层文件保持打开
+            self._compressed.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+
+    def commit(self):
+        """原子替换目标文件，并同步目录项"""
+        os.replace(self.tmp_path, self.path)
+        _fsync_dir(os.path.dirname(self.path))
+
+    def abort(self):
+        """放弃写入，删除临时文件"""
+        try:
+            if not self._raw.closed:
+                self._raw.close()
+        except OSError:
+            pass
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+
+@contextmanager
+def atomic_files(*targets, compression='', journal=True):
+    """
+    同时原子写入多个文件
+    用法: with atomic_files(path_a, path_b, compression='gzip') as (fa, fb): ...
+    所有文件都完整写入并 fsync 后才依次重命名，任何一步出错都会删除全部临时文件；
+    多个文件时先写入提交日志再重命名，读取这组文件之前调用 recover_files 补完中断的提交
+    (文件名每次都不同、另有提交点的文件组，如增量检查点的基础快照，可以传 journal=False)
+    """
+    writers = []
+    try:
+        for target in targets:
+            writers.append(AtomicWriter(target, compression))
+        yield tuple(writer.file for writer in writers)
+        for writer in writers:
+            writer.flush_to_disk()
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+    if len(writers) > 1 and journal:
+        _commit_all(writers)
+    else:
+        for writer in writers:
+            writer.commit()
+
+
+def _commit_locked(first_target):
+    """多文件提交与恢复共用的锁: 进程内锁 + 第一个目标所在目录下的文件锁"""
+    directory = os.path.dirname(os.path.abspath(first_target))
+    return file_lock(os.path.join(directory, COMMIT_LOCK), _commit_lock)
+
+
+def _commit_all(writers):
+    """写入提交日志 [(临时文件, 目标)] 后依次重命名，全部完成后删除提交日志"""
+    journal = writers[0].path + COMMIT_SUFFIX
+    with _commit_locked(writers[0].path):
+        # 先补完上一次中断的提交，再覆盖提交日志
+        _replay(journal)
+        with atomic_files(journal) as (out,):
+            json.dump({"files": [[writer.tmp_path, writer.path] for writer in writers]}, out)
+        for writer in writers:
+            writer.commit()
+        os.remove(journal)
+
+
+def _replay(journal):
+    """持有提交锁时调用: 补完提交日志中尚未完成的重命名并删除提交日志，没有提交日志时返回 False"""
+    try:
+        with open(journal, encoding='utf-8') as f:
+            renames = json.load(f)["files"]
+    except FileNotFoundError:
+        return False
+    # 提交日志写入前所有临时文件都已 fsync，因此总是可以向前补完；已重命名的文件不再存在
+    for tmp_path, path in renames:
+        if os.path.exists(tmp_path):
+            os.replace(tmp_path, path)
+    for directory in {os.path.dirname(path) for _, path in renames}:
+        _fsync_dir(directory)
+    os.remove(journal)
+    return True
+
+
+def recover_files(*targets):
+    """
+    补完 atomic_files(*targets) 中断的提交 (提交日志以第一个目标命名)，读取这组文件之前调用
+    返回是否执行了恢复
+    """
+    journal = targets[0] + COMMIT_SUFFIX
+    if not os.path.exists(journal):
+        return False
+    with _commit_locked(targets[0]):
+        return _replay(journal)
+
+
+@contextmanager
+def file_lock(path, thread_lock):
+    """
+    取得写锁: 先取得进程内锁 thread_lock，再对 path (不存在时创建) 加跨进程排他锁 (fcntl 可用时)
+    用于多个工作进程共用同一个数据目录 (修改日志、增量检查点)
+    """
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _fsync_dir(directory):
+    """同步目录项，保证重命名在断电后依然可见 (Windows 不支持打开目录，直接跳过)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directory or '.', os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,124 @@
+"""
+列式二进制响应格式 (MessagePack)
+客户端在 Accept 头中声明 application/msgpack (或 application/x-msgpack) 时，
+图数据接口以列式结构返回，代替逐个节点 / 关系重复字段名的 JSON 对象:
+  strings:  标签、分类与关系类型的字符串表 (每个字符串只出现一次)
+  nodes:    ids (int64 小端字节数组)、names、category / labels (字符串表下标，int32 字节数组)、
+            properties (不含与 ids / names 重复的 id、name)
+  links:    source / target (节点表下标，int32 字节数组)、type (字符串表下标)、properties
+节点表由 nodes 中的节点和 external_ids (关系端点中不在本页节点里的 id) 依次组成；
+节点 / 关系上的其他字段 (score、hop、count 等) 以同名列表保存在 nodes.extra / links.extra 中
+(不会与上面的列重名)，响应中的其他顶层字段原样保留
+需要安装 msgpack，未安装时始终返回 JSON
+"""
+import sys
+from array import array
+
+try:
+    import msgpack
+except ImportError:  # msgpack 为可选依赖
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# 列式结构的格式标识，结构变化时递增版本号
+FORMAT = 'kg-columnar/2'
+
+NODE_FIELDS = ('id', 'name', 'category', 'labels', 'properties')
+LINK_FIELDS = ('source', 'target', 'name', 'properties')
+
+
+def negotiate(accept_mimetypes):
+    """根据 Accept 头选择响应格式，客户端未明确偏好 MessagePack 或未安装 msgpack 时返回 JSON"""
+    if msgpack is None:
+        return JSON_MIMETYPE
+    best = accept_mimetypes.best_match((JSON_MIMETYPE,) + MSGPACK_MIMETYPES)
+    return best if best in MSGPACK_MIMETYPES else JSON_MIMETYPE
+
+
+def _packed(typecode, values):
+    """整数列表 -> 小端字节数组"""
+    data = array(typecode, values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _ids(values):
+    """节点 id 列: 全部为整数时使用 int64 字节数组，否则 (如标签聚合视图的字符串 id) 使用普通列表"""
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return _packed('q', values)
+    return list(values)
+
+
+def _extra_columns(rows, fields):
+    """rows 中 fields 以外的字段，按出现顺序各生成一列 (缺失为 None)"""
+    keys = list(dict.fromkeys(key for row in rows for key in row if key not in fields))
+    return {key: [row.get(key) for row in rows] for key in keys}
+
+
+def encode_columnar(payload):
+    """
+    把图数据响应 (含 nodes / links 列表的字典) 编码为列式 MessagePack
+    返回 bytes
+    """
+    strings = []
+    string_index = {}
+
+    def intern(value):
+        if value is None:
+            return -1
+        if value not in string_index:
+            string_index[value] = len(strings)
+            strings.append(value)
+        return string_index[value]
+
+    nodes = payload.get('nodes') or []
+    links = payload.get('links') or []
+
+    position = {}
+    for i, node in enumerate(nodes):
+        position.setdefault(node.get('id'), i)
+    external = []
+    for link in links:
+        for end in (link['source'], link['target']):
+            if end not in position:
+                position[end] = len(nodes) + len(external)
+                external.append(end)
+
+    label_offsets = [0]
+    label_ids = []
+    for node in nodes:
+        label_ids.extend(intern(label) for label in node.get('labels') or ())
+        label_offsets.append(len(label_ids))
+
+    node_columns = {
+        "count": len(nodes),
+        "ids": _ids([node.get('id') for node in nodes]),
+        "names": [node.get('name') for node in nodes],
+        "category": _packed('i', [intern(node.get('category')) for node in nodes]),
+        "label_offsets": _packed('i', label_offsets),
+        "labels": _packed('i', label_ids),
+        "properties": [{k: v for k, v in (node.get('properties') or {}).items() if k not in ('id', 'name')}
+                       for node in nodes],
+        "extra": _extra_columns(nodes, NODE_FIELDS),
+    }
+    link_columns = {
+        "count": len(links),
+        "source": _packed('i', [position[link['source']] for link in links]),
+        "target": _packed('i', [position[link['target']] for link in links]),
+        "type": _packed('i', [intern(link.get('name')) for link in links]),
+        "properties": [link.get('properties') or {} for link in links],
+        "extra": _extra_columns(links, LINK_FIELDS),
+    }
+
+    document = {key: value for key, value in payload.items() if key not in ('nodes', 'links')}
+    document.update({
+        "format": FORMAT,
+        "strings": strings,
+        "nodes": node_columns,
+        "links": link_columns,
+        "external_ids": _ids(external),
+    })
+    return msgpack.packb(document, use_bin_type=True, default=str)
@@ -23,3 +23,100 @@ class Config:
     DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
     ENTITY_FILE = os.path.join(DATA_DIR, 'entity.csv')      # 实体数据文件
     RELATION_FILE = os.path.join(DATA_DIR, 'relation.csv')  # 关系数据文件
+
+    # 存储后端配置
+    # neo4j: Neo4j 数据库 (默认)；sqlite: 嵌入式 SQLite 数据库文件，无需数据库服务器
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "neo4j")
+    SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(DATA_DIR, 'graph.sqlite3'))  # 数据库文件，:memory: 表示进程内存
+    SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", 5))                 # 等待其他写事务释放写锁的秒数
+
+    # 批量导入配置
+    # 每个 UNWIND 事务提交的行数，可通过请求参数 ?batch_size= 临时覆盖
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 5000))
+    # 并行导入的工作线程数 (每个线程一个数据库会话)，1 表示单线程，可通过 ?workers= 临时覆盖
+    IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 1))
+
+    # 节点 id 分配配置
+    # 每个进程一次从数据库计数器租用的 id 数量
+    ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", 100))
+
+    # 图数据分页配置 (/api/graph?after=&limit= 与 NDJSON 流式输出)
+    GRAPH_PAGE_SIZE = int(os.getenv("GRAPH_PAGE_SIZE", 1000))      # 默认每页节点数
+    GRAPH_PAGE_MAX = int(os.getenv("GRAPH_PAGE_MAX", 10000))       # 每页节点数上限
+    GRAPH_FULL_LINKS_MAX = int(os.getenv("GRAPH_FULL_LINKS_MAX", 500))  # 不分页的 /api/graph 最多返回的关系数
+
+    # 图数据快照缓存 (按图版本号缓存 /api/graph 的响应体)
+    GRAPH_CACHE_ENTRIES = int(os.getenv("GRAPH_CACHE_ENTRIES", 8))  # 每个进程最多缓存的响应数
+
+    # 搜索配置
+    # 全文索引覆盖的节点属性 (逗号分隔)，properties 中的字段导入后即为节点属性
+    SEARCH_FIELDS = [f.strip() for f in os.getenv("SEARCH_FIELDS", "name,description").split(',') if f.strip()]
+    SEARCH_PAGE_MAX = int(os.getenv("SEARCH_PAGE_MAX", 100))       # 每页结果数上限
+
+    # 检查点 (/api/save) 配置
+    CHECKPOINT_COMPRESSION = os.getenv("CHECKPOINT_COMPRESSION", "")  # 压缩方式: 空 / gzip / zstd
+    EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", 2000))      # 导出时每次从数据库拉取的记录数
+    CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join(DATA_DIR, 'checkpoint'))  # 基础快照与增量段目录
+    CHECKPOINT_MAX_DELTAS = int(os.getenv("CHECKPOINT_MAX_DELTAS", 16))                 # 增量段达到该数量时后台合并
+    CHECKPOINT_COMPACT_RATIO = float(os.getenv("CHECKPOINT_COMPACT_RATIO", 0.5))        # 增量段总大小超过基础快照的该倍数时后台合并
+
+    # 批量修改 (/api/batch) 配置
+    BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", 10000))  # 单个请求最多包含的操作数
+
+    # Neo4j 连接池与事务配置
+    NEO4J_DATABASE = os.getenv("NEO4J_DATABASE") or None                              # 数据库名，空表示服务器默认库
+    NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", 100))                  # 连接池最大连接数
+    NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", 10))     # 从连接池获取连接的超时 (秒)
+    NEO4J_CONNECTION_TIMEOUT = float(os.getenv("NEO4J_CONNECTION_TIMEOUT", 15))       # 建立新连接的超时 (秒)
+    NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", 3600))  # 连接最长存活时间 (秒)
+    NEO4J_FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", 1000))                       # 每次从服务器拉取的记录数
+    NEO4J_MAX_RETRY_TIME = float(os.getenv("NEO4J_MAX_RETRY_TIME", 15))               # 托管事务遇到暂时性错误时的最长重试时间 (秒)
+    RETRY_AFTER = int(os.getenv("RETRY_AFTER", 1))                                    # 数据库暂时不可用 (503) 时建议客户端等待的秒数
+
+    # 响应压缩配置 (按 Accept-Encoding 协商 br / gzip)
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))  # 小于该字节数的响应不压缩 (流式响应总是压缩)
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", 6))           # gzip 压缩级别 (1-9)
+    BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))           # brotli 压缩质量 (0-11)，较低的值编码更快
+    COMPRESS_MIMETYPES = ('application/json', 'application/x-ndjson', 'application/msgpack',
+                          'application/x-msgpack', 'text/csv')     # 需要压缩的响应类型 (text/* 总是压缩)
+
+    # ASGI 异步模式 (uvicorn asgi:app) 配置
+    ASGI_THREADS = int(os.getenv("ASGI_THREADS", 20))  # 运行其余 Flask 接口的线程数
+
+    # 邻接索引 (路径 / 邻居查询的进程内图模型) 配置
+    ADJACENCY_REFRESH_SECONDS = float(os.getenv("ADJACENCY_REFRESH_SECONDS", 1.0))  # 检查图版本号的最短间隔 (秒)
+    ADJACENCY_MAX_OVERLAY = int(os.getenv("ADJACENCY_MAX_OVERLAY", 10000))          # 增量修改超过该数量后整体重建
+
+    # 路径查询 (/api/path) 限制
+    PATH_MAX_DEPTH = int(os.getenv("PATH_MAX_DEPTH", 0))  # max_depth 参数的上限，0 表示不限制
+    PATH_MAX_K = int(os.getenv("PATH_MAX_K", 10))         # k 参数 (返回路径条数) 的上限
+
+    # 邻居查询 (/api/node/<id>/neighbors) 限制
+    NEIGHBORS_MAX_DEPTH = int(os.getenv("NEIGHBORS_MAX_DEPTH", 3))        # depth 参数的上限
+    NEIGHBORS_FANOUT = int(os.getenv("NEIGHBORS_FANOUT", 50))             # 默认每个节点向下一跳展开的邻居数
+    NEIGHBORS_FANOUT_MAX = int(os.getenv("NEIGHBORS_FANOUT_MAX", 1000))   # fanout 参数的上限
+    NEIGHBORS_MAX_NODES = int(os.getenv("NEIGHBORS_MAX_NODES", 10000))    # 一次查询的邻域最多包含的节点数
+    NEIGHBORS_PAGE_SIZE = int(os.getenv("NEIGHBORS_PAGE_SIZE", 100))      # 默认每页节点数
+    NEIGHBORS_PAGE_MAX = int(os.getenv("NEIGHBORS_PAGE_MAX", 1000))       # 每页节点数上限
+
+    # 图摘要 (/api/graph?view=...) 配置
+    SUMMARY_TOP_K = int(os.getenv("SUMMARY_TOP_K", 200))                   # 默认返回的节点 / 社区数
+    SUMMARY_MAX_K = int(os.getenv("SUMMARY_MAX_K", 5000))                  # k 参数的上限
+    PAGERANK_DAMPING = float(os.getenv("PAGERANK_DAMPING", 0.85))          # PageRank 阻尼系数
+    PAGERANK_ITERATIONS = int(os.getenv("PAGERANK_ITERATIONS", 50))        # PageRank 最大迭代次数
+    COMMUNITY_ITERATIONS = int(os.getenv("COMMUNITY_ITERATIONS", 20))      # 标签传播最大迭代轮数
+
+    # 查询分析与慢查询日志 (/api/queries)
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.01))  # 以 PROFILE 执行的查询比例 (0-1)，0 表示不采样
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 500))               # 耗时超过该毫秒数的查询写入慢查询日志，0 表示不记录
+    SLOW_QUERY_KEEP = int(os.getenv("SLOW_QUERY_KEEP", 100))             # 保留的最近慢查询条数
+    QUERY_TEMPLATES_MAX = int(os.getenv("QUERY_TEMPLATES_MAX", 500))     # 最多分别统计的查询模板数
+
+    # 修改日志 (/api/changes) 配置
+    CHANGELOG_ENABLED = os.getenv("CHANGELOG_ENABLED", "1") != "0"                              # 0 表示不记录修改日志
+    CHANGELOG_DIR = os.getenv("CHANGELOG_DIR", os.path.join(DATA_DIR, 'changelog'))             # 段文件目录 (多个进程可共用)
+    CHANGELOG_SEGMENT_BYTES = int(os.getenv("CHANGELOG_SEGMENT_BYTES", 8 * 1024 * 1024))        # 单个段文件的大小上限
+    CHANGELOG_MAX_SEGMENTS = int(os.getenv("CHANGELOG_MAX_SEGMENTS", 32))                       # 保留的段文件数
+    CHANGELOG_FSYNC = os.getenv("CHANGELOG_FSYNC", "0") == "1"                                  # 每次写入后 fsync (更可靠但更慢)
+    CHANGES_PAGE_SIZE = int(os.getenv("CHANGES_PAGE_SIZE", 1000))                               # 默认每次返回的记录数
+    CHANGES_PAGE_MAX = int(os.getenv("CHANGES_PAGE_MAX", 10000))                                # 每次返回的记录数上限
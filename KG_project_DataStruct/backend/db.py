@@ -1,9 +1,29 @@
 """
 数据库连接模块
 使用单例模式管理 Neo4j 数据库连接
+连接池、拉取大小和重试时间都来自 Config；read() / write() 基于托管事务执行，
+遇到死锁、集群切换等暂时性错误时由驱动自动重试
 """
-from neo4j import GraphDatabase
+import functools
+import time
+from neo4j import AsyncGraphDatabase, GraphDatabase, READ_ACCESS, WRITE_ACCESS
+from neo4j.exceptions import ClientError, ServiceUnavailable, SessionExpired, TransientError
 from config import Config
+from metrics import TRANSACTION_DURATION, InstrumentedSession, work_name
+from steps import run_queries_async
+
+
+def driver_config():
+    """同步与异步驱动共用的连接参数"""
+    return dict(
+        auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD),
+        max_connection_pool_size=Config.NEO4J_MAX_POOL_SIZE,
+        connection_acquisition_timeout=Config.NEO4J_ACQUISITION_TIMEOUT,
+        connection_timeout=Config.NEO4J_CONNECTION_TIMEOUT,
+        max_connection_lifetime=Config.NEO4J_MAX_CONNECTION_LIFETIME,
+        max_transaction_retry_time=Config.NEO4J_MAX_RETRY_TIME,
+        fetch_size=Config.NEO4J_FETCH_SIZE,
+    )
 
 
 class Neo4jConnection:
@@ -17,10 +37,8 @@ class Neo4jConnection:
         if cls._instance is None:
             cls._instance = super(Neo4jConnection, cls).__new__(cls)
             # 初始化 Neo4j 驱动
-            cls._instance.driver = GraphDatabase.driver(
-                Config.NEO4J_URI,
-                auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD)
-            )
+            # URI 使用 neo4j:// 协议时驱动会获取集群路由表，读事务自动发往只读副本
+            cls._instance.driver = GraphDatabase.driver(Config.NEO4J_URI, **driver_config())
         return cls._instance
 
     def close(self):
@@ -28,13 +46,103 @@ class Neo4jConnection:
         if self.driver:
             self.driver.close()
 
-    def get_session(self):
+    def get_session(self, access_mode=WRITE_ACCESS, **config):
         """
         获取一个新的数据库会话 (Session)
+        access_mode 为 READ_ACCESS 时会话中的查询可以路由到只读副本
+        config 会传给 driver.session()，例如 fetch_size=1000 限制每次拉取的记录数
+        返回的会话经过 metrics.InstrumentedSession 包装，查询耗时、行数等计入监控指标
         注意：使用完 session 后必须关闭 (session.close())
         """
-        return self.driver.session()
+        config.setdefault('database', Config.NEO4J_DATABASE)
+        return InstrumentedSession(self.driver.session(default_access_mode=access_mode, **config))
+
+    def read(self, work, *args, **kwargs):
+        """
+        在托管读事务中执行 work(tx, *args, **kwargs) 并返回其结果
+        work 也可以是 Cypher 字符串，此时 kwargs 为查询参数，返回记录列表
+        暂时性错误时整个 work 会被重新执行，因此 work 必须在事务内读完结果且没有其他副作用
+        """
+        with self.get_session(READ_ACCESS) as session:
+            work, args, kwargs = _unit_of_work(work, args, kwargs)
+            return session.execute_read(work, *args, **kwargs)
+
+    def write(self, work, *args, **kwargs):
+        """在托管写事务中执行 work (用法同 read)，正常返回即已提交"""
+        with self.get_session(WRITE_ACCESS) as session:
+            work, args, kwargs = _unit_of_work(work, args, kwargs)
+            return session.execute_write(work, *args, **kwargs)
+
+
+class AsyncNeo4jConnection:
+    """
+    异步驱动连接 (ASGI 模式使用，见 asgi.py)
+    异步驱动绑定创建它的事件循环，因此在第一次使用时才创建
+    """
+
+    def __init__(self):
+        self.driver = None
+
+    def get_session(self, access_mode=READ_ACCESS, **config):
+        """获取一个异步会话 (async with db.get_session() as session: ...)"""
+        if self.driver is None:
+            self.driver = AsyncGraphDatabase.driver(Config.NEO4J_URI, **driver_config())
+        config.setdefault('database', Config.NEO4J_DATABASE)
+        return self.driver.session(default_access_mode=access_mode, **config)
+
+    async def read(self, work, *args, **kwargs):
+        """在托管读事务中执行 await work(tx, *args, **kwargs)，用法同 Neo4jConnection.read"""
+        name = work_name(work) if callable(work) else 'cypher'
+        start = time.perf_counter()
+        try:
+            async with self.get_session(READ_ACCESS) as session:
+                work, args, kwargs = _unit_of_work(work, args, kwargs, _run_query_async)
+                return await session.execute_read(work, *args, **kwargs)
+        finally:
+            TRANSACTION_DURATION.observe(time.perf_counter() - start, name, 'read')
+
+    async def read_steps(self, steps, *args):
+        """在托管读事务中执行查询步骤 steps(*args) (见 steps.py)，每次重试重新创建步骤生成器，事务计时以 steps 命名"""
+
+        @functools.wraps(steps)
+        async def work(tx):
+            return await run_queries_async(tx, steps(*args))
+
+        return await self.read(work)
+
+    async def close(self):
+        if self.driver is not None:
+            await self.driver.close()
+            self.driver = None
+
+
+def _unit_of_work(work, args, kwargs, run_query=None):
+    """把 Cypher 字符串包装为事务函数，返回 (事务函数, 位置参数, 关键字参数)"""
+    if callable(work):
+        return work, args, kwargs
+    return run_query or _run_query, (work, kwargs), {}
+
+
+def _run_query(tx, query, params):
+    return list(tx.run(query, params))
+
+
+async def _run_query_async(tx, query, params):
+    result = await tx.run(query, params)
+    return [record async for record in result]
+
+
+def is_unavailable(error):
+    """
+    判断异常是否表示数据库暂时不可用 (应返回 503 而不是 500)
+    包括重试后仍失败的暂时性错误 (死锁等)、服务不可达、集群切换，以及连接池耗尽导致的获取连接超时
+    """
+    if isinstance(error, (TransientError, ServiceUnavailable, SessionExpired)):
+        return True
+    return isinstance(error, ClientError) and 'failed to obtain a connection from the pool' in str(error)
 
 
 # 全局数据库实例
 db = Neo4jConnection()
+# 异步模式的全局数据库实例 (只在 ASGI 模式下实际创建驱动)
+async_db = AsyncNeo4jConnection()
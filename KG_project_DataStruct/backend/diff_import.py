@@ -0,0 +1,170 @@
+"""
+差异导入模块
+不再清空数据库后全量重建，而是将 CSV 与当前图数据逐行比较：
+节点按 id、关系按 (source_id, target_id, type) 对齐，比较内容哈希，
+只对新增、修改、删除的行执行写入
+"""
+import hashlib
+import json
+import time
+from loader import BulkLoader, parse_entity_row, parse_relation_row
+from schema import strip_base_label
+
+
+def fingerprint(*parts):
+    """计算一行数据的内容哈希 (16 字节)，字典按键排序，保证与来源无关"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).digest()
+
+
+class DiffImporter:
+    """
+    差异导入器
+    使用方式与 BulkLoader 相同: 先 load_entities，再 load_relations
+    - 新增行交给 BulkLoader 按标签 / 类型分组批量创建
+    - 修改行按 (移除的标签, 新增的标签) 或关系类型分组，以 UNWIND 批量更新
+    - CSV 中不存在的节点 / 关系最后批量删除
+    """
+
+    def __init__(self, session, batch_size=None):
+        self.session = session
+        self.loader = BulkLoader(session, batch_size=batch_size)
+        self.batch_size = self.loader.batch_size
+        self.elapsed = 0.0
+        self.counts = {
+            "nodes": {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0},
+            "relationships": {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0},
+        }
+
+    def load_entities(self, rows):
+        """比较实体行与当前节点，写入差异"""
+        started = time.perf_counter()
+        counts = self.counts['nodes']
+
+        # 当前图中每个节点的 (内容哈希, 标签集合)
+        existing = {}
+        label_sets = {}  # 复用相同的标签集合对象，减少内存占用
+        for record in self.session.run("""
+            MATCH (n:KGNode) WHERE n.id IS NOT NULL
+            RETURN n.id AS id, labels(n) AS labels, properties(n) AS props
+        """):
+            labels = frozenset(strip_base_label(record['labels']))
+            labels = label_sets.setdefault(labels, labels)
+            existing[record['id']] = (fingerprint(sorted(labels), record['props']), labels)
+
+        updates = {}
+        for row in rows:
+            labels, properties = parse_entity_row(row)
+            node_id = properties['id']
+            current = existing.pop(node_id, None)
+            if current is None:
+                self.loader.add_node(labels, properties)
+                counts['inserted'] += 1
+                continue
+            current_hash, current_labels = current
+            if fingerprint(sorted(set(labels)), properties) == current_hash:
+                counts['unchanged'] += 1
+                continue
+            key = (tuple(sorted(current_labels - set(labels))), tuple(sorted(set(labels) - current_labels)))
+            buffer = updates.setdefault(key, [])
+            buffer.append({"id": node_id, "props": properties})
+            if len(buffer) >= self.batch_size:
+                self._update_nodes(key, buffer)
+                updates[key] = []
+            counts['updated'] += 1
+        self.loader.flush()
+        for key, buffer in updates.items():
+            if buffer:
+                self._update_nodes(key, buffer)
+
+        # CSV 中已不存在的节点 (连同其关系) 一并删除
+        deleted = list(existing)
+        for i in range(0, len(deleted), self.batch_size):
+            self.loader.run_batch("""
+                UNWIND $rows AS node_id
+                MATCH (n:KGNode) WHERE n.id = node_id
+                DETACH DELETE n
+            """, deleted[i:i + self.batch_size])
+        counts['deleted'] += len(deleted)
+        self.elapsed += time.perf_counter() - started
+
+    def load_relations(self, rows):
+        """比较关系行与当前关系，写入差异 (应在 load_entities 之后调用)"""
+        started = time.perf_counter()
+        counts = self.counts['relationships']
+
+        existing = {}
+        for record in self.session.run("""
+            MATCH (a:KGNode)-[r]->(b:KGNode)
+            RETURN a.id AS source_id, b.id AS target_id, type(r) AS type, properties(r) AS props
+        """):
+            key = (record['source_id'], record['target_id'], record['type'])
+            existing[key] = fingerprint(record['props'])
+
+        updates = {}
+        for row in rows:
+            rel_type, item = parse_relation_row(row)
+            key = (item['source_id'], item['target_id'], rel_type)
+            current_hash = existing.pop(key, None)
+            if current_hash is None:
+                self.loader.add_relation(rel_type, item)
+                counts['inserted'] += 1
+            elif fingerprint(item['props']) == current_hash:
+                counts['unchanged'] += 1
+            else:
+                buffer = updates.setdefault(rel_type, [])
+                buffer.append(item)
+                if len(buffer) >= self.batch_size:
+                    self._update_relations(rel_type, buffer)
+                    updates[rel_type] = []
+                counts['updated'] += 1
+        self.loader.flush()
+        for rel_type, buffer in updates.items():
+            if buffer:
+                self._update_relations(rel_type, buffer)
+
+        deletes = {}
+        for source_id, target_id, rel_type in existing:
+            deletes.setdefault(rel_type, []).append({"source_id": source_id, "target_id": target_id})
+        for rel_type, items in deletes.items():
+            for i in range(0, len(items), self.batch_size):
+                self.loader.run_batch(f"""
+                    UNWIND $rows AS row
+                    MATCH (a:KGNode)-[r:`{rel_type}`]->(b:KGNode)
+                    WHERE a.id = row.source_id AND b.id = row.target_id
+                    DELETE r
+                """, items[i:i + self.batch_size])
+        counts['deleted'] += len(existing)
+        self.elapsed += time.perf_counter() - started
+
+    def _update_nodes(self, key, rows):
+        """整体替换节点属性，并移除 / 添加标签 (标签只能拼接到语句中，所以按标签变化分组)"""
+        removed, added = key
+        cypher = """
+            UNWIND $rows AS row
+            MATCH (n:KGNode) WHERE n.id = row.id
+            SET n = row.props
+        """
+        if removed:
+            cypher += "REMOVE n:" + ':'.join(f'`{label}`' for label in removed) + "\n"
+        if added:
+            cypher += "SET n:" + ':'.join(f'`{label}`' for label in added) + "\n"
+        self.loader.run_batch(cypher, rows)
+
+    def _update_relations(self, rel_type, rows):
+        """整体替换关系属性"""
+        self.loader.run_batch(f"""
+            UNWIND $rows AS row
+            MATCH (a:KGNode)-[r:`{rel_type}`]->(b:KGNode)
+            WHERE a.id = row.source_id AND b.id = row.target_id
+            SET r = row.props
+        """, rows)
+
+    def stats(self):
+        """返回差异统计 (各类行数、批次数、耗时)"""
+        return {
+            **self.counts,
+            "batches": self.loader.batch_count,
+            "batch_size": self.batch_size,
+            "seconds": round(self.elapsed, 3),
+        }
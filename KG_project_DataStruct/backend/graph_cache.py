@@ -0,0 +1,99 @@
+"""
+图数据快照缓存模块
+数据库中维护一个图版本号 (:KGSequence {name: 'graph_version'})，每次修改图数据时加一；
+/api/graph 的序列化结果按 (版本号, 请求参数) 缓存在进程内，并以版本号作为 ETag，
+图未变化时轮询请求直接命中缓存或返回 304
+"""
+import threading
+from collections import OrderedDict
+from config import Config
+from steps import run_queries
+
+# 图版本计数器名称 (与 id 分配器共用 :KGSequence 节点和唯一约束)
+GRAPH_VERSION = 'graph_version'
+
+# 读取图版本号的语句 (参数 name=GRAPH_VERSION)
+VERSION_QUERY = """
+    MATCH (s:KGSequence {name: $name})
+    RETURN s.value AS value
+"""
+
+
+def version_steps():
+    """查询步骤 (见 steps.py): 读取当前图版本号 (按 name 唯一约束索引查找，开销很小)，计数器节点尚未创建时为 0"""
+    records = yield VERSION_QUERY, {"name": GRAPH_VERSION}
+    return records[0]['value'] if records and records[0]['value'] is not None else 0
+
+
+def current_version(session):
+    """读取当前图版本号"""
+    return run_queries(session, version_steps())
+
+
+def mark_graph_changed(session):
+    """
+    图数据被修改后调用，版本号加一并返回新版本号
+    与 id 分配器相同，先 SET s._lock 取得写锁再自增，避免并发丢失更新
+    """
+    record = session.run("""
+        MERGE (s:KGSequence {name: $name})
+        SET s._lock = true
+        WITH s
+        SET s.value = coalesce(s.value, 0) + 1
+        REMOVE s._lock
+        RETURN s.value AS value
+    """, name=GRAPH_VERSION).single()
+    return record['value']
+
+
+def apply_change(tx, cypher, params):
+    """
+    事务函数: 执行一条修改语句，语句有返回行 (即命中了节点 / 关系) 时在同一事务中递增图版本号
+    用法: version = db.write(apply_change, cypher, {...})，返回新版本号，未命中时返回 None
+    """
+    if tx.run(cypher, params).peek() is None:
+        return None
+    return mark_graph_changed(tx)
+
+
+def etag_for(version, variant=None):
+    """根据图版本号生成 ETag 值，同一数据的不同表示 (variant，如列式格式) 使用不同的 ETag"""
+    return f"graph-{version}-{variant}" if variant else f"graph-{version}"
+
+
+class GraphCache:
+    """
+    进程内 LRU 缓存，保存序列化后的响应体 (bytes)
+    键为 (图版本号, 请求参数)，版本号变化后旧条目自然失效并被淘汰
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or Config.GRAPH_CACHE_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key):
+        with self._lock:
+            body = self._entries.get((version, key))
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((version, key))
+            self.hits += 1
+            return body
+
+    def put(self, version, key, body):
+        with self._lock:
+            # 丢弃旧版本的条目
+            for cached_version, cached_key in list(self._entries):
+                if cached_version < version:
+                    del self._entries[(cached_version, cached_key)]
+            self._entries[(version, key)] = body
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# 全局图数据缓存
+graph_cache = GraphCache()
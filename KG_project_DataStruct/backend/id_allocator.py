@@ -0,0 +1,72 @@
+"""
+节点 ID 分配模块
+在数据库中维护一个计数器节点 (:KGSequence)，每次原子地租用一整块 id，
+块内的 id 在进程内分配，创建节点时不再需要 max(n.id) 全库扫描
+"""
+import threading
+from config import Config
+
+
+class IdAllocator:
+    """
+    按块租用的 id 分配器 (线程安全)
+    多个进程 (如 gunicorn 的多个 worker) 各自租用互不重叠的 id 块，
+    计数器只增不减，因此分配出的 id 在并发写入时也保持唯一
+    """
+
+    def __init__(self, name='node_id', block_size=None):
+        self.name = name
+        self.block_size = block_size or Config.ID_BLOCK_SIZE
+        self._lock = threading.Lock()
+        # 当前租用块中下一个可用 id 与块的上界 (含)
+        self._next = 1
+        self._limit = 0
+
+    def next_id(self, session):
+        """分配一个新 id"""
+        return self.allocate(session, 1)[0]
+
+    def allocate(self, session, count):
+        """一次分配 count 个 id，返回 id 列表"""
+        ids = []
+        with self._lock:
+            while len(ids) < count:
+                if self._next > self._limit:
+                    self._lease(session, max(self.block_size, count - len(ids)))
+                take = min(count - len(ids), self._limit - self._next + 1)
+                ids.extend(range(self._next, self._next + take))
+                self._next += take
+        return ids
+
+    def reset(self):
+        """
+        丢弃本进程尚未用完的 id 块
+        数据库被整体替换 (/api/init、/api/import) 或分配出的 id 发生冲突时调用
+        """
+        with self._lock:
+            self._next = 1
+            self._limit = 0
+
+    def _lease(self, session, size):
+        """
+        从计数器节点租用 size 个 id
+        - 计数器不小于当前最大节点 id (按 id 索引倒序取第一个)，导入新数据后可自动追上
+        - 先 SET s._lock 取得节点写锁再读取计数器，避免并发事务丢失更新
+        """
+        record = session.run("""
+            OPTIONAL MATCH (n:KGNode) WHERE n.id IS NOT NULL
+            WITH n ORDER BY n.id DESC LIMIT 1
+            WITH coalesce(n.id, 0) AS max_id
+            MERGE (s:KGSequence {name: $name})
+            SET s._lock = true
+            WITH s, max_id
+            SET s.value = CASE WHEN s.value > max_id THEN s.value ELSE max_id END + $size
+            REMOVE s._lock
+            RETURN s.value AS value
+        """, name=self.name, size=size).single()
+        self._limit = record['value']
+        self._next = self._limit - size + 1
+
+
+# 全局节点 id 分配器
+id_allocator = IdAllocator()
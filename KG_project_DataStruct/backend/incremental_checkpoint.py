@@ -0,0 +1,404 @@
+"""
+增量检查点模块
+/api/save 第一次 (或无法增量保存时) 把全图导出为基础快照；之后只把上次保存以来被修改过的节点和关系
+(由修改日志 changelog.py 得出) 的当前状态追加为一个增量段，保存耗时与修改量成正比而与图规模无关
+/api/init 把各增量段按顺序叠加到基础快照上恢复；增量段累积到一定数量或大小后，
+由后台线程合并为新的基础快照
+
+目录结构 (Config.CHECKPOINT_DIR):
+  manifest.json                         当前检查点: 基础快照、增量段列表及其覆盖到的修改日志序号和图版本号
+  base-<代>-entity.csv[.gz|.zst]        基础快照 (格式与 /api/import 的实体 / 关系 CSV 相同)
+  base-<代>-relation.csv[.gz|.zst]
+  delta-<代>.jsonl[.gz|.zst]            增量段，每行一条记录:
+    {"node": id, "name", "labels", "properties"}                          节点的当前状态
+    {"node": id, "deleted": true}                                          节点已删除 (其关系随之删除)
+    {"pair": [起点 id, 终点 id], "relationships": [{"type", "properties"}]} 两点间当前的全部关系
+manifest.json 是唯一的提交点: 新文件写完并 fsync 之后才原子替换 manifest，然后删除不再引用的文件，
+任何一步中断都不会破坏上一次的检查点
+"""
+import csv
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from config import Config
+from changelog import change_log
+from checkpoint import COMPRESSION_SUFFIXES, AtomicWriter, atomic_files, file_lock, open_checkpoint
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+LOCK_FILE = 'checkpoint.lock'
+# 检查点目录中由本模块管理的文件 (不包括写入中的临时文件)
+CHECKPOINT_FILE = re.compile(r'^(base-\d+-(entity|relation)\.csv|delta-\d+\.jsonl)(\.gz|\.zst)?$')
+
+ENTITY_COLUMNS = ['id', 'name', 'labels', 'properties']
+RELATION_COLUMNS = ['source_id', 'target_id', 'type', 'properties']
+
+# 修改日志中可以增量保存的操作: 记录中的节点 id / 节点对
+NODE_OPS = ('node_created', 'node_updated', 'node_deleted', 'label_added', 'label_removed')
+RELATIONSHIP_OPS = ('relationship_created', 'relationship_updated', 'relationship_deleted')
+# 由检查点恢复的 graph_replaced 不要求全量保存: 恢复前后被修改过的节点和关系都在修改日志中，
+# 重新读取它们的当前状态即可
+RESTORED_SOURCE = "saved checkpoint"
+
+
+def entity_row(node_id, name, labels, properties):
+    """生成实体 CSV 行"""
+    return {"id": node_id, "name": name, "labels": "|".join(labels),
+            "properties": json.dumps(properties, ensure_ascii=False)}
+
+
+def relation_row(source_id, target_id, rel_type, properties):
+    """生成关系 CSV 行"""
+    return {"source_id": source_id, "target_id": target_id, "type": rel_type,
+            "properties": json.dumps(properties, ensure_ascii=False)}
+
+
+def write_rows(out, columns, rows):
+    """把行写为带表头的 CSV，返回行数"""
+    writer = csv.DictWriter(out, columns, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Overlay:
+    """
+    按顺序叠加的增量段 (后面的段覆盖前面的)
+    恢复和合并时把基础快照的行依次流过 entities / relations，内存占用只与增量段中的记录数有关
+    """
+
+    def __init__(self):
+        self.nodes = {}   # 节点 id -> (name, labels, properties)，已删除为 None
+        self.pairs = {}   # (起点 id, 终点 id) -> [(类型, 属性)]
+
+    def __bool__(self):
+        return bool(self.nodes or self.pairs)
+
+    def load(self, path):
+        with open_checkpoint(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "node" in record:
+                    self.nodes[record["node"]] = None if record.get("deleted") else (
+                        record["name"], record["labels"], record["properties"])
+                else:
+                    source_id, target_id = record["pair"]
+                    self.pairs[(source_id, target_id)] = [
+                        (rel["type"], rel["properties"]) for rel in record["relationships"]]
+
+    def entities(self, rows):
+        """基础快照的实体行 -> 叠加增量段后的实体行"""
+        if not self.nodes:
+            yield from rows
+            return
+        for row in rows:
+            if _int(row.get('id')) not in self.nodes:
+                yield row
+        for node_id, node in self.nodes.items():
+            if node is not None:
+                yield entity_row(node_id, *node)
+
+    def relations(self, rows):
+        """基础快照的关系行 -> 叠加增量段后的关系行 (被删除节点的关系同时去掉)"""
+        if not self:
+            yield from rows
+            return
+        deleted = {node_id for node_id, node in self.nodes.items() if node is None}
+        for row in rows:
+            source_id, target_id = _int(row.get('source_id')), _int(row.get('target_id'))
+            if (source_id, target_id) in self.pairs or source_id in deleted or target_id in deleted:
+                continue
+            yield row
+        for (source_id, target_id), relationships in self.pairs.items():
+            if source_id in deleted or target_id in deleted:
+                continue
+            for rel_type, properties in relationships:
+                yield relation_row(source_id, target_id, rel_type, properties)
+
+
+class IncrementalCheckpoint:
+    """
+    增量检查点
+    保存、恢复与合并的最终切换都持有进程内锁和目录下的文件锁 (见 checkpoint.file_lock)，
+    多个工作进程可以共用同一个检查点目录；合并时读写文件不持有锁，不阻塞保存
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or Config.CHECKPOINT_DIR
+        self._lock = threading.Lock()
+        self._compactor = None  # 后台合并线程
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _locked(self):
+        return file_lock(self._path(LOCK_FILE), self._lock)
+
+    def manifest(self):
+        """当前检查点的 manifest，没有检查点时返回 None"""
+        try:
+            with open(self._path(MANIFEST), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _commit(self, manifest):
+        """持有锁时调用: 原子替换 manifest.json，然后删除不再引用的文件"""
+        with atomic_files(self._path(MANIFEST)) as (out,):
+            json.dump(manifest, out, ensure_ascii=False, indent=2)
+        self._collect(manifest)
+
+    def _collect(self, manifest):
+        referenced = set()
+        if manifest is not None:
+            referenced = {manifest["base"]["entity"], manifest["base"]["relation"]}
+            referenced.update(delta["file"] for delta in manifest["deltas"])
+        for name in os.listdir(self.directory):
+            if CHECKPOINT_FILE.match(name) and name not in referenced:
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    # Windows 下文件仍被其他请求打开，下次提交时再删除
+                    pass
+
+    # ---------- 保存 ----------
+
+    def save(self, store, compression='', full=False):
+        """
+        保存检查点，返回 {"type": full / delta, "seq", "nodes", "relationships", "deltas", "seconds"}
+        满足以下任一条件时全量保存: 还没有检查点、full 为真、修改日志被禁用或所需记录已被清理、
+        上次保存后图数据被 /api/import 或原始文件整体替换、修改日志没有覆盖上次保存以来的每个图版本号
+        (修改已提交但日志写入失败、进程在两者之间退出或日志曾被关闭)
+        nodes / relationships 为写入的节点数和关系数 (增量保存时为被修改的节点数和节点对数)
+        """
+        started = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        with self._locked():
+            manifest = self.manifest()
+            # 依次读取图版本号、日志序号，最后读取图数据: 之后到达的修改一定在下次保存的范围内
+            version = store.version()
+            seq = change_log.latest()
+            dirty = None
+            if not full and manifest is not None and "version" in manifest:
+                dirty = self._dirty(manifest["seq"], seq, manifest["version"], version)
+            if dirty is None:
+                manifest, info = self._save_full(store, manifest, seq, compression)
+            else:
+                manifest, info = self._save_delta(store, manifest, seq, compression, *dirty)
+            manifest["version"] = version
+            self._commit(manifest)
+            self._maybe_compact(manifest)
+
+        info.update(seq=seq, deltas=len(manifest["deltas"]), seconds=round(time.perf_counter() - started, 3))
+        return info
+
+    @staticmethod
+    def _dirty(since, seq, since_version, version):
+        """
+        读取修改日志 (since, seq] 中被修改的节点 id 和节点对
+        这些记录必须覆盖图版本号 (since_version, version] 中的每一个版本，否则有修改没有写入日志
+        返回 (节点 id 集合, 节点对集合)，无法增量保存时返回 None
+        """
+        if not change_log.enabled or since > seq or since_version > version:
+            return None
+        nodes, pairs, versions = set(), set(), set()
+        while since < seq:
+            page = change_log.read(since, Config.CHANGES_PAGE_MAX)
+            if page["reset"] or not page["changes"]:
+                return None
+            for change in page["changes"]:
+                if change["seq"] > seq:
+                    break
+                versions.add(change["version"])
+                if change["op"] in NODE_OPS:
+                    nodes.add(change["id"])
+                elif change["op"] in RELATIONSHIP_OPS:
+                    pairs.add((change["source"], change["target"]))
+                elif change["op"] != 'graph_replaced' or change.get("source") != RESTORED_SOURCE:
+                    return None
+            since = page["next"]
+        if any(v not in versions for v in range(since_version + 1, version + 1)):
+            return None
+        return nodes, pairs
+
+    def _save_full(self, store, manifest, seq, compression):
+        generation = (manifest["generation"] if manifest else 0) + 1
+        suffix = COMPRESSION_SUFFIXES[compression]
+        base = {
+            "entity": f"base-{generation}-entity.csv{suffix}",
+            "relation": f"base-{generation}-relation.csv{suffix}",
+            "compression": compression,
+            "seq": seq,
+        }
+        # 从存储流式读取节点和关系，边读边写，内存占用与图规模无关
+        # (文件名带有代数，替换 manifest 才是提交点，不需要多文件提交日志)
+        with atomic_files(self._path(base["entity"]), self._path(base["relation"]),
+                          compression=compression, journal=False) as (entity_out, relation_out):
+            base["nodes"] = write_rows(entity_out, ENTITY_COLUMNS,
+                                       (entity_row(*node) for node in store.export_nodes()))
+            base["relationships"] = write_rows(relation_out, RELATION_COLUMNS,
+                                               (relation_row(*rel) for rel in store.export_relationships()))
+        base["bytes"] = self._size(base)
+
+        manifest = {"generation": generation, "seq": seq, "base": base, "deltas": []}
+        return manifest, {"type": "full", "nodes": base["nodes"], "relationships": base["relationships"]}
+
+    def _save_delta(self, store, manifest, seq, compression, nodes, pairs):
+        info = {"type": "delta", "nodes": len(nodes), "relationships": len(pairs)}
+        if not nodes and not pairs:
+            # 没有修改，只推进序号
+            return dict(manifest, seq=seq), info
+
+        generation = manifest["generation"] + 1
+        delta = {"file": f"delta-{generation}.jsonl{COMPRESSION_SUFFIXES[compression]}",
+                 "generation": generation, "seq": seq, "nodes": len(nodes), "relationships": len(pairs)}
+
+        # 读取被修改的节点和节点对的当前状态，不存在的节点记为已删除
+        found = {node_id: (name, labels, props)
+                 for node_id, name, labels, props in store.export_nodes_by_id(sorted(nodes))}
+        relationships = {pair: [] for pair in pairs}
+        for source_id, target_id, rel_type, props in store.export_relationships_between(sorted(pairs)):
+            relationships[(source_id, target_id)].append({"type": rel_type, "properties": props})
+
+        with atomic_files(self._path(delta["file"]), compression=compression) as (out,):
+            for node_id in sorted(nodes):
+                if node_id in found:
+                    name, labels, props = found[node_id]
+                    record = {"node": node_id, "name": name, "labels": labels, "properties": props}
+                else:
+                    record = {"node": node_id, "deleted": True}
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            for pair in sorted(pairs):
+                out.write(json.dumps({"pair": list(pair), "relationships": relationships[pair]},
+                                     ensure_ascii=False) + '\n')
+        delta["bytes"] = os.path.getsize(self._path(delta["file"]))
+
+        return dict(manifest, generation=generation, seq=seq, deltas=manifest["deltas"] + [delta]), info
+
+    def _size(self, base):
+        return os.path.getsize(self._path(base["entity"])) + os.path.getsize(self._path(base["relation"]))
+
+    # ---------- 恢复 ----------
+
+    @contextmanager
+    def restore(self):
+        """
+        打开当前检查点用于恢复，期间持有锁 (合并不会删除正在读取的文件)
+        产生 (基础实体文件, 基础关系文件, Overlay)，没有检查点时产生 None
+        用法: loader.load_entities(overlay.entities(csv.DictReader(f)))，关系同理
+        """
+        with self._locked():
+            manifest = self.manifest()
+            if manifest is None:
+                yield None
+                return
+            overlay = Overlay()
+            for delta in manifest["deltas"]:
+                overlay.load(self._path(delta["file"]))
+            yield self._path(manifest["base"]["entity"]), self._path(manifest["base"]["relation"]), overlay
+
+    def clear(self):
+        """删除检查点 (导入新数据之后调用)"""
+        if not os.path.isdir(self.directory):
+            return
+        with self._locked():
+            if os.path.exists(self._path(MANIFEST)):
+                os.remove(self._path(MANIFEST))
+            self._collect(None)
+
+    # ---------- 合并 ----------
+
+    def _maybe_compact(self, manifest):
+        """持有锁时调用: 增量段数达到 CHECKPOINT_MAX_DELTAS 或总大小超过基础快照的 CHECKPOINT_COMPACT_RATIO 倍时启动后台合并"""
+        deltas = manifest["deltas"]
+        if not deltas or (self._compactor is not None and self._compactor.is_alive()):
+            return
+        delta_bytes = sum(delta["bytes"] for delta in deltas)
+        if len(deltas) < Config.CHECKPOINT_MAX_DELTAS and \
+                delta_bytes < Config.CHECKPOINT_COMPACT_RATIO * manifest["base"]["bytes"]:
+            return
+        self._compactor = threading.Thread(target=self._compact_in_background, name='checkpoint-compaction',
+                                           daemon=True)
+        self._compactor.start()
+
+    def _compact_in_background(self):
+        try:
+            merged = self.compact()
+            if merged:
+                logger.info("Compacted %d checkpoint deltas into a new base snapshot", merged)
+        except Exception:
+            logger.exception("Checkpoint compaction failed")
+
+    def compact(self):
+        """
+        把基础快照与当前所有增量段合并为新的基础快照，返回合并的增量段数
+        合并期间到达的增量段保留在新的 manifest 中；合并期间发生全量保存时放弃本次合并
+        """
+        with self._locked():
+            manifest = self.manifest()
+            if manifest is None or not manifest["deltas"]:
+                return 0
+            base, deltas = manifest["base"], manifest["deltas"]
+            overlay = Overlay()
+            for delta in deltas:
+                overlay.load(self._path(delta["file"]))
+            # 在锁内打开基础快照，之后的保存即使删除了这些文件也不影响读取
+            entity_in = open_checkpoint(self._path(base["entity"]))
+            relation_in = open_checkpoint(self._path(base["relation"]))
+
+        # 新快照沿用基础快照的压缩方式，以最后一个被合并的增量段的代号命名
+        generation, suffix = deltas[-1]["generation"], COMPRESSION_SUFFIXES[base["compression"]]
+        merged = {
+            "entity": f"base-{generation}-entity.csv{suffix}",
+            "relation": f"base-{generation}-relation.csv{suffix}",
+            "compression": base["compression"],
+            "seq": deltas[-1]["seq"],
+        }
+        writers = []
+        try:
+            with entity_in, relation_in:
+                for name in (merged["entity"], merged["relation"]):
+                    writers.append(AtomicWriter(self._path(name), base["compression"]))
+                merged["nodes"] = write_rows(writers[0].file, ENTITY_COLUMNS,
+                                             overlay.entities(csv.DictReader(entity_in)))
+                merged["relationships"] = write_rows(writers[1].file, RELATION_COLUMNS,
+                                                     overlay.relations(csv.DictReader(relation_in)))
+            for writer in writers:
+                writer.flush_to_disk()
+        except BaseException:
+            for writer in writers:
+                writer.abort()
+            raise
+
+        with self._locked():
+            current = self.manifest()
+            if current is None or current["base"] != base or current["deltas"][:len(deltas)] != deltas:
+                for writer in writers:
+                    writer.abort()
+                return 0
+            for writer in writers:
+                writer.commit()
+            merged["bytes"] = self._size(merged)
+            self._commit(dict(current, base=merged, deltas=current["deltas"][len(deltas):]))
+        return len(deltas)
+
+
+# 全局增量检查点实例
+checkpoints = IncrementalCheckpoint()
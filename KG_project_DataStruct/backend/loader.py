@@ -0,0 +1,358 @@
+"""
+批量导入模块
+将 CSV 行按标签集合 (节点) / 关系类型 (关系) 分组，
+通过 UNWIND $rows 在显式事务中成批写入 Neo4j，替代逐行 session.run
+"""
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from neo4j.exceptions import TransientError
+from config import Config
+from db import db
+from schema import BASE_LABEL
+
+
+def parse_labels(row):
+    """
+    解析实体行的标签 (支持 | 分隔)，兼容旧格式的 label1, label2 ... 列
+    标签中的空格替换为下划线，没有标签时返回 ['Unknown']
+    """
+    labels_str = row.get('labels', '')
+    if not labels_str:
+        # 兼容旧格式
+        labels = []
+        for key in row.keys():
+            if key and key.lower().startswith('label'):
+                value = row.get(key, '')
+                if value and value.strip():
+                    labels.append(value.strip().replace(' ', '_'))
+    else:
+        labels = [l.strip().replace(' ', '_') for l in labels_str.split('|') if l.strip()]
+
+    return labels or ['Unknown']
+
+
+def parse_properties(props_str):
+    """解析 JSON 属性字符串，解析失败或不是对象时返回空字典"""
+    try:
+        properties = json.loads(props_str or '{}')
+    except json.JSONDecodeError:
+        return {}
+    return properties if isinstance(properties, dict) else {}
+
+
+def parse_entity_row(row):
+    """
+    解析一行实体数据
+    返回 (标签元组, 属性字典)，属性中包含 id 和 name
+    """
+    properties = parse_properties(row.get('properties', '{}'))
+    # 确保 id 和 name 存在
+    properties['id'] = int(row['id'])
+    properties['name'] = row['name']
+    return tuple(parse_labels(row)), properties
+
+
+def parse_relation_row(row):
+    """
+    解析一行关系数据
+    返回 (关系类型, {source_id, target_id, props})
+    """
+    rel_type = (row.get('type') or row.get('relation') or 'RELATED_TO').replace(' ', '_')
+    return rel_type, {
+        "source_id": int(row['source_id']),
+        "target_id": int(row['target_id']),
+        "props": parse_properties(row.get('properties', '{}')),
+    }
+
+
+def node_statement(labels):
+    """生成按标签分组批量创建节点的 Cypher 语句"""
+    # 标签不能作为参数传递，只能拼接到 Cypher 字符串中，例如 :`KGNode`:`Data_Structure`:`Linear`
+    # 每个节点都带上基础标签，以便使用 id 唯一约束索引
+    labels = [BASE_LABEL] + [label for label in labels if label != BASE_LABEL]
+    labels_cypher = ':'.join([f'`{label}`' for label in labels])
+    return f"""
+        UNWIND $rows AS props
+        CREATE (n:{labels_cypher})
+        SET n = props
+    """
+
+
+def relation_statement(rel_type):
+    """生成按类型分组批量创建关系的 Cypher 语句"""
+    # MERGE 避免重复关系，SET r += row.props 更新或设置属性
+    return f"""
+        UNWIND $rows AS row
+        MATCH (a:KGNode) WHERE a.id = row.source_id
+        MATCH (b:KGNode) WHERE b.id = row.target_id
+        MERGE (a)-[r:`{rel_type}`]->(b)
+        SET r += row.props
+    """
+
+
+class BulkLoader:
+    """
+    批量导入器
+    行数据先按分组键缓冲，某一组攒满 batch_size 行时立即作为一个事务提交，
+    因此内存占用只与 (分组数 × batch_size) 有关，与文件大小无关
+    """
+
+    def __init__(self, session, batch_size=None):
+        self.session = session
+        self.batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+        self.node_count = 0
+        self.relationship_count = 0
+        self.batch_count = 0
+        self.elapsed = 0.0
+        # 按标签元组 / 关系类型分组的待提交行
+        self._node_buffers = {}
+        self._relation_buffers = {}
+
+    def clear(self):
+        """
+        清空数据库 (保留 id 计数器节点，保证分配出的 id 单调递增)
+        使用 CALL { ... } IN TRANSACTIONS 分批删除，避免单个超大事务撑爆内存
+        (该语法只能在自动提交事务中执行，所以这里直接使用 session.run)
+        """
+        started = time.perf_counter()
+        self.session.run(f"""
+            MATCH (n) WHERE NOT n:KGSequence
+            CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF {int(self.batch_size)} ROWS
+        """).consume()
+        self.elapsed += time.perf_counter() - started
+
+    def load_entities(self, rows):
+        """导入实体行 (csv.DictReader 或任意 dict 可迭代对象)"""
+        started = time.perf_counter()
+        for row in rows:
+            self.add_node(*parse_entity_row(row))
+        self.flush()
+        self.elapsed += time.perf_counter() - started
+
+    def load_relations(self, rows):
+        """导入关系行，端点节点必须已经存在"""
+        started = time.perf_counter()
+        for row in rows:
+            self.add_relation(*parse_relation_row(row))
+        self.flush()
+        self.elapsed += time.perf_counter() - started
+
+    def add_node(self, labels, properties):
+        """缓冲一个待创建的节点，所在分组攒满 batch_size 时立即提交"""
+        buffer = self._node_buffers.setdefault(tuple(labels), [])
+        buffer.append(properties)
+        if len(buffer) >= self.batch_size:
+            self._flush_nodes(tuple(labels), buffer)
+            self._node_buffers[tuple(labels)] = []
+
+    def add_relation(self, rel_type, item):
+        """缓冲一个待创建的关系 ({source_id, target_id, props})"""
+        buffer = self._relation_buffers.setdefault(rel_type, [])
+        buffer.append(item)
+        if len(buffer) >= self.batch_size:
+            self._flush_relations(rel_type, buffer)
+            self._relation_buffers[rel_type] = []
+
+    def flush(self):
+        """提交所有分组中剩余的行 (先节点后关系)"""
+        for labels, buffer in self._node_buffers.items():
+            if buffer:
+                self._flush_nodes(labels, buffer)
+        self._node_buffers = {}
+        for rel_type, buffer in self._relation_buffers.items():
+            if buffer:
+                self._flush_relations(rel_type, buffer)
+        self._relation_buffers = {}
+
+    def _flush_nodes(self, labels, rows):
+        self.run_batch(node_statement(labels), rows)
+        self.node_count += len(rows)
+
+    def _flush_relations(self, rel_type, rows):
+        self.run_batch(relation_statement(rel_type), rows)
+        self.relationship_count += len(rows)
+
+    def run_batch(self, cypher, rows):
+        """在一个显式事务中执行一批数据，失败时回滚该批次"""
+        with self.session.begin_transaction() as tx:
+            tx.run(cypher, rows=rows).consume()
+            tx.commit()
+        self.batch_count += 1
+
+    def stats(self):
+        """返回导入统计信息 (行数、批次数、耗时、每秒行数)"""
+        total = self.node_count + self.relationship_count
+        return {
+            "nodes": self.node_count,
+            "relationships": self.relationship_count,
+            "batches": self.batch_count,
+            "batch_size": self.batch_size,
+            "seconds": round(self.elapsed, 3),
+            "rows_per_second": round(total / self.elapsed, 1) if self.elapsed > 0 else None,
+        }
+
+
+class ParallelLoader(BulkLoader):
+    """
+    多线程并行导入器
+    每个工作线程使用自己的数据库会话:
+    - 节点阶段: 主线程解析并分组，攒满的批次交给线程池并发提交；全部完成后才进入关系阶段
+    - 关系阶段: 按端点 id 取模把节点分成 2 × workers 个桶，关系落入 (源桶, 目标桶) 单元格；
+      以轮转赛程 (circle method) 分轮执行，同一轮内各单元格涉及的桶互不相交，
+      并发事务不会锁住同一个端点节点，从而避免死锁
+    """
+
+    # 遇到死锁等临时错误时每个批次的最大尝试次数
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, session, batch_size=None, workers=None):
+        super().__init__(session, batch_size)
+        self.workers = max(1, workers or Config.IMPORT_WORKERS)
+        self.bucket_count = 2 * self.workers
+        # 关系按窗口分批调度，窗口内的行数决定关系阶段的内存占用
+        self.window_rows = self.batch_size * self.bucket_count * 2
+        self._pool = None
+        self._pending = set()
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+        self._worker_stats = {}
+        self._owner = threading.current_thread()
+
+    def load_entities(self, rows):
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix='import-worker') as pool:
+                self._pool = pool
+                try:
+                    for row in rows:
+                        self.add_node(*parse_entity_row(row))
+                    self.flush()
+                    self._wait(self._pending)
+                finally:
+                    self._pool = None
+                    self._pending = set()
+        finally:
+            # 导入失败时也关闭各工作线程的会话 (线程池退出时所有任务已结束)
+            self._close_sessions()
+        self.elapsed += time.perf_counter() - started
+
+    def load_relations(self, rows):
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix='import-worker') as pool:
+                window = []
+                for row in rows:
+                    window.append(parse_relation_row(row))
+                    if len(window) >= self.window_rows:
+                        self._load_relation_window(pool, window)
+                        window = []
+                if window:
+                    self._load_relation_window(pool, window)
+        finally:
+            self._close_sessions()
+        self.elapsed += time.perf_counter() - started
+
+    def _flush_nodes(self, labels, rows):
+        if self._pool is None:
+            return super()._flush_nodes(labels, rows)
+        # 限制排队中的批次数，避免解析速度快于写入时缓冲区无限增长
+        if len(self._pending) >= 2 * self.workers:
+            done, self._pending = wait(self._pending, return_when=FIRST_COMPLETED)
+            self._wait(done)
+        self._pending.add(self._pool.submit(self.run_batch, node_statement(labels), rows))
+        self.node_count += len(rows)
+
+    def _load_relation_window(self, pool, items):
+        """把一个窗口内的关系分配到单元格，并按轮次并发导入"""
+        cells = {}
+        for rel_type, item in items:
+            a = item['source_id'] % self.bucket_count
+            b = item['target_id'] % self.bucket_count
+            cell = cells.setdefault((min(a, b), max(a, b)), {})
+            cell.setdefault(rel_type, []).append(item)
+        self.relationship_count += len(items)
+
+        for round_cells in self._rounds():
+            futures = [pool.submit(self._load_cell, cells[cell]) for cell in round_cells if cell in cells]
+            self._wait(futures)
+
+    def _load_cell(self, groups):
+        """在当前工作线程中导入一个单元格的全部关系"""
+        for rel_type, items in groups.items():
+            for i in range(0, len(items), self.batch_size):
+                self.run_batch(relation_statement(rel_type), items[i:i + self.batch_size])
+
+    def _rounds(self):
+        """
+        生成调度轮次，每轮是一组互不共享桶的单元格
+        第一轮为所有 (i, i) 单元格，其余 bucket_count - 1 轮按轮转赛程两两配对，覆盖所有 (i, j)
+        """
+        yield [(i, i) for i in range(self.bucket_count)]
+        others = list(range(1, self.bucket_count))
+        for _ in range(self.bucket_count - 1):
+            ring = [0] + others
+            half = self.bucket_count // 2
+            yield [tuple(sorted((ring[k], ring[-1 - k]))) for k in range(half)]
+            others = others[-1:] + others[:-1]
+
+    def run_batch(self, cypher, rows):
+        """在工作线程自己的会话中提交一批数据，遇到死锁等临时错误时重试"""
+        session = self._thread_session()
+        started = time.perf_counter()
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                with session.begin_transaction() as tx:
+                    tx.run(cypher, rows=rows).consume()
+                    tx.commit()
+                break
+            except TransientError:
+                if attempt == self.MAX_ATTEMPTS:
+                    raise
+                time.sleep(0.1 * attempt)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.batch_count += 1
+            worker = self._worker_stats.setdefault(threading.current_thread().name, [0, 0.0])
+            worker[0] += len(rows)
+            worker[1] += elapsed
+
+    def _thread_session(self):
+        """创建导入器的线程使用传入的会话，每个工作线程第一次提交时创建自己的会话"""
+        if threading.current_thread() is self._owner:
+            return self.session
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = db.get_session()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def _close_sessions(self):
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+        self._local = threading.local()
+
+    @staticmethod
+    def _wait(futures):
+        """等待一组任务完成，任何一个失败都抛出其异常"""
+        for future in futures:
+            future.result()
+
+    def stats(self):
+        """在 BulkLoader 统计信息的基础上增加每个工作线程的吞吐量"""
+        stats = super().stats()
+        stats["workers"] = self.workers
+        stats["per_worker"] = [{
+            "worker": name,
+            "rows": rows,
+            "busy_seconds": round(seconds, 3),
+            "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None,
+        } for name, (rows, seconds) in sorted(self._worker_stats.items())]
+        return stats
@@ -0,0 +1,414 @@
+"""
+监控指标模块 (Prometheus 文本格式，由 /api/metrics 输出)
+- HTTP 中间件: 按路由记录请求耗时直方图、按状态码计数 (流式响应在响应体发送完毕后记录)
+- 数据库会话包装: Neo4jConnection.get_session() 返回 InstrumentedSession，
+  按事务函数记录托管事务耗时，按发出查询的函数 (命名查询) 记录语句耗时、返回行数和错误数，
+  并记录从连接池获取连接的耗时；每条语句同时交给 profiling 按模板汇总 (PROFILE 采样与慢查询日志)
+指标类型只实现了需要的 Counter / Histogram，不依赖 prometheus_client
+"""
+import sys
+import threading
+import time
+from flask import g, has_request_context, request
+from profiling import query_stats, should_profile
+
+# 默认直方图分桶 (秒)，与 Prometheus 客户端库一致
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 查找命名查询时跳过的模块 (包装层自身)
+INTERNAL_MODULES = ('db', 'metrics', 'steps')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """单调递增计数器，labels 为标签名元组"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield self.name + _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    """累积分桶直方图，输出 _bucket / _sum / _count"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values = {}  # 标签值 -> [各桶计数, 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield (self.name + '_bucket' + _format_labels(self.labels, label_values, [('le', _format_value(bound))]),
+                       cumulative)
+            yield self.name + '_sum' + _format_labels(self.labels, label_values), total
+            yield self.name + '_count' + _format_labels(self.labels, label_values), count
+
+
+class Registry:
+    """指标注册表；由其他模块维护的数值 (缓存命中数、索引规模等) 以回调形式注册，输出时才读取"""
+
+    def __init__(self):
+        self._metrics = []
+        self._callbacks = []
+
+    def counter(self, name, documentation, labels=()):
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_callback(self, name, documentation, callback, kind='gauge'):
+        """callback() 返回当前数值 (None 表示暂无数据)，kind 为 gauge 或 counter"""
+        self._callbacks.append((name, documentation, callback, kind))
+
+    def render(self):
+        """Prometheus 文本格式 (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{sample} {_format_value(value)}' for sample, value in metric.samples())
+        for name, documentation, callback, kind in self._callbacks:
+            try:
+                value = callback()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# 全局注册表与指标
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    'kg_http_requests_total', 'HTTP requests by route and status', ('method', 'route', 'status'))
+HTTP_DURATION = registry.histogram(
+    'kg_http_request_duration_seconds', 'HTTP request latency by route (until the body is sent)', ('method', 'route'))
+ERRORS = registry.counter(
+    'kg_errors_total', 'Exceptions converted to error responses', ('route', 'error'))
+TRANSACTION_DURATION = registry.histogram(
+    'kg_transaction_duration_seconds', 'Managed transaction latency including retries', ('name', 'mode'))
+QUERY_DURATION = registry.histogram(
+    'kg_query_duration_seconds', 'Cypher statement latency until the result is consumed', ('query',))
+QUERY_ROWS = registry.counter(
+    'kg_query_rows_total', 'Rows returned by Cypher statements', ('query',))
+QUERY_ERRORS = registry.counter(
+    'kg_query_errors_total', 'Failed Cypher statements', ('query', 'error'))
+QUERY_SCANS = registry.counter(
+    'kg_query_full_scans_total', 'Sampled query plans containing a full scan operator', ('query', 'operator'))
+POOL_WAIT = registry.histogram(
+    'kg_pool_acquire_seconds', 'Time to obtain a connection from the driver pool',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0))
+
+
+# ---------- HTTP 中间件 ----------
+
+def current_route():
+    """当前请求匹配的路由模板 (如 /api/node/<int:node_id>)，未匹配时为 <unmatched>"""
+    return request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+
+
+def init_app(app):
+    """注册请求计时；流式响应在响应关闭 (响应体发送完毕) 时记录"""
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        method, route, status = request.method, current_route(), response.status_code
+
+        def record():
+            record_request_metrics(method, route, status, start)
+
+        if response.is_streamed:
+            response.call_on_close(record)
+        else:
+            record()
+        return response
+
+
+def record_request_metrics(method, route, status, start):
+    """记录一次请求的耗时 (start 为开始时的 time.perf_counter()) 与状态码 (Flask 中间件与 asgi.AsyncApp 共用)"""
+    HTTP_DURATION.observe(time.perf_counter() - start, method, route)
+    HTTP_REQUESTS.inc(method, route, str(status))
+
+
+def record_error(error, route=None):
+    """记录被转换为错误响应的异常 (routes.api_error 与 asgi.AsyncApp 调用)，route 默认为当前请求的路由"""
+    if route is None:
+        route = current_route() if has_request_context() else '-'
+    ERRORS.inc(route, type(error).__name__)
+
+
+# ---------- 数据库会话包装 ----------
+
+def _internal(module):
+    """包装层和驱动内部的模块 (托管事务中 Cypher 字符串的调用栈会经过驱动的重试逻辑)"""
+    return module in INTERNAL_MODULES or module == 'neo4j' or module.startswith('neo4j.')
+
+
+def query_name():
+    """命名查询: 发出查询的函数 (跳过包装层与驱动内部)，如 fetch_graph_page"""
+    frame = sys._getframe(1)
+    while frame is not None and _internal(frame.f_globals.get('__name__') or ''):
+        frame = frame.f_back
+    if frame is None:
+        return '<unknown>'
+    code = frame.f_code
+    return getattr(code, 'co_qualname', code.co_name)
+
+
+def work_name(work):
+    """事务函数的名称；Cypher 字符串被包装为内部函数时取调用者"""
+    module = getattr(work, '__module__', None)
+    if module in INTERNAL_MODULES:
+        return query_name()
+    return getattr(work, '__qualname__', getattr(work, '__name__', '<work>'))
+
+
+class InstrumentedResult:
+    """
+    包装查询结果: 统计读取的行数，结果读完 (迭代结束、single、consume、data、value、values) 时记录耗时；
+    peek 只读取第一行而不前移游标 (如读取图版本号)，第一次 peek 时即记录耗时，之后的读取不再计入；
+    以 PROFILE 执行的查询在读完后取结果摘要中的执行计划
+    """
+
+    def __init__(self, result, name, start, query, parameters, profiled=False):
+        self._result = result
+        self._name = name
+        self._start = start
+        self._query = query
+        self._parameters = parameters
+        self._profiled = profiled
+        self._rows = 0
+        self._done = False
+
+    def _finish(self, summary=None):
+        if self._done:
+            return
+        self._done = True
+        duration = time.perf_counter() - self._start
+        QUERY_DURATION.observe(duration, self._name)
+        QUERY_ROWS.inc(self._name, amount=self._rows)
+        profile = None
+        if self._profiled:
+            # 取执行计划失败不影响查询本身
+            try:
+                profile = (summary or self._result.consume()).profile
+            except Exception:
+                profile = None
+        scans = query_stats.record(self._name, self._query, self._parameters, duration, self._rows, profile)
+        for operator in scans:
+            QUERY_SCANS.inc(self._name, operator)
+
+    def _fail(self, error):
+        if not self._done:
+            self._done = True
+            QUERY_ERRORS.inc(self._name, type(error).__name__)
+            query_stats.record(self._name, self._query, self._parameters, time.perf_counter() - self._start,
+                               self._rows, error=type(error).__name__)
+
+    def __iter__(self):
+        try:
+            for record in self._result:
+                self._rows += 1
+                yield record
+        except Exception as e:
+            self._fail(e)
+            raise
+        self._finish()
+
+    def single(self, *args, **kwargs):
+        try:
+            record = self._result.single(*args, **kwargs)
+        except Exception as e:
+            self._fail(e)
+            raise
+        self._rows += record is not None
+        self._finish()
+        return record
+
+    def consume(self):
+        try:
+            summary = self._result.consume()
+        except Exception as e:
+            self._fail(e)
+            raise
+        self._finish(summary)
+        return summary
+
+    def peek(self):
+        try:
+            record = self._result.peek()
+        except Exception as e:
+            self._fail(e)
+            raise
+        if not self._done:
+            self._rows += record is not None
+            self._finish()
+        return record
+
+    def _read_all(self, method, *args):
+        """data / value / values: 读取全部剩余行，返回列表"""
+        try:
+            rows = getattr(self._result, method)(*args)
+        except Exception as e:
+            self._fail(e)
+            raise
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def data(self, *keys):
+        return self._read_all('data', *keys)
+
+    def value(self, key=0, default=None):
+        return self._read_all('value', key, default)
+
+    def values(self, *keys):
+        return self._read_all('values', *keys)
+
+    def __getattr__(self, name):
+        return getattr(self._result, name)
+
+
+class _Runner:
+    """run() 的公共实现 (会话与事务共用)"""
+
+    def __init__(self, target):
+        self._target = target
+
+    def run(self, query, parameters=None, **kwargs):
+        name = query_name()
+        profiled = should_profile(query)
+        params = dict(parameters or {}, **kwargs)
+        start = time.perf_counter()
+        try:
+            result = self._target.run('PROFILE ' + query if profiled else query, parameters, **kwargs)
+        except Exception as e:
+            QUERY_ERRORS.inc(name, type(e).__name__)
+            query_stats.record(name, query, params, time.perf_counter() - start, error=type(e).__name__)
+            raise
+        return InstrumentedResult(result, name, start, query, params, profiled)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+class InstrumentedTransaction(_Runner):
+    """包装事务 (托管事务函数收到的 tx，以及 begin_transaction() 的返回值)"""
+
+    def __enter__(self):
+        self._target.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._target.__exit__(*exc_info)
+
+
+class InstrumentedSession(_Runner):
+    """包装 Neo4j 会话，接口与原会话相同"""
+
+    def __init__(self, session):
+        super().__init__(session)
+        # 驱动没有公开的连接池等待时间，包装会话内部获取连接的方法 _connect 计时 (含新建连接)
+        connect = getattr(session, '_connect', None)
+        if connect is not None:
+            def timed_connect(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return connect(*args, **kwargs)
+                finally:
+                    POOL_WAIT.observe(time.perf_counter() - start)
+            session._connect = timed_connect
+
+    def __enter__(self):
+        self._target.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._target.__exit__(*exc_info)
+
+    def begin_transaction(self, *args, **kwargs):
+        return InstrumentedTransaction(self._target.begin_transaction(*args, **kwargs))
+
+    def execute_read(self, work, *args, **kwargs):
+        return self._execute(self._target.execute_read, 'read', work, args, kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        return self._execute(self._target.execute_write, 'write', work, args, kwargs)
+
+    @staticmethod
+    def _execute(execute, mode, work, args, kwargs):
+        name = work_name(work)
+        start = time.perf_counter()
+
+        def instrumented(tx, *args, **kwargs):
+            return work(InstrumentedTransaction(tx), *args, **kwargs)
+
+        try:
+            return execute(instrumented, *args, **kwargs)
+        finally:
+            TRANSACTION_DURATION.observe(time.perf_counter() - start, name, mode)
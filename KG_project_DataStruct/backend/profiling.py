@@ -0,0 +1,195 @@
+"""
+查询分析模块 (由 metrics 的查询包装调用，结果由 /api/queries 输出)
+- 按查询模板汇总调用次数、总耗时、最大耗时、返回行数和错误数；
+  模板为合并空白、把数字和字符串字面量替换为 ? 之后的 Cypher 文本 (f-string 拼入的 id 等不会产生新模板)
+- 以 PROFILE_SAMPLE_RATE 的比例在查询前加 PROFILE 执行，记录执行计划的 db hits、行数和算子，
+  计划中出现全图扫描 (AllNodesScan 等) 的模板单独标出
+- 耗时超过 SLOW_QUERY_MS 的查询连同参数写入慢查询日志 (logger kg.slow_query)，并保留最近 SLOW_QUERY_KEEP 条
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from config import Config
+
+logger = logging.getLogger('kg.slow_query')
+
+# 不使用索引、扫描全部节点 / 关系的算子
+SCAN_OPERATORS = ('AllNodesScan', 'DirectedAllRelationshipsScan', 'UndirectedAllRelationshipsScan',
+                  'CartesianProduct')
+
+# 不能加 PROFILE 的语句: 已带 EXPLAIN / PROFILE、Schema 命令、CALL { ... } IN TRANSACTIONS
+_UNPROFILABLE = re.compile(
+    r'^\s*(EXPLAIN|PROFILE|SHOW|DROP|CREATE\s+(OR\s+REPLACE\s+)?'
+    r'(CONSTRAINT|INDEX|FULLTEXT|RANGE|TEXT|POINT|LOOKUP|VECTOR|DATABASE))\b'
+    r'|\bIN\s+TRANSACTIONS\b',
+    re.IGNORECASE)
+
+# 字符串字面量、数字字面量 (不含标识符中的数字和 $参数名)
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r'(?<![\w$.])-?\d+(?:\.\d+)?(?![\w.])')
+_WHITESPACE = re.compile(r'\s+')
+
+# 慢查询日志中参数的最大长度 (批量导入的参数可能很大)
+PARAMETER_CHARS = 500
+
+# 模板数达到上限后，新模板合并到这一项
+OTHER_TEMPLATE = '<other>'
+
+SORT_KEYS = ('total_ms', 'max_ms', 'mean_ms', 'calls', 'rows', 'db_hits', 'errors')
+
+
+@lru_cache(maxsize=1024)
+def template(query):
+    """查询模板: 合并空白，字面量替换为 ?"""
+    text = _STRING_LITERAL.sub('?', query)
+    text = _NUMBER_LITERAL.sub('?', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def query_text(query):
+    """run() 的第一个参数可能是字符串或 neo4j.Query"""
+    return str(getattr(query, 'text', query))
+
+
+def should_profile(query):
+    """按采样比例决定本次查询是否以 PROFILE 执行"""
+    rate = Config.PROFILE_SAMPLE_RATE
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return False
+    return isinstance(query, str) and not _UNPROFILABLE.search(query)
+
+
+def plan_stats(profile):
+    """
+    汇总 PROFILE 返回的执行计划 (ResultSummary.profile)
+    返回 (db hits 总数, 根算子输出行数, 算子名列表 (先序、去重))
+    """
+    db_hits, operators = 0, []
+    stack = [profile]
+    while stack:
+        node = stack.pop()
+        db_hits += node.get('dbHits', 0)
+        # 新版本的算子名带有 @neo4j 后缀
+        operator = node.get('operatorType', '').split('@')[0]
+        if operator and operator not in operators:
+            operators.append(operator)
+        stack.extend(reversed(node.get('children', [])))
+    return db_hits, profile.get('rows', 0), operators
+
+
+def _format_parameters(parameters):
+    text = repr(parameters)
+    return text if len(text) <= PARAMETER_CHARS else text[:PARAMETER_CHARS] + '...'
+
+
+class _TemplateStats:
+    __slots__ = ('callers', 'calls', 'errors', 'total', 'max', 'rows',
+                 'profiles', 'db_hits', 'plan_rows', 'operators', 'profiled_at')
+
+    def __init__(self):
+        self.callers = set()
+        self.calls = self.errors = self.rows = 0
+        self.total = self.max = 0.0
+        self.profiles = self.db_hits = self.plan_rows = 0
+        self.operators = []
+        self.profiled_at = None
+
+    def to_dict(self, text):
+        calls = max(self.calls, 1)
+        profiles = max(self.profiles, 1)
+        return {
+            "query": text,
+            "callers": sorted(self.callers),
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / calls, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+            "profiles": self.profiles,
+            # db hits 与计划行数为 PROFILE 采样的平均值，算子为最近一次采样的计划
+            "db_hits": self.db_hits // profiles,
+            "plan_rows": self.plan_rows // profiles,
+            "operators": self.operators,
+            "full_scans": [op for op in self.operators if op in SCAN_OPERATORS],
+            "profiled_at": self.profiled_at,
+        }
+
+
+class QueryStats:
+    """按模板汇总的查询统计与最近的慢查询 (线程安全)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = {}
+        self._slow = deque(maxlen=Config.SLOW_QUERY_KEEP)
+
+    def record(self, name, query, parameters, duration, rows=0, profile=None, error=None):
+        """
+        记录一次查询: name 为发出查询的函数，profile 为 PROFILE 采样得到的执行计划
+        返回计划中的全图扫描算子 (未采样时为空)
+        """
+        text = template(query_text(query))
+        plan = plan_stats(profile) if profile else None
+        with self._lock:
+            stats = self._templates.get(text)
+            if stats is None:
+                if len(self._templates) >= Config.QUERY_TEMPLATES_MAX:
+                    text = OTHER_TEMPLATE
+                stats = self._templates.setdefault(text, _TemplateStats())
+            stats.callers.add(name)
+            stats.calls += 1
+            stats.errors += error is not None
+            stats.total += duration
+            stats.max = max(stats.max, duration)
+            stats.rows += rows
+            if plan is not None:
+                stats.profiles += 1
+                stats.db_hits += plan[0]
+                stats.plan_rows += plan[1]
+                stats.operators = plan[2]
+                stats.profiled_at = time.time()
+
+        if Config.SLOW_QUERY_MS > 0 and duration * 1000 >= Config.SLOW_QUERY_MS:
+            self._log_slow(name, query, parameters, duration, rows, error)
+        return [op for op in plan[2] if op in SCAN_OPERATORS] if plan else []
+
+    def _log_slow(self, name, query, parameters, duration, rows, error):
+        entry = {
+            "time": time.time(),
+            "caller": name,
+            "duration_ms": round(duration * 1000, 3),
+            "rows": rows,
+            "error": error,
+            "query": _WHITESPACE.sub(' ', query_text(query)).strip(),
+            "parameters": _format_parameters(parameters),
+        }
+        with self._lock:
+            self._slow.append(entry)
+        logger.warning("Slow query (%.1f ms, %d rows) in %s: %s parameters=%s",
+                       entry["duration_ms"], rows, name, entry["query"], entry["parameters"])
+
+    def top(self, limit, sort='total_ms'):
+        """开销最大的 limit 个模板 (按 sort 字段降序)"""
+        with self._lock:
+            items = [stats.to_dict(text) for text, stats in self._templates.items()]
+        items.sort(key=lambda item: item[sort], reverse=True)
+        return items[:limit]
+
+    def slow(self):
+        """最近的慢查询 (新的在前)"""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self):
+        with self._lock:
+            self._templates.clear()
+            self._slow.clear()
+
+
+# 全局实例
+query_stats = QueryStats()
@@ -0,0 +1,160 @@
+"""
+响应层: 更快的 JSON 编码与响应压缩
+- OrjsonProvider: 安装了 orjson 时替换 Flask 默认的 JSON 编码 (jsonify / request.get_json 都经过它)
+- Compressor:     按 Accept-Encoding 协商 br / gzip，对超过 COMPRESS_MIN_SIZE 的响应压缩；
+                  流式响应 (NDJSON) 逐块压缩，每块之后 flush，客户端仍可边接收边解析
+orjson 与 brotli 均为可选依赖，未安装时分别回退到标准库 json 与 gzip
+"""
+import gzip
+import json
+import zlib
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from config import Config
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖
+    brotli = None
+
+
+def dumps(obj):
+    """序列化为 JSON 字符串 (不转义非 ASCII 字符)，供 NDJSON 等不经过 jsonify 的输出使用"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    使用 orjson 的 JSON provider，输出与默认 provider 等价 (键排序、紧凑格式、调试模式下缩进)，
+    区别只是非 ASCII 字符直接以 UTF-8 输出而不转义为 \\uXXXX；
+    日期时间和 orjson 不支持的类型仍交给默认 provider 的 default 处理
+    """
+
+    def _option(self, sort_keys, indent):
+        # 日期时间交给 default，与默认 provider 一样输出 HTTP 日期格式
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        option = self._option(self.sort_keys, kwargs.get('indent'))
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._option(self.sort_keys, indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def choose_encoding(accept_encodings):
+    """按 Accept-Encoding 选择压缩算法 ('br' / 'gzip')，客户端不支持时返回 None"""
+    offers = ('br', 'gzip') if brotli is not None else ('gzip',)
+    return accept_encodings.best_match(offers)
+
+
+def compress(data, encoding):
+    """一次性压缩整个响应体"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=Config.BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=Config.COMPRESS_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """
+    流式压缩器: compress(块) 返回该块压缩后的字节并 flush (不必等到流结束客户端即可解压)，
+    finish() 返回压缩流的结尾
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._engine = brotli.Compressor(quality=Config.BROTLI_QUALITY)
+        else:
+            # wbits = 16 + MAX_WBITS 输出 gzip 格式
+            self._engine = zlib.compressobj(Config.COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            return self._engine.process(chunk) + self._engine.flush()
+        return self._engine.compress(chunk) + self._engine.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._engine.finish()
+        return self._engine.flush(zlib.Z_FINISH)
+
+
+def compressible(mimetype):
+    return mimetype in Config.COMPRESS_MIMETYPES or (mimetype or '').startswith('text/')
+
+
+def response_encoding(request, response, size=None):
+    """
+    响应压缩规则 (Compressor 与 asgi.AsyncApp 共用)，返回压缩算法，不压缩时返回 None
+    跳过: 客户端不接受压缩、非 2xx 响应、已编码或直接透传 (send_file) 的响应、
+    不可压缩的类型，以及小于 COMPRESS_MIN_SIZE 的非流式响应 (size 为响应体大小，流式响应为 None)
+    """
+    if request.method == 'HEAD' or not 200 <= response.status_code < 300 or response.status_code == 204:
+        return None
+    if getattr(response, 'direct_passthrough', False) or 'Content-Encoding' in response.headers \
+            or not compressible(response.mimetype):
+        return None
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None or (size is not None and size < Config.COMPRESS_MIN_SIZE):
+        return None
+    return encoding
+
+
+class Compressor:
+    """Flask 响应压缩 (after_request)，规则见 response_encoding"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.after_request)
+
+    def after_request(self, response):
+        size = None if response.is_streamed or response.direct_passthrough else len(response.get_data())
+        encoding = response_encoding(request, response, size)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.iter_encoded(), encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def _stream(chunks, encoding):
+        compressor = StreamCompressor(encoding)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
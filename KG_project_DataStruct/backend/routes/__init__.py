@@ -2,10 +2,32 @@
 路由模块包
 将所有 API 路由组织在子模块中
 """
-from flask import Blueprint
+from flask import Blueprint, current_app, jsonify
+from config import Config
+from storage import store
+from metrics import record_error
 
 # 创建主 API Blueprint
 api_bp = Blueprint('api', __name__)
 
+
+def api_error(e):
+    """
+    将数据库异常转换为 JSON 错误响应
+    存储暂时不可用 (连接池耗尽、死锁重试后仍失败、集群切换、SQLite 数据库被锁) 返回 503 并带 Retry-After，
+    其他异常返回 500，并把异常堆栈写入日志
+    异常按类型计入 kg_errors_total 指标
+    """
+    record_error(e)
+    response = jsonify({"error": str(e)})
+    if store.is_unavailable(e):
+        response.status_code = 503
+        response.headers['Retry-After'] = str(Config.RETRY_AFTER)
+    else:
+        current_app.logger.error("Unhandled error: %s", e, exc_info=e)
+        response.status_code = 500
+    return response
+
+
 # 导入各子模块的路由 (必须在 Blueprint 创建之后)
-from routes import graph, nodes, relationships, data
+from routes import graph, nodes, relationships, data, batch, monitor, changes
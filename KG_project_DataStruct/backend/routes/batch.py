@@ -0,0 +1,48 @@
+"""
+批量修改路由模块
+一次请求提交一组有序的节点 / 关系修改操作，在同一个事务中全部成功或全部回滚
+"""
+from flask import jsonify, request
+from routes import api_bp, api_error
+from storage import store
+from adjacency import graph_index
+from batch_ops import BatchCompiler, BatchError, change_records
+from changelog import change_log
+
+
+@api_bp.route('/batch', methods=['POST'])
+def apply_batch():
+    """
+    批量执行修改操作
+    请求体: { operations: [ { op: string, ... }, ... ] }
+    op 取值: create_node / update_node / delete_node / add_label / remove_label /
+             set_property / remove_property / create_relationship / delete_relationship /
+             set_relationship_property / remove_relationship_property
+    create_node 可指定 ref，之后的操作可用 "$ref" 代替节点 id
+    """
+    data = request.get_json(silent=True)
+    # 请求体不是 JSON 对象 (如数组) 时与缺少 operations 相同，由 BatchCompiler 返回 400
+    operations = data.get('operations') if isinstance(data, dict) else None
+    try:
+        compiler = BatchCompiler(operations)
+        groups = compiler.compile()
+    except BatchError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    try:
+        # 所有操作在同一个事务中执行，任何一步出错即整体回滚
+        new_ids, version = store.apply_batch(compiler, groups)
+        graph_index.invalidate()
+        change_log.extend(version, change_records(groups))
+
+        return jsonify({
+            "message": "Batch applied",
+            "operations": len(compiler.operations),
+            "statements": len(groups),
+            "ids": new_ids,
+            "refs": {ref: new_ids[slot] for ref, slot in compiler.refs.items()},
+        })
+    except BatchError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return api_error(e)
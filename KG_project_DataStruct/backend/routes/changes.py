@@ -0,0 +1,29 @@
+"""
+修改日志路由模块
+按序号增量读取节点 / 关系的修改记录 (记录格式见 changelog.py)
+"""
+from flask import jsonify, request
+from routes import api_bp, api_error
+from config import Config
+from changelog import change_log
+
+
+@api_bp.route('/changes', methods=['GET'])
+def get_changes():
+    """
+    读取 seq > since 的修改记录
+    参数: since (默认 0，即从头读取)，limit (默认 CHANGES_PAGE_SIZE)
+    返回: { changes: [...], next, latest, reset }
+    读取方保存 next，下次以 since=next 继续；reset 为 true 时应重新读取全图 (/api/graph) 后从 latest 继续
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = min(request.args.get('limit', Config.CHANGES_PAGE_SIZE, type=int), Config.CHANGES_PAGE_MAX)
+    if since < 0:
+        return jsonify({"error": "since must not be negative"}), 400
+    if limit <= 0:
+        return jsonify({"error": "limit must be positive"}), 400
+
+    try:
+        return jsonify(change_log.read(since, limit))
+    except Exception as e:
+        return api_error(e)
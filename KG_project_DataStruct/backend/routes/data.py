@@ -3,21 +3,33 @@
 包含数据库初始化和 CSV 数据导入功能
 """
 import csv
-import io
 import os
-import json
+import tempfile
 from flask import jsonify, request, send_file
-from routes import api_bp
-from db import db
+from routes import api_bp, api_error
 from config import Config
+from storage import store
+from adjacency import graph_index
+from changelog import change_log
+from checkpoint import (
+    atomic_files, checkpoint_path, find_checkpoint, open_checkpoint, recover_files, remove_checkpoint,
+)
+from incremental_checkpoint import Overlay, checkpoints
+from upload_stream import UploadError, iter_parts, open_text, tee_lines
 
 # 数据文件目录
 DATA_DIR = os.path.dirname(Config.ENTITY_FILE)
 
-# 保存的检查点文件路径
+# 旧版本保存的检查点文件路径 (新的检查点保存在 Config.CHECKPOINT_DIR 中)
 SAVED_ENTITY_FILE = os.path.join(DATA_DIR, 'saved_entity.csv')
 SAVED_RELATION_FILE = os.path.join(DATA_DIR, 'saved_relation.csv')
 
+# 导入模式: full 清空数据库后全量导入，diff 只写入与当前图的差异
+IMPORT_MODES = ('full', 'diff')
+
+# 保存模式: incremental 只保存上次保存以来的修改 (无法增量保存时自动全量)，full 总是全量保存
+SAVE_MODES = ('incremental', 'full')
+
 # 模板文件路径
 ENTITY_TEMPLATE_FILE = os.path.join(DATA_DIR, 'entity_template.csv')
 RELATION_TEMPLATE_FILE = os.path.join(DATA_DIR, 'relation_template.csv')
@@ -35,169 +47,116 @@ def download_relation_template():
     return send_file(RELATION_TEMPLATE_FILE, as_attachment=True, download_name='relation_template.csv')
 
 
+def loader_params(args):
+    """
+    解析导入参数，返回 (mode, batch_size, workers)
+    参数不合法时抛出 ValueError (在创建导入器之前检查，full 模式不会先清空数据库)
+    """
+    mode = args.get('mode', 'full')
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Invalid mode, expected one of {IMPORT_MODES}")
+    batch_size = args.get('batch_size', Config.IMPORT_BATCH_SIZE, type=int)
+    workers = args.get('workers', Config.IMPORT_WORKERS, type=int)
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive")
+    if workers < 1:
+        raise ValueError("workers must be positive")
+    return mode, batch_size, workers
+
+
+def create_loader(mode, batch_size, workers):
+    """
+    根据导入模式和导入参数 (见 loader_params) 创建存储的批量导入器
+    full 模式先清空图数据；具体实现见 storage.neo4j_store.Neo4jLoader / storage.sqlite_store.SQLiteLoader
+    """
+    return store.loader(mode, batch_size=batch_size, workers=workers)
+
+
 @api_bp.route('/init', methods=['POST'])
 def init_db():
     """
     初始化数据库（恢复到上次保存的状态）
-    优先使用保存的检查点，否则使用原始文件
+    优先使用保存的检查点 (基础快照叠加增量段)，否则使用原始文件
+    可选参数: mode (full / diff)，batch_size，workers
     """
-    session = db.get_session()
-    
-    # 优先使用保存的文件
-    entity_file = SAVED_ENTITY_FILE if os.path.exists(SAVED_ENTITY_FILE) else Config.ENTITY_FILE
-    relation_file = SAVED_RELATION_FILE if os.path.exists(SAVED_RELATION_FILE) else Config.RELATION_FILE
-    
     try:
-        # 清空数据库
-        # MATCH (n) DETACH DELETE n: 匹配所有节点 (n) 并删除它们，DETACH 会同时删除与节点相连的所有关系
-        session.run("MATCH (n) DETACH DELETE n")
-        
-        # 导入实体
-        with open(entity_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # 解析标签 (支持 | 分隔)
-                labels_str = row.get('labels', '')
-                if not labels_str:
-                     # 兼容旧格式
-                    labels = []
-                    for key in row.keys():
-                        if key.lower().startswith('label'):
-                            value = row.get(key, '')
-                            if value and value.strip():
-                                labels.append(value.strip().replace(' ', '_'))
-                else:
-                    labels = [l.strip().replace(' ', '_') for l in labels_str.split('|') if l.strip()]
-
-                if not labels:
-                    labels = ['Unknown']
-                
-                # 解析属性 (JSON 字符串)
-                properties = {}
-                props_str = row.get('properties', '{}')
-                try:
-                    properties = json.loads(props_str)
-                except json.JSONDecodeError:
-                    pass # 忽略解析错误
-                
-                # 确保 id 和 name 存在
-                properties['id'] = int(row['id'])
-                properties['name'] = row['name']
-
-                # 构建 Cypher 查询语句
-                # 动态构建标签部分，例如 :`Data_Structure`:`Linear`
-                labels_cypher = ':'.join([f'`{label}`' for label in labels])
-                
-                # 动态设置属性
-                # $props 是参数占位符，防止注入攻击
-                cypher = f"CREATE (n:{labels_cypher}) SET n = $props"
-                session.run(cypher, props=properties)
-        
-        # 导入关系
-        with open(relation_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                rel_type = row.get('type', row.get('relation', 'RELATED_TO')).replace(' ', '_')
-                
-                # 解析属性
-                properties = {}
-                props_str = row.get('properties', '{}')
-                try:
-                    properties = json.loads(props_str)
-                except json.JSONDecodeError:
-                    pass
-                
-                # 构建 Cypher 查询语句
-                # MATCH 查找源节点 (a) 和目标节点 (b)
-                # MERGE 创建或匹配关系 (r)
-                cypher = f"""
-                    MATCH (a), (b)
-                    WHERE a.id = $source_id AND b.id = $target_id
-                    MERGE (a)-[r:`{rel_type}`]->(b)
-                    SET r += $props
-                """
-                session.run(
-                    cypher,
-                    source_id=int(row['source_id']),
-                    target_id=int(row['target_id']),
-                    props=properties
-                )
-        
-        source_type = "saved checkpoint" if entity_file == SAVED_ENTITY_FILE else "original"
-        return jsonify({"message": f"Database restored from {source_type}"}), 200
+        mode, batch_size, workers = loader_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    loader = None
+    try:
+        with checkpoints.restore() as checkpoint:
+            if checkpoint:
+                entity_file, relation_file, overlay = checkpoint
+            else:
+                # 兼容旧版本保存的文件 (可能是 gzip / zstd 压缩的检查点)，都没有时使用原始文件
+                # (/api/import 替换原始文件时崩溃的，先补完替换)
+                recover_files(Config.ENTITY_FILE, Config.RELATION_FILE)
+                saved_entity_file = find_checkpoint(SAVED_ENTITY_FILE)
+                saved_relation_file = find_checkpoint(SAVED_RELATION_FILE)
+                entity_file = saved_entity_file or Config.ENTITY_FILE
+                relation_file = saved_relation_file or Config.RELATION_FILE
+                overlay = Overlay()
+            source_type = "saved checkpoint" if checkpoint or saved_entity_file else "original"
+
+            loader = create_loader(mode, batch_size, workers)
+
+            # 导入实体 (基础快照的行流过增量段，被修改的节点以增量段中的状态为准)
+            with open_checkpoint(entity_file) as f:
+                loader.load_entities(overlay.entities(csv.DictReader(f)))
+
+            # 导入关系
+            with open_checkpoint(relation_file) as f:
+                loader.load_relations(overlay.relations(csv.DictReader(f)))
+
+            # 数据已被替换，提交导入并使图数据缓存失效
+            version = loader.commit()
+
+        # 没有增量段时，邻接索引下次查询时直接从刚导入的文件重建
+        if overlay:
+            graph_index.invalidate()
+        else:
+            graph_index.use_files(entity_file, relation_file, version)
+
+        change_log.append(version, 'graph_replaced', mode=mode, source=source_type)
+        return jsonify({"message": f"Database restored from {source_type}", "stats": loader.stats()}), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return api_error(e)
     finally:
-        session.close()
+        if loader is not None:
+            loader.close()
 
 
 @api_bp.route('/save', methods=['POST'])
 def save_db():
     """
-    保存当前数据库状态到 CSV 文件（创建检查点）
+    保存当前数据库状态（创建检查点，见 incremental_checkpoint.py）
+    可选参数:
+    - mode: incremental (默认，只追加上次保存以来被修改的节点和关系) / full (全量导出为新的基础快照)
+    - compression: gzip / zstd，默认使用 Config.CHECKPOINT_COMPRESSION
+    全量保存从存储流式读取节点和关系，边读边写，内存占用与图规模无关；
+    所有文件先写入临时文件并 fsync，再原子替换检查点清单，崩溃不会留下写了一半的检查点
     """
-    session = db.get_session()
-    
+    mode = request.args.get('mode', 'incremental')
+    if mode not in SAVE_MODES:
+        return jsonify({"error": f"Invalid mode, expected one of {SAVE_MODES}"}), 400
+    compression = request.args.get('compression', Config.CHECKPOINT_COMPRESSION)
     try:
-        # 导出所有节点
-        # MATCH (n) 匹配所有节点
-        nodes_result = session.run("""
-            MATCH (n)
-            RETURN n, labels(n) as labels
-            ORDER BY n.id
-        """)
-        
-        # 写入实体文件
-        with open(SAVED_ENTITY_FILE, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'name', 'labels', 'properties'])
-            
-            for record in nodes_result:
-                node = record['n']
-                labels = list(record['labels'])
-                
-                # 提取基本属性
-                n_id = node.get('id')
-                n_name = node.get('name')
-                
-                # 提取其他属性
-                props = dict(node)
-                if 'id' in props: del props['id']
-                if 'name' in props: del props['name']
-                
-                writer.writerow([
-                    n_id, 
-                    n_name, 
-                    "|".join(labels), 
-                    json.dumps(props, ensure_ascii=False)
-                ])
-        
-        # 导出所有关系
-        # MATCH (a)-[r]->(b) 匹配所有关系
-        rels_result = session.run("""
-            MATCH (a)-[r]->(b)
-            RETURN a.id as source_id, b.id as target_id, type(r) as type, properties(r) as props
-            ORDER BY a.id, b.id
-        """)
-        
-        # 写入关系文件
-        with open(SAVED_RELATION_FILE, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['source_id', 'target_id', 'type', 'properties'])
-            
-            for record in rels_result:
-                writer.writerow([
-                    record['source_id'], 
-                    record['target_id'], 
-                    record['type'], 
-                    json.dumps(record['props'], ensure_ascii=False)
-                ])
+        checkpoint_path(SAVED_ENTITY_FILE, compression)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        info = checkpoints.save(store, compression, full=mode == 'full')
+
+        # 旧版本的检查点文件已被检查点目录取代，删除以免 init 读取过期数据
+        remove_checkpoint(SAVED_ENTITY_FILE)
+        remove_checkpoint(SAVED_RELATION_FILE)
         
-        return jsonify({"message": "Database saved successfully"}), 200
+        return jsonify({"message": "Database saved successfully", "checkpoint": info}), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
 
 
 @api_bp.route('/import', methods=['POST'])
@@ -205,82 +164,81 @@ def import_csv():
     """
     导入用户上传的 CSV 文件
     直接覆盖 data 目录下的文件，并更新数据库
+    可选参数: mode (full / diff)，batch_size，workers
+    请求体按 multipart 流式解析：先到达的文件暂存到临时文件，两个文件都到达后才创建导入器
+    (full 模式此时才清空数据库，缺少文件的请求不会修改数据库)，后到达的文件边接收边导入，
+    同时写入 data 目录，内存占用与上传文件大小无关
     """
-    if 'entity_file' not in request.files or 'relation_file' not in request.files:
+    try:
+        mode, batch_size, workers = loader_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    boundary = request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
         return jsonify({"error": "Both entity_file and relation_file are required"}), 400
     
-    entity_file = request.files['entity_file']
-    relation_file = request.files['relation_file']
-    
-    session = db.get_session()
-    
+    loader = None
     try:
-        # 读取上传文件内容
-        entity_content = entity_file.read().decode('utf-8')
-        relation_content = relation_file.read().decode('utf-8')
-        
-        # 1. 保存到 data 文件夹 (直接覆盖，不备份)
-        with open(Config.ENTITY_FILE, 'w', encoding='utf-8', newline='') as f:
-            f.write(entity_content)
-        
-        with open(Config.RELATION_FILE, 'w', encoding='utf-8', newline='') as f:
-            f.write(relation_content)
-        
-        # 2. 清空数据库
-        session.run("MATCH (n) DETACH DELETE n")
-        
-        # 3. 导入实体
-        entity_reader = csv.DictReader(io.StringIO(entity_content))
-        for row in entity_reader:
-            # 解析标签
-            labels_str = row.get('labels', '')
-            if not labels_str:
-                 labels = []
-                 for key in row.keys():
-                    if key.lower().startswith('label'):
-                        val = row.get(key, '')
-                        if val: labels.append(val.strip().replace(' ', '_'))
-            else:
-                labels = [l.strip().replace(' ', '_') for l in labels_str.split('|') if l.strip()]
-            
-            if not labels: labels = ['Unknown']
-            
-            # 解析属性
-            properties = {}
-            try:
-                properties = json.loads(row.get('properties', '{}'))
-            except: pass
-            
-            properties['id'] = int(row['id'])
-            properties['name'] = row['name']
-            
-            labels_cypher = ':'.join([f'`{label}`' for label in labels])
-            session.run(f"CREATE (n:{labels_cypher}) SET n = $props", props=properties)
-            
-        # 4. 导入关系
-        relation_reader = csv.DictReader(io.StringIO(relation_content))
-        for row in relation_reader:
-            rel_type = row.get('type', row.get('relation', 'RELATED_TO')).replace(' ', '_')
-            
-            properties = {}
-            try:
-                properties = json.loads(row.get('properties', '{}'))
-            except: pass
-            
-            cypher = f"""
-                MATCH (a), (b)
-                WHERE a.id = $source_id AND b.id = $target_id
-                MERGE (a)-[r:`{rel_type}`]->(b)
-                SET r += $props
-            """
-            session.run(cypher, source_id=int(row['source_id']), target_id=int(row['target_id']), props=properties)
-
-        # 5. 删除旧的检查点文件（确保下次 init 使用新数据）
-        if os.path.exists(SAVED_ENTITY_FILE): os.remove(SAVED_ENTITY_FILE)
-        if os.path.exists(SAVED_RELATION_FILE): os.remove(SAVED_RELATION_FILE)
+        # 1. 上传的文件先写入临时文件，导入成功后再原子替换 data 目录下的文件
+        with atomic_files(Config.ENTITY_FILE, Config.RELATION_FILE) as (entity_out, relation_out), \
+                tempfile.TemporaryFile('w+', encoding='utf-8', newline='') as entity_spool, \
+                tempfile.TemporaryFile('w+', encoding='utf-8', newline='') as relation_spool:
+            received = set()
+
+            for part in iter_parts(request.stream, boundary.encode('latin-1')):
+                if part.name not in ('entity_file', 'relation_file') or part.name in received:
+                    part.drain()
+                    continue
+
+                if part.name == 'entity_file' and 'relation_file' in received:
+                    # 2. 两个文件都已到达，创建导入器 (full 模式会先清空数据库)
+                    loader = create_loader(mode, batch_size, workers)
+
+                    # 3. 边接收边导入实体，暂存的关系在循环结束后导入
+                    rows = tee_lines(open_text(part.chunks()), entity_out)
+                    loader.load_entities(csv.DictReader(rows))
+                elif part.name == 'relation_file' and 'entity_file' in received:
+                    loader = create_loader(mode, batch_size, workers)
+
+                    # 3. 先导入暂存的实体
+                    entity_spool.seek(0)
+                    loader.load_entities(csv.DictReader(tee_lines(entity_spool, entity_out)))
+
+                    # 4. 边接收边导入关系
+                    rows = tee_lines(open_text(part.chunks()), relation_out)
+                    loader.load_relations(csv.DictReader(rows))
+                else:
+                    # 先到达的文件暂存，等另一个文件到达后再导入
+                    spool = entity_spool if part.name == 'entity_file' else relation_spool
+                    for line in open_text(part.chunks()):
+                        spool.write(line)
+                received.add(part.name)
+
+            if not {'entity_file', 'relation_file'} <= received:
+                raise UploadError("Both entity_file and relation_file are required")
+
+            if relation_spool.tell():
+                # 4. 关系文件先于实体文件到达时导入暂存的关系
+                relation_spool.seek(0)
+                loader.load_relations(csv.DictReader(tee_lines(relation_spool, relation_out)))
+
+            # 5. 先提交导入 (SQLite 在此提交事务)，成功后离开 with 块时才替换 data 目录下的文件
+            version = loader.commit()
+
+        graph_index.use_files(Config.ENTITY_FILE, Config.RELATION_FILE, version)
+        change_log.append(version, 'graph_replaced', mode=mode, source="upload")
+
+        # 6. 删除旧的检查点文件（确保下次 init 使用新数据）
+        checkpoints.clear()
+        remove_checkpoint(SAVED_ENTITY_FILE)
+        remove_checkpoint(SAVED_RELATION_FILE)
         
-        return jsonify({"message": "Data imported and saved successfully"}), 200
+        return jsonify({"message": "Data imported and saved successfully", "stats": loader.stats()}), 200
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return api_error(e)
     finally:
-        session.close()
+        if loader is not None:
+            loader.close()
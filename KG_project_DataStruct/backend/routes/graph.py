@@ -2,9 +2,170 @@
 图查询路由模块
 包含获取图数据、搜索节点、路径查询等接口
 """
-from flask import jsonify, request
-from routes import api_bp
-from db import db
+from flask import Response, jsonify, request
+from routes import api_bp, api_error
+from config import Config
+from graph_cache import etag_for, graph_cache
+from storage import store
+from adjacency import graph_index
+from summary import community_summary, label_summary, summary_params, top_nodes
+from columnar import JSON_MIMETYPE, encode_columnar, negotiate
+from response_layer import dumps
+from steps import run, stream
+
+# 分页游标的初始值 (小于任何节点 id)
+MIN_CURSOR = -(2 ** 63)
+
+
+def graph_params(args):
+    """
+    解析 /api/graph 的分页参数，返回 (after, limit, 是否分页)
+    limit 不合法时抛出 ValueError
+    """
+    after = args.get('after', MIN_CURSOR, type=int)
+    limit = min(args.get('limit', Config.GRAPH_PAGE_SIZE, type=int), Config.GRAPH_PAGE_MAX)
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    return after, limit, 'after' in args or 'limit' in args
+
+
+def type_list(value):
+    """解析逗号分隔的关系类型参数，未提供时返回 None (不限类型)"""
+    return [t.strip() for t in value.split(',') if t.strip()] if value else None
+
+
+def neighbor_cursor(value):
+    """解析邻居分页游标 "跳数:节点 id"，返回 (跳数, 节点 id)，不合法时抛出 ValueError"""
+    hop, _, node_id = value.partition(':')
+    return int(hop), int(node_id)
+
+
+def graph_cache_key(args, mimetype=JSON_MIMETYPE):
+    """/api/graph 响应缓存的键 (排序后的全部请求参数和响应格式)"""
+    return tuple(sorted(args.items(multi=True))) + (mimetype,)
+
+
+def encode_payload(payload, mimetype):
+    """按协商得到的格式编码响应体 (JSON 或列式 MessagePack)"""
+    if mimetype == JSON_MIMETYPE:
+        return jsonify(payload).get_data()
+    return encode_columnar(payload)
+
+
+def payload_response(payload):
+    """按请求的 Accept 头返回 JSON 或列式 MessagePack 响应"""
+    mimetype = negotiate(request.accept_mimetypes)
+    response = Response(encode_payload(payload, mimetype), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+
+def build_summary(view, by, k, version):
+    """
+    生成 /api/graph?view=... 的响应内容 (算法见 summary.py)
+    top / communities 在邻接索引上计算，top 视图的节点和关系属性从存储读取；labels 视图直接在存储中聚合
+    """
+    if view == 'labels':
+        payload = label_summary(*store.label_counts())
+    else:
+        graph_index.ensure_fresh(version)
+        topology = graph_index.topology()
+        if view == 'communities':
+            payload = community_summary(topology, k)
+        else:
+            ids, scores, relationships = top_nodes(topology, by, k)
+            nodes, links = store.subgraph(ids, relationships)
+            for node in nodes:
+                node['score'] = scores[node['id']]
+            payload = {"nodes": nodes, "links": links}
+        payload['total_nodes'] = len(topology)
+    payload['view'] = view
+    return payload
+
+
+def read_store(request):
+    """读取步骤的同步执行器 (见 steps.py): 调用存储的同名读取方法，'summary' 请求计算摘要"""
+    name, args = request
+    if name == 'summary':
+        return build_summary(*args)
+    return getattr(store, name)(*args)
+
+
+def ndjson_steps(after, limit):
+    """
+    读取步骤 (steps.stream / steps.stream_async 执行): 以 NDJSON (每行一个 JSON 对象) 逐页流式输出全图
+    每一页先输出节点行 {"type": "node", ...}，再输出关系行 {"type": "link", ...}，
+    服务器内存中只保留当前一页，客户端可以立即开始接收数据
+    每一页在独立的读事务中读取，遇到暂时性错误时只重试当前页
+    """
+    while True:
+        nodes, links, next_cursor = yield 'graph_page', (after, limit)
+        # 每页输出一块，启用压缩时每块压缩后 flush 一次
+        lines = [dumps({"type": "node", **node}) + '\n' for node in nodes]
+        lines += [dumps({"type": "link", **link}) + '\n' for link in links]
+        if lines:
+            yield ''.join(lines)
+        if next_cursor is None:
+            break
+        after = next_cursor
+
+
+def graph_request(args, accept_mimetypes):
+    """
+    解析 /api/graph 的请求，返回 (after, limit, paged, summary, ndjson, mimetype)
+    summary 为 view 摘要参数 (无 view 时为 None)，参数不合法时抛出 ValueError
+    """
+    after, limit, paged = graph_params(args)
+    summary = summary_params(args) if 'view' in args else None
+    ndjson = args.get('format') == 'ndjson' and summary is None
+    mimetype = JSON_MIMETYPE if ndjson else negotiate(accept_mimetypes)
+    return after, limit, paged, summary, ndjson, mimetype
+
+
+def graph_steps(args, params, if_none_match):
+    """
+    /api/graph 的 ETag 与缓存逻辑 (本模块的 get_graph 与 asgi.get_graph 共用)
+    读取步骤 (见 steps.py): yield (读取方法名, 参数)，同步执行时由 read_store 调用存储，
+    ASGI 模式由 asgi.AsyncGraphReader 在异步驱动上执行；需要在应用上下文中执行 (jsonify)
+    params 为 graph_request 的返回值；返回 (状态码, ETag, 响应体)，
+    图未变化时状态码为 304，NDJSON 请求的响应体为 None (由调用方以 ndjson_steps 流式输出)
+    """
+    after, limit, paged, summary, ndjson, mimetype = params
+    version = yield 'version', ()
+    etag = etag_for(version, None if mimetype == JSON_MIMETYPE else 'columnar')
+    if if_none_match.contains_weak(etag):
+        return 304, etag, None
+    if ndjson:
+        return 200, etag, None
+
+    cache_key = graph_cache_key(args, mimetype)
+    body = graph_cache.get(version, cache_key)
+    if body is None:
+        if summary is not None:
+            payload = yield 'summary', (*summary, version)
+        elif paged:
+            nodes, links, next_cursor = yield 'graph_page', (after, limit)
+            payload = {"nodes": nodes, "links": links, "next": next_cursor}
+        else:
+            nodes, links = yield 'full_graph', ()
+            payload = {"nodes": nodes, "links": links}
+        body = encode_payload(payload, mimetype)
+        graph_cache.put(version, cache_key, body)
+    return 200, etag, body
+
+
+def search_params(args):
+    """解析 /api/search 的参数，返回 (q, limit, offset)，limit 不合法时抛出 ValueError"""
+    limit = min(args.get('limit', 10, type=int), Config.SEARCH_PAGE_MAX)
+    offset = max(args.get('offset', 0, type=int), 0)
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    return args.get('q', ''), limit, offset
+
+
+def search_body(nodes, mimetype):
+    """/api/search 的响应体: JSON 为节点列表，列式格式为 {"nodes": [...]}"""
+    return encode_payload(nodes if mimetype == JSON_MIMETYPE else {"nodes": nodes}, mimetype)
 
 
 @api_bp.route('/test', methods=['GET'])
@@ -17,154 +178,161 @@ def test():
 def get_graph():
     """
     获取全图数据
-    返回所有节点和关系，包括所有属性
+    返回所有节点和关系，包括所有属性；不分页时关系最多 GRAPH_FULL_LINKS_MAX 条 (默认 500)
+    可选参数:
+      after:  分页游标 (上一页返回的 next)，提供 after 或 limit 时按页返回
+      limit:  每页节点数
+      format: ndjson 时以 NDJSON 流式输出全图 (从 after 开始)
+      view:   返回规模有界的摘要而不是全图 (大图在前端缩小显示时使用):
+              top (按 by=degree / pagerank 取前 k 个节点)、labels (按标签聚合)、
+              communities (最大的 k 个社区)；k 默认 SUMMARY_TOP_K
+    Accept 头为 application/msgpack 时返回列式 MessagePack (见 columnar.py)，否则返回 JSON
+    响应带有以图版本号生成的 ETag，图未变化时 If-None-Match 请求返回 304，
+    响应体 (包括摘要) 按 (图版本号, 请求参数, 响应格式) 缓存
     """
-    session = db.get_session()
     try:
-        nodes = {}
-        links = []
-        
-        # 1. 获取所有节点及其属性
-        # MATCH (n) 匹配所有节点
-        # labels(n) 获取节点的标签列表
-        all_nodes_result = session.run("""
-            MATCH (n)
-            RETURN n, labels(n) as labels
-        """)
-        
-        for record in all_nodes_result:
-            n = record['n']
-            n_id = n.get('id')
-            if n_id not in nodes:
-                labels = list(record['labels'])
-                # 将节点对象转换为字典，包含所有属性
-                props = dict(n)
-                
-                nodes[n_id] = {
-                    "id": n_id,
-                    "name": n.get('name'),
-                    "category": labels[0] if labels else None,
-                    "labels": labels,
-                    "properties": props # 包含所有属性
-                }
-        
-        # 2. 获取所有关系及其属性
-        # MATCH (n)-[r]->(m) 匹配所有有向关系
-        # LIMIT 500 限制返回数量，防止数据量过大导致前端卡顿
-        rels_result = session.run("""
-            MATCH (n)-[r]->(m)
-            RETURN n.id as source_id, m.id as target_id, type(r) as rel_type, properties(r) as props
-            LIMIT 500
-        """)
-        
-        for record in rels_result:
-            links.append({
-                "source": record['source_id'],
-                "target": record['target_id'],
-                "name": record['rel_type'],
-                "properties": record['props'] # 包含关系属性
-            })
-            
-        return jsonify({"nodes": list(nodes.values()), "links": links})
+        params = graph_request(request.args, request.accept_mimetypes)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    after, limit, _, _, ndjson, mimetype = params
+    try:
+        status, etag, body = run(graph_steps(request.args, params, request.if_none_match), read_store)
+        if status == 304:
+            response = Response(status=304)
+        elif ndjson:
+            response = Response(stream(ndjson_steps(after, limit), read_store), mimetype='application/x-ndjson')
+        else:
+            response = Response(body, mimetype=mimetype)
+
+        response.set_etag(etag, weak=True)
+        response.vary.add('Accept')
+        return response
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
 
 
 @api_bp.route('/search', methods=['GET'])
 def search_node():
     """
     搜索节点
+    参数: q (关键词), limit (默认 10), offset (默认 0)
+    使用全文索引匹配 name 和 description 等属性，结果按相关度排序并带有 score 字段
+    Accept 头为 application/msgpack 时以列式格式返回 {"nodes": [...]}
     """
-    query = request.args.get('q', '')
-    session = db.get_session()
     try:
-        # 使用 CONTAINS 进行模糊搜索 (不区分大小写)
-        # toLower() 将名称和查询词都转换为小写
-        result = session.run("""
-            MATCH (n)
-            WHERE toLower(n.name) CONTAINS toLower($term)
-            RETURN n, labels(n) as labels
-            LIMIT 10
-        """, term=query)
-        
-        nodes = []
-        for record in result:
-            n = record['n']
-            labels = list(record['labels'])
-            nodes.append({
-                "id": n.get('id'),
-                "name": n.get('name'),
-                "category": labels[0] if labels else None,
-                "labels": labels,
-                "properties": dict(n)
-            })
-            
-        return jsonify(nodes)
-    finally:
-        session.close()
+        query, limit, offset = search_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    mimetype = negotiate(request.accept_mimetypes)
+    try:
+        nodes = store.search(query, limit=limit, offset=offset)
+        response = Response(search_body(nodes, mimetype), mimetype=mimetype)
+        response.vary.add('Accept')
+        return response
+    except Exception as e:
+        return api_error(e)
 
 
 @api_bp.route('/path', methods=['GET'])
 def shortest_path():
     """
-    最短路径查询
+    路径查询 (不区分关系方向)
+    参数:
+      start, end: 节点 ID 或名称 (名称不区分大小写)
+      max_depth:  路径最多包含的关系数
+      types:      只经过这些类型的关系 (逗号分隔)
+      weight:     数值型关系属性名，按属性值之和求最短路径 (缺失按 1 计，负值的关系不可通行)
+      k:          返回前 k 条最短路径 (默认 1)
+    在进程内邻接索引上计算 (无权时双向 BFS，有权时 Dijkstra，k > 1 时 Yen 算法)，
+    只有路径上节点和关系的属性需要从存储读取
+    返回最短一条的 path / relationships / cost / length，k > 1 时另附 paths 列表
     """
     start = request.args.get('start')
     end = request.args.get('end')
     
     if not start or not end:
         return jsonify({"error": "Missing start or end parameters"}), 400
+
+    max_depth = request.args.get('max_depth', type=int)
+    if max_depth is not None and max_depth < 0:
+        return jsonify({"error": "max_depth must not be negative"}), 400
+    if Config.PATH_MAX_DEPTH:
+        max_depth = min(max_depth if max_depth is not None else Config.PATH_MAX_DEPTH, Config.PATH_MAX_DEPTH)
+    k = request.args.get('k', 1, type=int)
+    if not 1 <= k <= Config.PATH_MAX_K:
+        return jsonify({"error": f"k must be between 1 and {Config.PATH_MAX_K}"}), 400
+    types = type_list(request.args.get('types'))
+    weight = request.args.get('weight')
+    if weight is not None and not weight.isidentifier():
+        return jsonify({"error": "Invalid weight property"}), 400
         
-    session = db.get_session()
     try:
-        # 解析 ID 或名称
-        try:
-            start_id = int(start)
-            start_condition = "start.id = $start_val"
-        except ValueError:
-            start_id = None
-            start_condition = "toLower(start.name) = toLower($start_val)"
-        
-        try:
-            end_id = int(end)
-            end_condition = "end.id = $end_val"
-        except ValueError:
-            end_id = None
-            end_condition = "toLower(end.name) = toLower($end_val)"
-        
-        # 构建查询语句
-        # shortestPath((start)-[*]-(end)) 查找任意方向的最短路径
-        # [*] 表示任意长度的路径
-        query = f"""
-            MATCH (start), (end)
-            WHERE {start_condition} AND {end_condition}
-            MATCH p = shortestPath((start)-[*]-(end))
-            RETURN p
-        """
-        
-        result = session.run(query, 
-            start_val=start_id if start_id is not None else start,
-            end_val=end_id if end_id is not None else end
-        )
-        
-        record = result.single()
-        if record:
-            path = record['p']
-            nodes = []
-            for n in path.nodes:
-                nodes.append({
-                    "id": n.get('id'),
-                    "name": n.get('name'),
-                    "category": list(n.labels)[0] if n.labels else None,
-                    "labels": list(n.labels),
-                    "properties": dict(n)
-                })
-            return jsonify({"path": nodes})
-        else:
+        graph_index.ensure_fresh()
+        weights = graph_index.edge_weights(weight) if weight else None
+        paths = graph_index.find_paths(start, end, k=k, max_depth=max_depth, types=types, weights=weights)
+        if not paths:
             return jsonify({"message": "No path found"}), 404
+
+        results = store.paths(paths)
+        response = dict(results[0])
+        if k > 1:
+            response["paths"] = results
+        return jsonify(response)
+    except Exception as e:
+        return api_error(e)
+
+
+@api_bp.route('/node/<int:node_id>/neighbors', methods=['GET'])
+def node_neighbors(node_id):
+    """
+    节点的 k 跳邻域 (ego network)，供前端点击节点时增量加载，不必读取全图
+    参数:
+      depth:  展开的跳数 (默认 1，最大 NEIGHBORS_MAX_DEPTH)
+      types:  只经过这些类型的关系 (逗号分隔)
+      fanout: 第 2 跳起每个节点最多展开的邻居数 (默认 NEIGHBORS_FANOUT)
+      limit:  每页节点数
+      after:  分页游标 (上一页返回的 next)
+    邻域在进程内邻接索引上计算，节点按 (跳数, id) 排序分页，第一页以中心节点 (hop 为 0) 开头；
+    links 为邻域内节点之间的关系，每条关系在其排序靠后的端点所在的页返回，逐页合并即得到完整的邻域子图
+    返回 {"nodes", "links", "next", "truncated"}，节点带有 hop 字段；
+    truncated 为 true 表示邻域因 fanout 或 NEIGHBORS_MAX_NODES 被截断
+    与 /api/graph 一样支持通过 Accept 头选择列式 MessagePack 格式
+    """
+    depth = request.args.get('depth', 1, type=int)
+    if not 1 <= depth <= Config.NEIGHBORS_MAX_DEPTH:
+        return jsonify({"error": f"depth must be between 1 and {Config.NEIGHBORS_MAX_DEPTH}"}), 400
+    fanout = min(request.args.get('fanout', Config.NEIGHBORS_FANOUT, type=int), Config.NEIGHBORS_FANOUT_MAX)
+    limit = min(request.args.get('limit', Config.NEIGHBORS_PAGE_SIZE, type=int), Config.NEIGHBORS_PAGE_MAX)
+    if fanout <= 0 or limit <= 0:
+        return jsonify({"error": "fanout and limit must be positive"}), 400
+    try:
+        after = neighbor_cursor(request.args['after']) if 'after' in request.args else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    types = type_list(request.args.get('types'))
+
+    try:
+        graph_index.ensure_fresh()
+        ego = graph_index.ego_network(node_id, depth, types=types, fanout=fanout,
+                                      max_nodes=Config.NEIGHBORS_MAX_NODES)
+        if ego is None:
+            return jsonify({"error": "Node not found"}), 404
+        members, relationships, truncated = ego
+        key_of = {member_id: (hop, member_id) for hop, member_id in members}
+
+        if after is not None:
+            members = [key for key in members if key > after]
+        page = members[:limit]
+        page_keys = set(page)
+        page_links = [rel for rel in relationships
+                      if max(key_of[rel['source']], key_of[rel['target']]) in page_keys]
+
+        nodes, links = store.subgraph([member_id for _, member_id in page], page_links)
+        for node in nodes:
+            node['hop'] = key_of[node['id']][0]
+        next_cursor = f"{page[-1][0]}:{page[-1][1]}" if len(members) > limit else None
+        return payload_response({"nodes": nodes, "links": links, "next": next_cursor, "truncated": truncated})
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
@@ -0,0 +1,64 @@
+"""
+监控指标路由模块
+以 Prometheus 文本格式输出请求、查询、连接池和缓存等指标，并按模板列出开销最大的查询
+"""
+from flask import Response, jsonify, request
+from routes import api_bp
+from config import Config
+from metrics import registry
+from profiling import SORT_KEYS, query_stats
+from graph_cache import graph_cache
+from adjacency import graph_index
+from changelog import change_log
+
+# 由其他模块维护的数值，输出时读取
+registry.register_callback('kg_graph_cache_hits_total', 'Graph response cache hits',
+                           lambda: graph_cache.hits, kind='counter')
+registry.register_callback('kg_graph_cache_misses_total', 'Graph response cache misses',
+                           lambda: graph_cache.misses, kind='counter')
+registry.register_callback('kg_adjacency_nodes', 'Nodes in the adjacency index',
+                           lambda: graph_index.stats()['nodes'])
+registry.register_callback('kg_adjacency_relationships', 'Relationships in the last adjacency index build',
+                           lambda: graph_index.stats()['relationships'])
+registry.register_callback('kg_adjacency_overlay', 'Incremental changes applied since the last index build',
+                           lambda: graph_index.stats()['overlay'])
+registry.register_callback('kg_adjacency_version', 'Graph version the adjacency index reflects',
+                           lambda: graph_index.stats()['version'])
+registry.register_callback('kg_changelog_write_errors_total', 'Change log appends that failed after the write committed',
+                           lambda: change_log.failures, kind='counter')
+
+
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 文本格式 (version 0.0.4) 的监控指标"""
+    response = Response(registry.render(), mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+
+@api_bp.route('/queries', methods=['GET'])
+def get_queries():
+    """
+    按查询模板列出开销最大的查询 (默认按总耗时排序，可用 sort 指定其他字段)
+    每项包含调用方、次数、耗时、行数，以及 PROFILE 采样得到的 db hits、算子和全图扫描算子 (full_scans)；
+    slow 为最近的慢查询及其参数
+    """
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in SORT_KEYS:
+        return jsonify({"error": f"sort must be one of {', '.join(SORT_KEYS)}"}), 400
+    limit = request.args.get('limit', 20, type=int)
+    if limit <= 0:
+        return jsonify({"error": "limit must be positive"}), 400
+    return jsonify({
+        "sample_rate": Config.PROFILE_SAMPLE_RATE,
+        "slow_query_ms": Config.SLOW_QUERY_MS,
+        "queries": query_stats.top(limit, sort),
+        "slow": query_stats.slow(),
+    })
+
+
+@api_bp.route('/queries', methods=['DELETE'])
+def reset_queries():
+    """清空查询统计与慢查询记录"""
+    query_stats.reset()
+    return jsonify({"message": "Query statistics reset"})
@@ -3,8 +3,11 @@
 包含创建、更新、删除节点及属性的接口
 """
 from flask import jsonify, request
-from routes import api_bp
-from db import db
+from routes import api_bp, api_error
+from storage import store
+from adjacency import graph_index
+from changelog import change_log
+from schema import BASE_LABEL
 
 
 @api_bp.route('/node', methods=['POST'])
@@ -21,32 +24,16 @@ def create_node():
     if not name:
         return jsonify({"error": "Missing name"}), 400
         
-    session = db.get_session()
     try:
-        # 获取最大 ID 以自增
-        result = session.run("MATCH (n) RETURN max(n.id) as max_id")
-        max_id = result.single()['max_id']
-        new_id = (max_id or 0) + 1
-        
-        # 确保 id 和 name 在属性中
-        properties['id'] = new_id
-        properties['name'] = name
-        
-        # 根据是否有标签构建不同的 Cypher 语句
-        # 根据是否有标签构建不同的 Cypher 语句
-        # 动态插入标签 (注意: 标签不能作为参数传递，只能拼接到 Cypher 字符串中)
-        if label:
-            cypher = f"CREATE (n:`{label}`) SET n = $props RETURN n"
-        else:
-            cypher = "CREATE (n) SET n = $props RETURN n"
-            
-        session.run(cypher, props=properties)
+        # 新节点的 id 由存储分配
+        new_id, version = store.create_node(name, label, properties)
+        graph_index.node_created(new_id, name, version)
+        change_log.append(version, 'node_created', id=new_id, name=name,
+                          labels=[label] if label else [], properties=properties)
         
         return jsonify({"message": "Node created", "id": new_id}), 201
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
 
 
 @api_bp.route('/node/<int:node_id>', methods=['PUT'])
@@ -61,20 +48,16 @@ def update_node(node_id):
     if not name:
         return jsonify({"error": "Missing name"}), 400
         
-    session = db.get_session()
     try:
         # 更新节点名称
-        session.run("""
-            MATCH (n) WHERE n.id = $id
-            SET n.name = $name
-            RETURN n
-        """, id=node_id, name=name)
+        version = store.set_node_property(node_id, 'name', name)
+        if version:
+            graph_index.node_renamed(node_id, name, version)
+            change_log.append(version, 'node_updated', id=node_id, properties={"name": name})
         
         return jsonify({"message": "Node updated"}), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
 
 
 @api_bp.route('/node/<int:node_id>', methods=['DELETE'])
@@ -82,19 +65,16 @@ def delete_node(node_id):
     """
     删除节点
     """
-    session = db.get_session()
     try:
-        # 删除节点及其所有关系 (DETACH DELETE)
-        session.run("""
-            MATCH (n) WHERE n.id = $id
-            DETACH DELETE n
-        """, id=node_id)
+        # 删除节点及其所有关系
+        version = store.delete_node(node_id)
+        if version:
+            graph_index.node_deleted(node_id, version)
+            change_log.append(version, 'node_deleted', id=node_id)
         
         return jsonify({"message": "Node deleted"}), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
 
 
 @api_bp.route('/node/<int:node_id>/label', methods=['POST'])
@@ -110,25 +90,17 @@ def add_label(node_id):
     
     label = label.strip().replace(' ', '_')
     
-    session = db.get_session()
     try:
         # 给节点添加标签
-        # SET n:`{label}`
-        cypher = f"""
-            MATCH (n) WHERE n.id = $id
-            SET n:`{label}`
-            RETURN n
-        """
-        result = session.run(cypher, id=node_id)
-        
-        if result.single():
+        version = store.add_label(node_id, label)
+        if version:
+            graph_index.touched(version)
+            change_log.append(version, 'label_added', id=node_id, label=label)
             return jsonify({"message": f"Label '{label}' added"}), 200
         else:
             return jsonify({"error": "Node not found"}), 404
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
 
 
 @api_bp.route('/node/<int:node_id>/label/<label_name>', methods=['DELETE'])
@@ -136,25 +108,20 @@ def remove_label(node_id, label_name):
     """
     移除节点的标签
     """
-    session = db.get_session()
+    if label_name == BASE_LABEL:
+        return jsonify({"error": "Cannot remove base label"}), 400
+
     try:
         # 移除节点标签
-        # REMOVE n:`{label_name}`
-        cypher = f"""
-            MATCH (n) WHERE n.id = $id
-            REMOVE n:`{label_name}`
-            RETURN n
-        """
-        result = session.run(cypher, id=node_id)
-        
-        if result.single():
+        version = store.remove_label(node_id, label_name)
+        if version:
+            graph_index.touched(version)
+            change_log.append(version, 'label_removed', id=node_id, label=label_name)
             return jsonify({"message": f"Label '{label_name}' removed"}), 200
         else:
             return jsonify({"error": "Node not found"}), 404
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
 
 
 @api_bp.route('/node/<int:node_id>/property', methods=['PUT'])
@@ -173,35 +140,27 @@ def update_node_property(node_id):
     if key == 'id':
         return jsonify({"error": "Cannot modify ID"}), 400
         
-    session = db.get_session()
     try:
-        # 使用 += 动态设置属性
-        # 注意：这里我们只设置一个属性，但为了安全使用参数化
-        # 由于 Cypher 不能动态设置属性名（作为参数），我们需要构建查询字符串
-        # 但要确保 key 是安全的。这里简单假设 key 是合法的标识符
-        # 更安全的方法是使用 map projection 或 APOC
+        # 属性名会被拼接到查询语句中 (Cypher 不能以参数传递属性名)，
+        # 因此要确保 key 是安全的。这里要求 key 是合法的标识符
         
         # 简单防注入检查
         if not key.isidentifier():
              return jsonify({"error": "Invalid property key"}), 400
 
         # 动态设置属性
-        # SET n.{key} = $value
-        cypher = f"""
-            MATCH (n) WHERE n.id = $id
-            SET n.{key} = $value
-            RETURN n
-        """
-        result = session.run(cypher, id=node_id, value=value)
-        
-        if result.single():
+        version = store.set_node_property(node_id, key, value)
+        if version:
+            if key == 'name':
+                graph_index.node_renamed(node_id, value, version)
+            else:
+                graph_index.touched(version)
+            change_log.append(version, 'node_updated', id=node_id, properties={key: value})
             return jsonify({"message": f"Property '{key}' updated"}), 200
         else:
             return jsonify({"error": "Node not found"}), 404
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
 
 
 @api_bp.route('/node/<int:node_id>/property/<key>', methods=['DELETE'])
@@ -215,22 +174,14 @@ def delete_node_property(node_id, key):
     if not key.isidentifier():
          return jsonify({"error": "Invalid property key"}), 400
 
-    session = db.get_session()
     try:
         # 删除节点属性
-        # REMOVE n.{key}
-        cypher = f"""
-            MATCH (n) WHERE n.id = $id
-            REMOVE n.{key}
-            RETURN n
-        """
-        result = session.run(cypher, id=node_id)
-        
-        if result.single():
+        version = store.remove_node_property(node_id, key)
+        if version:
+            graph_index.touched(version)
+            change_log.append(version, 'node_updated', id=node_id, properties={key: None})
             return jsonify({"message": f"Property '{key}' deleted"}), 200
         else:
             return jsonify({"error": "Node not found"}), 404
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
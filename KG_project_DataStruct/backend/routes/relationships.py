@@ -3,8 +3,10 @@
 包含创建、删除关系及属性的接口
 """
 from flask import jsonify, request
-from routes import api_bp
-from db import db
+from routes import api_bp, api_error
+from storage import store
+from adjacency import graph_index
+from changelog import change_log
 
 
 @api_bp.route('/relationship', methods=['POST'])
@@ -22,26 +24,17 @@ def create_relationship():
     if not source_id or not target_id or not rel_type:
         return jsonify({"error": "Missing parameters"}), 400
         
-    session = db.get_session()
     try:
-        # 使用 MERGE 避免创建重复关系
-        # MATCH 查找两个端点
-        # MERGE (a)-[r]->(b) 如果关系不存在则创建，存在则匹配
-        # SET r += $props 更新或设置属性
-        cypher = f"""
-            MATCH (a), (b)
-            WHERE a.id = $source_id AND b.id = $target_id
-            MERGE (a)-[r:`{rel_type}`]->(b)
-            SET r += $props
-            RETURN r
-        """
-        session.run(cypher, source_id=int(source_id), target_id=int(target_id), props=properties)
+        # 同类型的关系已存在时合并属性，避免创建重复关系
+        version = store.create_relationship(int(source_id), int(target_id), rel_type, properties)
+        if version:
+            graph_index.relationship_created(int(source_id), int(target_id), rel_type, version)
+            change_log.append(version, 'relationship_created', source=int(source_id), target=int(target_id),
+                              type=rel_type, properties=properties)
         
         return jsonify({"message": "Relationship created"}), 201
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
 
 
 @api_bp.route('/relationship', methods=['DELETE'])
@@ -57,30 +50,17 @@ def delete_relationship():
     if not source_id or not target_id:
         return jsonify({"error": "Missing source or target id"}), 400
         
-    session = db.get_session()
     try:
-        if rel_type:
-            # 如果指定了关系类型，只删除特定类型的关系
-            cypher = f"""
-                MATCH (a)-[r:`{rel_type}`]->(b)
-                WHERE a.id = $source_id AND b.id = $target_id
-                DELETE r
-            """
-        else:
-            # 如果未指定类型，删除两个节点间的所有关系
-            cypher = """
-                MATCH (a)-[r]->(b)
-                WHERE a.id = $source_id AND b.id = $target_id
-                DELETE r
-            """
-            
-        session.run(cypher, source_id=int(source_id), target_id=int(target_id))
+        # 指定了关系类型时只删除特定类型的关系，否则删除两个节点间的所有关系
+        version = store.delete_relationship(int(source_id), int(target_id), rel_type or None)
+        if version:
+            graph_index.relationship_deleted(int(source_id), int(target_id), rel_type or None, version)
+            change_log.append(version, 'relationship_deleted', source=int(source_id), target=int(target_id),
+                              type=rel_type or None)
         
         return jsonify({"message": "Relationship deleted"}), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
 
 
 @api_bp.route('/relationship/property', methods=['PUT'])
@@ -102,26 +82,18 @@ def update_relationship_property():
     if not key.isidentifier():
         return jsonify({"error": "Invalid property key"}), 400
         
-    session = db.get_session()
     try:
         # 更新关系属性
-        # SET r.{key} = $value
-        cypher = f"""
-            MATCH (a)-[r:`{rel_type}`]->(b)
-            WHERE a.id = $source_id AND b.id = $target_id
-            SET r.{key} = $value
-            RETURN r
-        """
-        result = session.run(cypher, source_id=int(source_id), target_id=int(target_id), value=value)
-        
-        if result.single():
+        version = store.set_relationship_property(int(source_id), int(target_id), rel_type, key, value)
+        if version:
+            graph_index.touched(version)
+            change_log.append(version, 'relationship_updated', source=int(source_id), target=int(target_id),
+                              type=rel_type, properties={key: value})
             return jsonify({"message": f"Property '{key}' updated"}), 200
         else:
             return jsonify({"error": "Relationship not found"}), 404
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
 
 
 @api_bp.route('/relationship/property', methods=['DELETE'])
@@ -141,23 +113,15 @@ def delete_relationship_property():
     if not key.isidentifier():
         return jsonify({"error": "Invalid property key"}), 400
         
-    session = db.get_session()
     try:
         # 删除关系属性
-        # REMOVE r.{key}
-        cypher = f"""
-            MATCH (a)-[r:`{rel_type}`]->(b)
-            WHERE a.id = $source_id AND b.id = $target_id
-            REMOVE r.{key}
-            RETURN r
-        """
-        result = session.run(cypher, source_id=int(source_id), target_id=int(target_id))
-        
-        if result.single():
+        version = store.remove_relationship_property(int(source_id), int(target_id), rel_type, key)
+        if version:
+            graph_index.touched(version)
+            change_log.append(version, 'relationship_updated', source=int(source_id), target=int(target_id),
+                              type=rel_type, properties={key: None})
             return jsonify({"message": f"Property '{key}' deleted"}), 200
         else:
             return jsonify({"error": "Relationship not found"}), 404
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+        return api_error(e)
@@ -0,0 +1,44 @@
+"""
+数据库 Schema 管理模块
+为所有图谱节点维护统一的基础标签，并创建 id 唯一约束和 name 索引，
+使按 id / name 的点查询走索引查找 (index seek) 而不是全库扫描
+"""
+from search import search_index_statement
+
+# 所有图谱节点共享的基础标签
+# Cypher 语句中直接写作 :KGNode，返回给前端的标签列表中会去掉它
+BASE_LABEL = 'KGNode'
+
+# Schema 语句 (均为幂等操作，可重复执行)
+SCHEMA_STATEMENTS = [
+    # id 唯一约束 (同时会创建一个支撑约束的索引)
+    "CREATE CONSTRAINT kg_node_id IF NOT EXISTS FOR (n:KGNode) REQUIRE n.id IS UNIQUE",
+    # name 索引，用于按名称精确查找
+    "CREATE INDEX kg_node_name IF NOT EXISTS FOR (n:KGNode) ON (n.name)",
+    # id 计数器节点 (见 id_allocator.py) 按名称唯一，保证并发 MERGE 不会创建出两个计数器
+    "CREATE CONSTRAINT kg_sequence_name IF NOT EXISTS FOR (s:KGSequence) REQUIRE s.name IS UNIQUE",
+]
+
+
+def ensure_schema(session, backfill=True):
+    """
+    创建约束、索引和全文搜索索引，并等待索引上线
+    backfill=True 时会先给缺少基础标签的旧节点补上 :KGNode
+    """
+    if backfill:
+        # 分批补标签，避免一次性大事务 (计数器节点 :KGSequence 不属于图谱数据)
+        session.run("""
+            MATCH (n) WHERE NOT n:KGNode AND NOT n:KGSequence
+            CALL { WITH n SET n:KGNode } IN TRANSACTIONS OF 10000 ROWS
+        """).consume()
+
+    for statement in SCHEMA_STATEMENTS + [search_index_statement()]:
+        session.run(statement).consume()
+
+    # 等待索引填充完成，之后的查询才能使用它们
+    session.run("CALL db.awaitIndexes(300)").consume()
+
+
+def strip_base_label(labels):
+    """去掉基础标签，返回用户可见的标签列表"""
+    return [label for label in labels if label != BASE_LABEL]
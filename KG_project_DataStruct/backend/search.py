@@ -0,0 +1,95 @@
+"""
+节点搜索模块
+基于 Neo4j 全文索引 (Lucene, CJK 分析器) 搜索 name 及 description 等属性，
+按相关度排序并支持分页；中文按二元组 (bigram) 切分，单字查询回退到 CONTAINS 匹配
+"""
+import re
+from neo4j.exceptions import ClientError
+from config import Config
+from steps import run_queries
+
+# 全文索引名称
+SEARCH_INDEX = 'kg_node_search'
+
+# Lucene 查询语法中的特殊字符，用户输入需要转义
+_LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+
+def search_index_statement():
+    """
+    生成全文索引的创建语句 (由 schema.ensure_schema 执行)
+    索引字段来自 Config.SEARCH_FIELDS；修改字段后需先 DROP INDEX kg_node_search 再重建
+    """
+    fields = ', '.join(f'n.`{field}`' for field in Config.SEARCH_FIELDS)
+    return (
+        f"CREATE FULLTEXT INDEX {SEARCH_INDEX} IF NOT EXISTS "
+        f"FOR (n:KGNode) ON EACH [{fields}] "
+        "OPTIONS {indexConfig: {`fulltext.analyzer`: 'cjk'}}"
+    )
+
+
+def build_fulltext_query(term):
+    """
+    将用户输入转换为 Lucene 查询
+    - 按空白切分，每个词转义特殊字符
+    - 纯字母数字的词追加前缀通配符 (输入时即可匹配)，中文词交给 CJK 分析器切分
+    - name 字段上的命中额外加权
+    """
+    clauses = []
+    for token in term.split():
+        escaped = _LUCENE_SPECIAL.sub(r'\\\1', token)
+        if token.isascii() and token.isalnum():
+            clauses.append(f'({escaped} OR {escaped.lower()}*)')
+        else:
+            clauses.append(escaped)
+    if not clauses:
+        return None
+    query = ' '.join(clauses)
+    return f'({query}) OR name:({query})^2'
+
+
+def _needs_fallback(term):
+    """CJK 二元组索引无法匹配单个汉字，这类查询使用 CONTAINS 扫描"""
+    stripped = term.strip()
+    return len(stripped) == 1 and not stripped.isascii()
+
+
+def search_steps(term, limit=10, offset=0):
+    """
+    查询步骤 (见 steps.py，同步会话与 ASGI 模式的异步会话共用): 搜索节点，
+    返回 [(节点, 标签列表, 相关度分数)]，按分数从高到低排列
+    全文索引不可用时需要在同一会话中回退查询，因此在会话而不是托管事务中执行
+    """
+    query = build_fulltext_query(term)
+    if query is None:
+        return []
+
+    if not _needs_fallback(term):
+        try:
+            records = yield """
+                CALL db.index.fulltext.queryNodes($index, $query, {skip: $skip, limit: $limit})
+                YIELD node, score
+                RETURN node AS n, labels(node) AS labels, score
+            """, {"index": SEARCH_INDEX, "query": query, "skip": offset, "limit": limit}
+            # 全文索引未命中即没有结果，不做全表扫描
+            return [(record['n'], record['labels'], record['score']) for record in records]
+        except ClientError:
+            # 全文索引尚未创建 (例如 Schema 初始化失败)，回退到扫描
+            pass
+
+    # 单字查询或全文索引不可用: 在索引字段上做不区分大小写的 CONTAINS 匹配，名称完全匹配的排在前面
+    records = yield """
+        MATCH (n:KGNode)
+        WHERE any(field IN $fields WHERE toLower(toString(n[field])) CONTAINS toLower($term))
+        WITH n, CASE WHEN toLower(n.name) = toLower($term) THEN 1.0 ELSE 0.5 END AS score
+        RETURN n, labels(n) AS labels, score
+        ORDER BY score DESC, n.id
+        SKIP $skip
+        LIMIT $limit
+    """, {"fields": Config.SEARCH_FIELDS, "term": term.strip(), "skip": offset, "limit": limit}
+    return [(record['n'], record['labels'], record['score']) for record in records]
+
+
+def search_nodes(session, term, limit=10, offset=0):
+    """在同步会话中搜索节点，返回值见 search_steps"""
+    return run_queries(session, search_steps(term, limit, offset))
@@ -0,0 +1,86 @@
+"""
+步骤函数 (同步 / 异步共用的读取逻辑)
+步骤函数是生成器: 每次 yield 一个请求，由执行器完成后把结果 send 回生成器 (出错时 throw 异常)，
+生成器的返回值即最终结果。同一份逻辑因此既可以在 Flask 中同步执行 (run)，
+也可以在 ASGI 模式的事件循环上异步执行 (run_async)，两种模式不必各写一份
+  查询步骤: 请求为 (Cypher 语句, 参数)，结果为全部记录的列表 (run_queries / run_queries_async)
+  读取步骤: 请求为 (读取方法名, 参数元组)，如 routes.graph.graph_steps
+"""
+
+
+def run(steps, perform):
+    """同步执行步骤函数 steps (生成器)，perform(请求) 返回该请求的结果"""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                result = perform(request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def run_async(steps, perform):
+    """异步执行步骤函数 steps，await perform(请求) 返回该请求的结果"""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                result = await perform(request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+
+def stream(steps, perform):
+    """
+    同步执行同时产生输出的步骤函数: yield 的字符串作为输出块依次产出，其他值作为请求交给 perform
+    (用于逐页读取的流式响应)
+    """
+    result = None
+    while True:
+        try:
+            request = steps.send(result)
+        except StopIteration:
+            return
+        if isinstance(request, str):
+            yield request
+            result = None
+        else:
+            result = perform(request)
+
+
+async def stream_async(steps, perform):
+    """stream 的异步版本，输出块编码为 UTF-8 字节"""
+    result = None
+    while True:
+        try:
+            request = steps.send(result)
+        except StopIteration:
+            return
+        if isinstance(request, str):
+            yield request.encode('utf-8')
+            result = None
+        else:
+            result = await perform(request)
+
+
+def run_queries(tx, steps):
+    """在事务 (或会话) tx 上同步执行查询步骤"""
+    return run(steps, lambda request: list(tx.run(*request)))
+
+
+async def run_queries_async(tx, steps):
+    """在异步事务 (或会话) tx 上执行查询步骤"""
+
+    async def perform(request):
+        result = await tx.run(*request)
+        return [record async for record in result]
+
+    return await run_async(steps, perform)
@@ -0,0 +1,28 @@
+"""
+存储后端包
+路由、邻接索引和批量导入通过 GraphStore 接口读写图数据，由 Config.STORAGE_BACKEND 选择实现:
+  neo4j:  Neo4j 数据库 (默认，见 neo4j_store.py)
+  sqlite: 嵌入式 SQLite 数据库文件 (无需数据库服务器，见 sqlite_store.py)
+"""
+from config import Config
+from storage.base import GraphLoader, GraphStore
+from storage.neo4j_store import Neo4jStore
+from storage.sqlite_store import SQLiteStore
+
+# 可选的存储后端
+BACKENDS = {
+    Neo4jStore.name: Neo4jStore,
+    SQLiteStore.name: SQLiteStore,
+}
+
+
+def create_store(backend=None):
+    """按名称创建存储后端，名称未知时抛出 ValueError"""
+    backend = backend or Config.STORAGE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected one of {tuple(BACKENDS)}")
+    return BACKENDS[backend]()
+
+
+# 全局存储实例
+store = create_store()
@@ -0,0 +1,197 @@
+"""
+存储接口
+GraphStore 定义路由与邻接索引需要的全部读写操作，具体实现见 neo4j_store.py / sqlite_store.py
+- 节点以前端格式的字典表示: {"id", "name", "category", "labels", "properties"}
+- 关系以前端格式的字典表示: {"source", "target", "name", "properties"}
+- 修改操作返回修改后的图版本号，没有命中任何节点 / 关系时返回 None
+"""
+
+
+def node_dict(node_id, name, labels, properties):
+    """生成前端使用的节点字典 (labels 为不含基础标签的业务标签，properties 包含 id 和 name)"""
+    return {
+        "id": node_id,
+        "name": name,
+        "category": labels[0] if labels else None,
+        "labels": labels,
+        "properties": properties,
+    }
+
+
+def link_dict(source_id, target_id, rel_type, properties):
+    """生成前端使用的关系字典"""
+    return {
+        "source": source_id,
+        "target": target_id,
+        "name": rel_type,
+        "properties": properties,
+    }
+
+
+class GraphStore:
+    """图存储接口，未实现的操作抛出 NotImplementedError"""
+
+    # 后端名称 (Config.STORAGE_BACKEND 的取值)
+    name = None
+
+    def bootstrap(self):
+        """应用启动时初始化存储 (建表、约束、索引)，可重复执行"""
+        raise NotImplementedError
+
+    def is_unavailable(self, error):
+        """异常是否表示存储暂时不可用 (返回 503 而不是 500)"""
+        return False
+
+    # ---------- 读取 ----------
+
+    def version(self):
+        """当前图版本号 (每次修改加一，用于 ETag、响应缓存和邻接索引)"""
+        raise NotImplementedError
+
+    def graph_page(self, after, limit):
+        """
+        按 id 键集分页读取一页图数据: id > after 的前 limit 个节点，以及这些节点发出的所有关系
+        返回 (nodes, links, next_cursor)，没有下一页时 next_cursor 为 None
+        """
+        raise NotImplementedError
+
+    def full_graph(self):
+        """读取全图，返回 (nodes, links)；关系最多 GRAPH_FULL_LINKS_MAX 条"""
+        raise NotImplementedError
+
+    def subgraph(self, node_ids, relationships):
+        """
+        读取一组节点和关系的属性，relationships 为 [{"source", "target", "type"}]
+        返回 (nodes, links)，顺序与输入相同；不存在的节点被跳过，不存在的关系属性为空
+        """
+        raise NotImplementedError
+
+    def paths(self, paths):
+        """
+        补全路径查询结果中节点和关系的属性
+        paths 为 AdjacencyIndex.find_paths 的返回值 [(代价, 节点 id 列表, 关系列表)]
+        """
+        node_ids = list(dict.fromkeys(node_id for _, ids, _ in paths for node_id in ids))
+        relationships = [rel for _, _, rels in paths for rel in rels]
+        nodes, links = self.subgraph(node_ids, relationships)
+        nodes = {node['id']: node for node in nodes}
+        links = iter(links)
+        return [{
+            "path": [nodes[node_id] for node_id in ids if node_id in nodes],
+            "relationships": [next(links) for _ in rels],
+            "cost": cost,
+            "length": len(rels),
+        } for cost, ids, rels in paths]
+
+    def search(self, term, limit=10, offset=0):
+        """搜索节点，返回按相关度从高到低排列的节点字典 (带 score 字段)"""
+        raise NotImplementedError
+
+    def label_counts(self):
+        """
+        按节点的第一个业务标签聚合 (labels 视图)
+        返回 ([(标签, 节点数)], [(起点标签, 终点标签, 关系类型, 关系数)])，没有业务标签时标签为 None
+        """
+        raise NotImplementedError
+
+    def topology(self):
+        """在一致的快照中读取图版本号和全图拓扑，返回 (版本号, [(id, name)], [(起点 id, 终点 id, 类型)])"""
+        raise NotImplementedError
+
+    def edge_weights(self, prop):
+        """读取所有带有属性 prop 的关系，返回 [(起点 id, 终点 id, 类型, 属性值)]"""
+        raise NotImplementedError
+
+    def export_nodes(self):
+        """按 id 顺序流式读取全部节点，逐个产生 (id, name, 业务标签列表, 其他属性)"""
+        raise NotImplementedError
+
+    def export_relationships(self):
+        """流式读取全部关系，逐个产生 (起点 id, 终点 id, 类型, 属性)"""
+        raise NotImplementedError
+
+    def export_nodes_by_id(self, node_ids):
+        """读取一组 id 的节点 (不存在的 id 被跳过)，逐个产生 (id, name, 业务标签列表, 其他属性)"""
+        raise NotImplementedError
+
+    def export_relationships_between(self, pairs):
+        """读取一组 (起点 id, 终点 id) 之间的所有关系，逐个产生 (起点 id, 终点 id, 类型, 属性)"""
+        raise NotImplementedError
+
+    # ---------- 修改 ----------
+
+    def create_node(self, name, label=None, properties=None):
+        """创建节点 (分配新 id)，返回 (新节点 id, 图版本号)"""
+        raise NotImplementedError
+
+    def delete_node(self, node_id):
+        """删除节点及其所有关系"""
+        raise NotImplementedError
+
+    def add_label(self, node_id, label):
+        raise NotImplementedError
+
+    def remove_label(self, node_id, label):
+        raise NotImplementedError
+
+    def set_node_property(self, node_id, key, value):
+        """设置节点属性 (key 为合法标识符，值为 None 时删除该属性)"""
+        raise NotImplementedError
+
+    def remove_node_property(self, node_id, key):
+        raise NotImplementedError
+
+    def create_relationship(self, source_id, target_id, rel_type, properties=None):
+        """创建关系 (已存在同类型关系时合并属性)，两端节点都必须存在"""
+        raise NotImplementedError
+
+    def delete_relationship(self, source_id, target_id, rel_type=None):
+        """删除两个节点之间的关系，rel_type 为 None 时删除所有类型"""
+        raise NotImplementedError
+
+    def set_relationship_property(self, source_id, target_id, rel_type, key, value):
+        raise NotImplementedError
+
+    def remove_relationship_property(self, source_id, target_id, rel_type, key):
+        raise NotImplementedError
+
+    def apply_batch(self, compiler, groups):
+        """
+        在一个事务中执行 batch_ops.BatchCompiler 编译出的操作组，任一操作失败时整体回滚
+        返回 (为新建节点分配的 id 列表 (与 create_node 操作的顺序相同), 图版本号)
+        """
+        raise NotImplementedError
+
+    # ---------- 批量导入 ----------
+
+    def loader(self, mode='full', batch_size=None, workers=None):
+        """
+        创建批量导入器 (mode 为 full 时先清空图数据)，返回 GraphLoader
+        用法: loader.load_entities(rows)，loader.load_relations(rows)，version = loader.commit()，
+        最后总是调用 loader.close()
+        """
+        raise NotImplementedError
+
+
+class GraphLoader:
+    """批量导入器接口 (GraphStore.loader 的返回值)"""
+
+    def load_entities(self, rows):
+        """导入实体行 (csv.DictReader 或任意 dict 可迭代对象)"""
+        raise NotImplementedError
+
+    def load_relations(self, rows):
+        """导入关系行，应在 load_entities 之后调用"""
+        raise NotImplementedError
+
+    def stats(self):
+        """导入统计信息 (行数、批次数、耗时等)"""
+        raise NotImplementedError
+
+    def commit(self):
+        """导入完成，递增并返回图版本号"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放资源，尚未 commit 的导入 (如果后端支持) 被回滚"""
+        raise NotImplementedError
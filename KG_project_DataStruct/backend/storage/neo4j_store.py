@@ -0,0 +1,465 @@
+"""
+Neo4j 存储实现
+读操作使用托管读事务 (db.read)，修改操作通过 graph_cache.apply_change 在同一事务中递增图版本号；
+批量导入使用 loader.BulkLoader / ParallelLoader (full 模式) 或 diff_import.DiffImporter (diff 模式)
+"""
+import copy
+from neo4j import READ_ACCESS
+from neo4j.exceptions import ConstraintError
+from config import Config
+from db import db, is_unavailable
+from graph_cache import apply_change, current_version, mark_graph_changed
+from schema import BASE_LABEL, ensure_schema, strip_base_label
+from steps import run_queries
+from search import search_nodes
+from id_allocator import id_allocator
+from loader import BulkLoader, ParallelLoader
+from diff_import import DiffImporter
+from batch_ops import bind_ids, execute
+from storage.base import GraphLoader, GraphStore, link_dict, node_dict
+
+# 图数据查询语句
+PAGE_NODES_QUERY = """
+    MATCH (n:KGNode) WHERE n.id > $after
+    RETURN n, labels(n) as labels
+    ORDER BY n.id
+    LIMIT $limit
+"""
+PAGE_LINKS_QUERY = """
+    MATCH (n:KGNode)-[r]->(m:KGNode)
+    WHERE n.id IN $ids
+    RETURN n.id as source_id, m.id as target_id, type(r) as rel_type, properties(r) as props
+"""
+# MATCH (n:KGNode) 匹配所有图谱节点，labels(n) 获取节点的标签列表
+FULL_NODES_QUERY = """
+    MATCH (n:KGNode)
+    RETURN n, labels(n) as labels
+"""
+# 关系最多返回 $limit 条 (GRAPH_FULL_LINKS_MAX)，需要完整关系时请使用分页参数、NDJSON 或邻域查询
+FULL_LINKS_QUERY = """
+    MATCH (n:KGNode)-[r]->(m:KGNode)
+    RETURN n.id as source_id, m.id as target_id, type(r) as rel_type, properties(r) as props
+    LIMIT $limit
+"""
+
+# 按标签聚合 (节点的第一个业务标签，与 node_to_dict 中的 category 一致)
+LABEL_NODES_QUERY = """
+    MATCH (n:KGNode)
+    RETURN [l IN labels(n) WHERE l <> $base][0] AS label, count(*) AS size
+"""
+LABEL_LINKS_QUERY = """
+    MATCH (a:KGNode)-[r]->(b:KGNode)
+    RETURN [l IN labels(a) WHERE l <> $base][0] AS source,
+           [l IN labels(b) WHERE l <> $base][0] AS target,
+           type(r) AS type, count(*) AS count
+"""
+
+
+def node_to_dict(n, labels):
+    """将 Neo4j 节点转换为前端使用的字典格式"""
+    return node_dict(n.get('id'), n.get('name'), strip_base_label(labels), dict(n))
+
+
+def link_to_dict(record):
+    """将关系查询结果转换为前端使用的字典格式"""
+    return link_dict(record['source_id'], record['target_id'], record['rel_type'], record['props'])
+
+
+def fetch_nodes(tx, ids):
+    """按 id 读取节点，按 ids 的顺序返回前端格式的字典列表 (不存在的 id 被跳过)"""
+    result = tx.run("""
+        MATCH (n:KGNode) WHERE n.id IN $ids
+        RETURN n, labels(n) as labels
+    """, ids=ids)
+    found = {record['n'].get('id'): node_to_dict(record['n'], record['labels']) for record in result}
+    return [found[node_id] for node_id in ids if node_id in found]
+
+
+def fetch_relationships(tx, relationships):
+    """
+    读取关系的属性，relationships 为 [{"source", "target", "type"}]
+    按输入顺序返回与 /api/graph 中 links 相同格式的字典列表
+    """
+    result = tx.run("""
+        UNWIND $rels AS rel
+        MATCH (a:KGNode)-[r]->(b:KGNode)
+        WHERE a.id = rel.source AND b.id = rel.target AND type(r) = rel.type
+        RETURN a.id as source_id, b.id as target_id, type(r) as rel_type, properties(r) as props
+    """, rels=relationships)
+    found = {(record['source_id'], record['target_id'], record['rel_type']): link_to_dict(record)
+             for record in result}
+    return [found.get((rel['source'], rel['target'], rel['type']),
+                      link_dict(rel['source'], rel['target'], rel['type'], {}))
+            for rel in relationships]
+
+
+def fetch_subgraph(tx, node_ids, relationships):
+    """事务函数: 读取一组节点和关系的属性，返回 (nodes, links)，顺序与输入相同"""
+    return fetch_nodes(tx, node_ids), fetch_relationships(tx, relationships)
+
+
+def graph_page_steps(after, limit):
+    """
+    查询步骤 (见 steps.py，同步事务与 ASGI 模式的异步事务共用):
+    按 id 键集分页 (keyset pagination) 读取一页图数据，返回 (nodes, links, next_cursor)
+    - 节点: id > after 的前 limit 个节点，按 id 升序 (走 id 索引，不需要排序全库)
+    - 关系: 本页节点发出的所有关系，因此关系与节点以同样的游标分页，不会被截断
+    """
+    records = yield PAGE_NODES_QUERY, {"after": after, "limit": limit}
+    nodes = [node_to_dict(record['n'], record['labels']) for record in records]
+    if not nodes:
+        return [], [], None
+
+    ids = [node['id'] for node in nodes]
+    records = yield PAGE_LINKS_QUERY, {"ids": ids}
+    links = [link_to_dict(record) for record in records]
+
+    next_cursor = ids[-1] if len(nodes) == limit else None
+    return nodes, links, next_cursor
+
+
+def full_graph_steps():
+    """
+    查询步骤: 读取全图数据 (不分页)，返回 (nodes, links)，关系最多 GRAPH_FULL_LINKS_MAX 条
+    大图请使用分页 / NDJSON，或通过 /api/node/<id>/neighbors 按需加载
+    """
+    nodes = {}
+    # 1. 获取所有节点及其属性
+    for record in (yield FULL_NODES_QUERY, {}):
+        n = record['n']
+        nodes.setdefault(n.get('id'), node_to_dict(n, record['labels']))
+
+    # 2. 获取所有关系及其属性
+    records = yield FULL_LINKS_QUERY, {"limit": Config.GRAPH_FULL_LINKS_MAX}
+    return list(nodes.values()), [link_to_dict(record) for record in records]
+
+
+def scored_nodes(hits):
+    """search_steps 的结果 [(节点, 标签列表, 分数)] -> 带 score 字段的前端格式节点列表"""
+    nodes = []
+    for n, labels, score in hits:
+        node = node_to_dict(n, labels)
+        node['score'] = score
+        nodes.append(node)
+    return nodes
+
+
+def fetch_graph_page(tx, after, limit):
+    """事务函数: 读取一页图数据，见 graph_page_steps"""
+    return run_queries(tx, graph_page_steps(after, limit))
+
+
+def fetch_full_graph(tx):
+    """事务函数: 读取全图数据，见 full_graph_steps"""
+    return run_queries(tx, full_graph_steps())
+
+
+def fetch_label_counts(tx):
+    """事务函数: 按第一个业务标签聚合节点数和关系数"""
+    nodes = [(record['label'], record['size']) for record in tx.run(LABEL_NODES_QUERY, base=BASE_LABEL)]
+    links = [(record['source'], record['target'], record['type'], record['count'])
+             for record in tx.run(LABEL_LINKS_QUERY, base=BASE_LABEL)]
+    return nodes, links
+
+
+def fetch_topology(tx):
+    """事务函数: 在一个读事务中读取版本号和全图拓扑"""
+    version = current_version(tx)
+    nodes = [(record['id'], record['name']) for record in tx.run("""
+        MATCH (n:KGNode) WHERE n.id IS NOT NULL
+        RETURN n.id AS id, n.name AS name
+    """)]
+    relations = [(record['source_id'], record['target_id'], record['type']) for record in tx.run("""
+        MATCH (a:KGNode)-[r]->(b:KGNode)
+        RETURN a.id AS source_id, b.id AS target_id, type(r) AS type
+    """)]
+    return version, nodes, relations
+
+
+class Neo4jStore(GraphStore):
+    """Neo4j 存储 (默认后端)"""
+
+    name = 'neo4j'
+
+    def bootstrap(self):
+        session = db.get_session()
+        try:
+            ensure_schema(session)
+        finally:
+            session.close()
+
+    def is_unavailable(self, error):
+        return is_unavailable(error)
+
+    # ---------- 读取 ----------
+
+    def version(self):
+        return db.read(current_version)
+
+    def graph_page(self, after, limit):
+        return db.read(fetch_graph_page, after, limit)
+
+    def full_graph(self):
+        return db.read(fetch_full_graph)
+
+    def subgraph(self, node_ids, relationships):
+        return db.read(fetch_subgraph, node_ids, relationships)
+
+    def search(self, term, limit=10, offset=0):
+        # 搜索在全文索引不可用时需要在同一会话中回退查询，因此使用只读会话而不是托管事务
+        session = db.get_session(READ_ACCESS)
+        try:
+            return scored_nodes(search_nodes(session, term, limit=limit, offset=offset))
+        finally:
+            session.close()
+
+    def label_counts(self):
+        return db.read(fetch_label_counts)
+
+    def topology(self):
+        return db.read(fetch_topology)
+
+    def edge_weights(self, prop):
+        rows = db.read("""
+            MATCH (a:KGNode)-[r]->(b:KGNode) WHERE r[$prop] IS NOT NULL
+            RETURN a.id AS source_id, b.id AS target_id, type(r) AS type, r[$prop] AS weight
+        """, prop=prop)
+        return [(record['source_id'], record['target_id'], record['type'], record['weight']) for record in rows]
+
+    def export_nodes(self):
+        # 以有限的 fetch_size 流式读取，按 id 索引顺序输出 (无需在内存中排序)
+        session = db.get_session(READ_ACCESS, fetch_size=Config.EXPORT_FETCH_SIZE)
+        try:
+            for record in session.run("""
+                MATCH (n:KGNode) WHERE n.id IS NOT NULL
+                RETURN n, labels(n) as labels
+                ORDER BY n.id
+            """):
+                props = dict(record['n'])
+                node_id = props.pop('id', None)
+                name = props.pop('name', None)
+                yield node_id, name, strip_base_label(record['labels']), props
+        finally:
+            session.close()
+
+    def export_relationships(self):
+        # 按源节点 id 索引顺序遍历，每个节点展开其出边
+        session = db.get_session(READ_ACCESS, fetch_size=Config.EXPORT_FETCH_SIZE)
+        try:
+            for record in session.run("""
+                MATCH (a:KGNode) WHERE a.id IS NOT NULL
+                WITH a ORDER BY a.id
+                MATCH (a)-[r]->(b:KGNode)
+                RETURN a.id as source_id, b.id as target_id, type(r) as type, properties(r) as props
+            """):
+                yield record['source_id'], record['target_id'], record['type'], record['props']
+        finally:
+            session.close()
+
+    def export_nodes_by_id(self, node_ids):
+        node_ids = list(node_ids)
+        session = db.get_session(READ_ACCESS, fetch_size=Config.EXPORT_FETCH_SIZE)
+        try:
+            for start in range(0, len(node_ids), Config.EXPORT_FETCH_SIZE):
+                for record in session.run("""
+                    UNWIND $ids AS id
+                    MATCH (n:KGNode) WHERE n.id = id
+                    RETURN n, labels(n) as labels
+                """, ids=node_ids[start:start + Config.EXPORT_FETCH_SIZE]):
+                    props = dict(record['n'])
+                    node_id = props.pop('id', None)
+                    name = props.pop('name', None)
+                    yield node_id, name, strip_base_label(record['labels']), props
+        finally:
+            session.close()
+
+    def export_relationships_between(self, pairs):
+        pairs = [list(pair) for pair in pairs]
+        session = db.get_session(READ_ACCESS, fetch_size=Config.EXPORT_FETCH_SIZE)
+        try:
+            for start in range(0, len(pairs), Config.EXPORT_FETCH_SIZE):
+                for record in session.run("""
+                    UNWIND $pairs AS pair
+                    MATCH (a:KGNode) WHERE a.id = pair[0]
+                    MATCH (a)-[r]->(b:KGNode) WHERE b.id = pair[1]
+                    RETURN a.id as source_id, b.id as target_id, type(r) as type, properties(r) as props
+                """, pairs=pairs[start:start + Config.EXPORT_FETCH_SIZE]):
+                    yield record['source_id'], record['target_id'], record['type'], record['props']
+        finally:
+            session.close()
+
+    # ---------- 修改 ----------
+
+    def create_node(self, name, label=None, properties=None):
+        properties = dict(properties or {})
+        # 确保 name 在属性中
+        properties['name'] = name
+
+        # 动态插入标签 (注意: 标签不能作为参数传递，只能拼接到 Cypher 字符串中)
+        # 所有节点都带有基础标签 KGNode
+        if label:
+            cypher = f"CREATE (n:KGNode:`{label}`) SET n = $props RETURN n"
+        else:
+            cypher = "CREATE (n:KGNode) SET n = $props RETURN n"
+
+        session = db.get_session()
+        try:
+            # 从 id 分配器获取新 id (进程内按块分配，无需 max(n.id) 扫描)
+            # 若本进程租用的 id 块在数据重新导入后已被占用，唯一约束会报错，
+            # 此时丢弃旧块并用新租用的 id 重试一次
+            for attempt in range(2):
+                new_id = id_allocator.next_id(session)
+                properties['id'] = new_id
+                try:
+                    return new_id, session.execute_write(apply_change, cypher, {"props": properties})
+                except ConstraintError:
+                    id_allocator.reset()
+                    if attempt:
+                        raise
+        finally:
+            session.close()
+
+    def delete_node(self, node_id):
+        # 删除节点及其所有关系 (DETACH DELETE)
+        return db.write(apply_change, """
+            MATCH (n:KGNode) WHERE n.id = $id
+            DETACH DELETE n
+            RETURN true AS deleted
+        """, {"id": node_id})
+
+    def add_label(self, node_id, label):
+        return db.write(apply_change, f"""
+            MATCH (n:KGNode) WHERE n.id = $id
+            SET n:`{label}`
+            RETURN n
+        """, {"id": node_id})
+
+    def remove_label(self, node_id, label):
+        return db.write(apply_change, f"""
+            MATCH (n:KGNode) WHERE n.id = $id
+            REMOVE n:`{label}`
+            RETURN n
+        """, {"id": node_id})
+
+    def set_node_property(self, node_id, key, value):
+        # 属性名不能作为参数传递，调用方保证 key 是合法标识符
+        return db.write(apply_change, f"""
+            MATCH (n:KGNode) WHERE n.id = $id
+            SET n.{key} = $value
+            RETURN n
+        """, {"id": node_id, "value": value})
+
+    def remove_node_property(self, node_id, key):
+        return db.write(apply_change, f"""
+            MATCH (n:KGNode) WHERE n.id = $id
+            REMOVE n.{key}
+            RETURN n
+        """, {"id": node_id})
+
+    def create_relationship(self, source_id, target_id, rel_type, properties=None):
+        # MERGE (a)-[r]->(b) 如果关系不存在则创建，存在则匹配；SET r += $props 更新或设置属性
+        return db.write(apply_change, f"""
+            MATCH (a:KGNode), (b:KGNode)
+            WHERE a.id = $source_id AND b.id = $target_id
+            MERGE (a)-[r:`{rel_type}`]->(b)
+            SET r += $props
+            RETURN r
+        """, {"source_id": source_id, "target_id": target_id, "props": properties or {}})
+
+    def delete_relationship(self, source_id, target_id, rel_type=None):
+        pattern = f"-[r:`{rel_type}`]->" if rel_type else "-[r]->"
+        return db.write(apply_change, f"""
+            MATCH (a:KGNode){pattern}(b:KGNode)
+            WHERE a.id = $source_id AND b.id = $target_id
+            DELETE r
+            RETURN true AS deleted
+        """, {"source_id": source_id, "target_id": target_id})
+
+    def set_relationship_property(self, source_id, target_id, rel_type, key, value):
+        return db.write(apply_change, f"""
+            MATCH (a:KGNode)-[r:`{rel_type}`]->(b:KGNode)
+            WHERE a.id = $source_id AND b.id = $target_id
+            SET r.{key} = $value
+            RETURN r
+        """, {"source_id": source_id, "target_id": target_id, "value": value})
+
+    def remove_relationship_property(self, source_id, target_id, rel_type, key):
+        return db.write(apply_change, f"""
+            MATCH (a:KGNode)-[r:`{rel_type}`]->(b:KGNode)
+            WHERE a.id = $source_id AND b.id = $target_id
+            REMOVE r.{key}
+            RETURN r
+        """, {"source_id": source_id, "target_id": target_id})
+
+    def apply_batch(self, compiler, groups):
+        session = db.get_session()
+        try:
+            # 新节点的 id 在事务开始前一次性租用 (计数器更新不属于本次事务)；
+            # 与 create_node 相同，租用的 id 块已被占用时唯一约束报错，丢弃旧块并用新租用的 id 重试一次
+            # bind_ids 就地修改行数据 (取出占位序号)，因此保留一份未绑定的副本，每次尝试前恢复
+            unbound = copy.deepcopy(groups)
+            for attempt in range(2):
+                groups[:] = copy.deepcopy(unbound)
+                new_ids = id_allocator.allocate(session, compiler.create_count) if compiler.create_count else []
+                bind_ids(groups, new_ids)
+
+                # 所有语句在同一个托管事务中执行，任何一步出错即整体回滚；
+                # 死锁等暂时性错误时驱动会重新执行整个事务 (各组语句的参数在重试间不变)
+                try:
+                    version = session.execute_write(execute, groups)
+                    return new_ids, version
+                except ConstraintError:
+                    id_allocator.reset()
+                    if attempt:
+                        raise
+        finally:
+            session.close()
+
+    # ---------- 批量导入 ----------
+
+    def loader(self, mode='full', batch_size=None, workers=None):
+        return Neo4jLoader(mode, batch_size, workers)
+
+
+class Neo4jLoader(GraphLoader):
+    """
+    根据导入模式创建导入器，并准备数据库
+    full 模式先清空数据库；两种模式都会确保约束和索引存在，导入关系时按 id 匹配端点走索引
+    full 模式下 workers > 1 时使用多线程并行导入器 (差异导入始终为单线程)
+    Neo4j 的批量导入按批次提交，不能整体回滚
+    """
+
+    def __init__(self, mode, batch_size=None, workers=None):
+        self.session = db.get_session()
+        try:
+            workers = workers or Config.IMPORT_WORKERS
+            if mode == 'diff':
+                self.importer = DiffImporter(self.session, batch_size=batch_size)
+            elif workers > 1:
+                self.importer = ParallelLoader(self.session, batch_size=batch_size, workers=workers)
+                self.importer.clear()
+            else:
+                # 使用批量导入器：按标签 / 关系类型分组，每批一个 UNWIND 事务
+                self.importer = BulkLoader(self.session, batch_size=batch_size)
+                self.importer.clear()
+            ensure_schema(self.session, backfill=False)
+        except Exception:
+            self.session.close()
+            raise
+
+    def load_entities(self, rows):
+        self.importer.load_entities(rows)
+
+    def load_relations(self, rows):
+        self.importer.load_relations(rows)
+
+    def stats(self):
+        return self.importer.stats()
+
+    def commit(self):
+        # 数据已被替换，丢弃本进程租用的 id 块，并使图数据缓存失效
+        id_allocator.reset()
+        return mark_graph_changed(self.session)
+
+    def close(self):
+        self.session.close()
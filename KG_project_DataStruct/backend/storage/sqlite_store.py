@@ -0,0 +1,736 @@
+"""
+SQLite 存储实现 (嵌入式，无需数据库服务器)
+- nodes(id, name, labels, properties): labels 为业务标签的 JSON 数组，properties 为除 id / name 外属性的 JSON 对象
+- relationships(source_id, target_id, type, properties): 主键 (source_id, target_id, type) 即按源节点聚簇的出边表，
+  另有 (target_id, source_id, type) 索引；外键 ON DELETE CASCADE 使删除节点时一并删除其关系
+- meta: 图版本号与 id 计数器，修改操作在同一事务中递增版本号
+- node_search: FTS5 trigram 全文索引 (覆盖 Config.SEARCH_FIELDS)，由触发器维护
+使用 WAL 模式，读事务互不阻塞，写事务 (BEGIN IMMEDIATE) 串行执行；连接按线程复用 (连接池)
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from config import Config
+from loader import parse_entity_row, parse_relation_row
+from batch_ops import BatchError, bind_ids
+from schema import BASE_LABEL
+from storage.base import GraphLoader, GraphStore, link_dict, node_dict
+
+# SQLITE_PATH 为 :memory: 时使用的共享内存数据库 (同一进程内的所有连接共用)
+MEMORY_URI = 'file:kg-graph?mode=memory&cache=shared'
+
+SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS nodes (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        labels TEXT NOT NULL DEFAULT '[]',
+        properties TEXT NOT NULL DEFAULT '{}'
+    )
+    """,
+    # name 索引，用于按名称精确查找；第一个标签的表达式索引用于按标签聚合 (labels 视图)
+    "CREATE INDEX IF NOT EXISTS nodes_name ON nodes (name)",
+    "CREATE INDEX IF NOT EXISTS nodes_label ON nodes (json_extract(labels, '$[0]'))",
+    """
+    CREATE TABLE IF NOT EXISTS relationships (
+        source_id INTEGER NOT NULL REFERENCES nodes (id) ON DELETE CASCADE,
+        target_id INTEGER NOT NULL REFERENCES nodes (id) ON DELETE CASCADE,
+        type TEXT NOT NULL,
+        properties TEXT NOT NULL DEFAULT '{}',
+        PRIMARY KEY (source_id, target_id, type)
+    ) WITHOUT ROWID
+    """,
+    # 入边索引 (也用于删除节点时按外键查找其关系)
+    "CREATE INDEX IF NOT EXISTS relationships_target ON relationships (target_id, source_id, type)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO meta (key, value) VALUES ('graph_version', 0), ('node_id', 0)",
+]
+
+NODE_COLUMNS = "id, name, labels, properties"
+
+INSERT_NODE = "INSERT INTO nodes (id, name, labels, properties) VALUES (?, ?, ?, ?)"
+
+# 创建关系 (已存在同类型关系时合并属性，与 Cypher 的 MERGE ... SET r += props 一致，值为 null 的属性被删除)
+# 两端节点不存在时不插入 (rowcount 为 0)
+MERGE_RELATIONSHIP = """
+    INSERT INTO relationships (source_id, target_id, type, properties)
+    SELECT :source_id, :target_id, :type, json_patch('{}', :props)
+    WHERE EXISTS (SELECT 1 FROM nodes WHERE id = :source_id)
+      AND EXISTS (SELECT 1 FROM nodes WHERE id = :target_id)
+    ON CONFLICT (source_id, target_id, type) DO UPDATE SET properties = json_patch(properties, :props)
+"""
+
+ADD_LABEL = """
+    UPDATE nodes SET labels = CASE
+        WHEN ? = ? OR EXISTS (SELECT 1 FROM json_each(labels) WHERE value = ?) THEN labels
+        ELSE json_insert(labels, '$[#]', ?)
+    END
+    WHERE id = ?
+"""
+REMOVE_LABEL = """
+    UPDATE nodes SET labels = (SELECT json_group_array(value) FROM json_each(labels) WHERE value <> ?)
+    WHERE id = ?
+"""
+
+# 合并节点属性 (SET n += props)，name 保存在单独的列中
+PATCH_NODE = """
+    UPDATE nodes SET name = CASE WHEN :has_name THEN :name ELSE name END,
+                     properties = json_patch(properties, :props)
+    WHERE id = :id
+"""
+
+DELETE_RELATIONSHIP = "DELETE FROM relationships WHERE source_id = ? AND target_id = ? AND type = ?"
+DELETE_RELATIONSHIPS = "DELETE FROM relationships WHERE source_id = ? AND target_id = ?"
+PATCH_RELATIONSHIP = """
+    UPDATE relationships SET properties = json_patch(properties, ?)
+    WHERE source_id = ? AND target_id = ? AND type = ?
+"""
+
+
+def property_path(key):
+    """JSON 路径 (属性名已由调用方校验为合法标识符)"""
+    return f'$."{key}"'
+
+
+def clean_properties(properties):
+    """去掉 id / name 和值为 None 的属性 (与 Neo4j 一致，null 属性不保存)，返回 JSON 文本"""
+    return json.dumps({key: value for key, value in properties.items()
+                       if key not in ('id', 'name') and value is not None}, ensure_ascii=False)
+
+
+def row_to_node(row):
+    """把 nodes 表的一行 (id, name, labels, properties) 转换为前端格式的节点字典"""
+    node_id, name, labels, properties = row
+    return node_dict(node_id, name, json.loads(labels), dict(json.loads(properties), id=node_id, name=name))
+
+
+def row_to_link(row):
+    """把 relationships 表的一行 (source_id, target_id, type, properties) 转换为前端格式的关系字典"""
+    return link_dict(row[0], row[1], row[2], json.loads(row[3]))
+
+
+def bump_version(conn):
+    """在当前写事务中递增图版本号并返回新版本号"""
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'graph_version'")
+    return conn.execute("SELECT value FROM meta WHERE key = 'graph_version'").fetchone()[0]
+
+
+def allocate_ids(conn, count):
+    """
+    在当前写事务中分配 count 个新节点 id
+    计数器不小于当前最大 id (导入新数据后自动追上)，且只增不减，删除的 id 不会被重新分配
+    """
+    conn.execute("""
+        UPDATE meta SET value = max(value, (SELECT coalesce(max(id), 0) FROM nodes)) + ?
+        WHERE key = 'node_id'
+    """, (count,))
+    last = conn.execute("SELECT value FROM meta WHERE key = 'node_id'").fetchone()[0]
+    return list(range(last - count + 1, last + 1))
+
+
+# ---------- 全文索引 ----------
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _field_expression(field, row):
+    """全文索引字段在 nodes 表中的取值表达式 (row 为 new / old 或表名)"""
+    if field == 'name':
+        return f"{row}.name"
+    return f"json_extract({row}.properties, '$.{_quote(field)}')"
+
+
+def search_table_statement():
+    """全文索引表的创建语句 (与 sqlite_master 中保存的文本比较，字段变化时重建)"""
+    columns = ', '.join(_quote(field) for field in Config.SEARCH_FIELDS)
+    return f"CREATE VIRTUAL TABLE node_search USING fts5({columns}, tokenize = 'trigram')"
+
+
+def search_trigger_statements():
+    columns = ', '.join(_quote(field) for field in Config.SEARCH_FIELDS)
+    values = ', '.join(_field_expression(field, 'new') for field in Config.SEARCH_FIELDS)
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS nodes_search_insert AFTER INSERT ON nodes BEGIN
+            INSERT INTO node_search (rowid, {columns}) VALUES (new.id, {values});
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nodes_search_delete AFTER DELETE ON nodes BEGIN
+            DELETE FROM node_search WHERE rowid = old.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS nodes_search_update AFTER UPDATE OF name, properties ON nodes BEGIN
+            DELETE FROM node_search WHERE rowid = old.id;
+            INSERT INTO node_search (rowid, {columns}) VALUES (new.id, {values});
+        END
+        """,
+    ]
+
+
+SEARCH_TRIGGERS = ('nodes_search_insert', 'nodes_search_delete', 'nodes_search_update')
+
+
+def drop_search_triggers(conn):
+    for trigger in SEARCH_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+
+def rebuild_search(conn):
+    """从 nodes 表整体重建全文索引 (批量导入时先删除触发器，导入完成后一次性重建)"""
+    columns = ', '.join(_quote(field) for field in Config.SEARCH_FIELDS)
+    values = ', '.join(_field_expression(field, 'nodes') for field in Config.SEARCH_FIELDS)
+    conn.execute("DELETE FROM node_search")
+    conn.execute(f"INSERT INTO node_search (rowid, {columns}) SELECT id, {values} FROM nodes")
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+class SQLiteStore(GraphStore):
+    """SQLite 存储 (STORAGE_BACKEND=sqlite)"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=None, busy_timeout=None):
+        path = path or Config.SQLITE_PATH
+        self.memory = path == ':memory:'
+        self.path = MEMORY_URI if self.memory else path
+        self.busy_timeout = busy_timeout if busy_timeout is not None else Config.SQLITE_BUSY_TIMEOUT
+        # 全文索引是否可用 (SQLite 未编译 FTS5 或不支持 trigram 分词器时回退到 LIKE 扫描)
+        self.fts = False
+        self._ready = False
+        self._lock = threading.Lock()
+        self._pool = queue.LifoQueue()
+        # 共享内存数据库在最后一个连接关闭时被销毁，因此始终保留一个连接
+        self._keeper = self._connect() if self.memory else None
+
+    # ---------- 连接与事务 ----------
+
+    def _connect(self):
+        if not self.memory:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # isolation_level=None: 由 _transaction 显式 BEGIN / COMMIT
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                               check_same_thread=False, uri=self.memory)
+        if not self.memory:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _checkout(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        self._pool.put(conn)
+
+    def _acquire(self):
+        """从连接池取出一个连接 (第一次使用时先建表)"""
+        if not self._ready:
+            self.bootstrap()
+        return self._checkout()
+
+    @contextmanager
+    def _transaction(self, write=False):
+        """
+        在一个事务中执行，正常退出时提交，异常时回滚
+        读事务 (BEGIN) 在 WAL 模式下看到一致的快照；写事务使用 BEGIN IMMEDIATE 立即取得写锁，
+        其他写事务等待最多 busy_timeout 秒，超时抛出 "database is locked" (返回 503)
+        """
+        conn = self._acquire()
+        try:
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            yield conn
+            conn.execute("COMMIT")
+        finally:
+            self._release(conn)
+
+    def _change(self, sql, params):
+        """执行一条修改语句，命中了行时在同一事务中递增并返回图版本号，否则返回 None"""
+        with self._transaction(write=True) as conn:
+            if conn.execute(sql, params).rowcount <= 0:
+                return None
+            return bump_version(conn)
+
+    def bootstrap(self):
+        with self._lock:
+            conn = self._checkout()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for statement in SCHEMA_STATEMENTS:
+                    conn.execute(statement)
+                self.fts = self._ensure_search(conn)
+                conn.execute("COMMIT")
+                self._ready = True
+            finally:
+                self._release(conn)
+
+    @staticmethod
+    def _ensure_search(conn):
+        """创建全文索引表和触发器；索引字段 (Config.SEARCH_FIELDS) 变化时重建。返回全文索引是否可用"""
+        statement = search_table_statement()
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'node_search'").fetchone()
+        if row is not None and row[0] != statement:
+            drop_search_triggers(conn)
+            conn.execute("DROP TABLE node_search")
+            row = None
+        if row is None:
+            try:
+                conn.execute(statement)
+            except sqlite3.OperationalError:
+                # 没有 FTS5 模块或 trigram 分词器 (SQLite < 3.34)
+                drop_search_triggers(conn)
+                return False
+            rebuild_search(conn)
+        for trigger in search_trigger_statements():
+            conn.execute(trigger)
+        return True
+
+    def is_unavailable(self, error):
+        if not isinstance(error, sqlite3.OperationalError):
+            return False
+        message = str(error)
+        return 'locked' in message or 'busy' in message
+
+    # ---------- 读取 ----------
+
+    def version(self):
+        with self._transaction() as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'graph_version'").fetchone()[0]
+
+    def graph_page(self, after, limit):
+        with self._transaction() as conn:
+            nodes = [row_to_node(row) for row in conn.execute(
+                f"SELECT {NODE_COLUMNS} FROM nodes WHERE id > ? ORDER BY id LIMIT ?", (after, limit))]
+            if not nodes:
+                return [], [], None
+            # 本页节点的 id 是 (after, 最后一个 id] 区间内的全部 id，按主键范围读取它们的出边
+            links = [row_to_link(row) for row in conn.execute(
+                "SELECT source_id, target_id, type, properties FROM relationships WHERE source_id BETWEEN ? AND ?",
+                (nodes[0]['id'], nodes[-1]['id']))]
+        next_cursor = nodes[-1]['id'] if len(nodes) == limit else None
+        return nodes, links, next_cursor
+
+    def full_graph(self):
+        with self._transaction() as conn:
+            nodes = [row_to_node(row) for row in conn.execute(f"SELECT {NODE_COLUMNS} FROM nodes")]
+            links = [row_to_link(row) for row in conn.execute(
+                "SELECT source_id, target_id, type, properties FROM relationships LIMIT ?",
+                (Config.GRAPH_FULL_LINKS_MAX,))]
+        return nodes, links
+
+    def subgraph(self, node_ids, relationships):
+        with self._transaction() as conn:
+            found = {row[0]: row_to_node(row) for row in conn.execute(
+                f"SELECT {NODE_COLUMNS} FROM nodes WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(node_ids),))}
+            links = []
+            for rel in relationships:
+                row = conn.execute(
+                    "SELECT properties FROM relationships WHERE source_id = ? AND target_id = ? AND type = ?",
+                    (rel['source'], rel['target'], rel['type'])).fetchone()
+                links.append(link_dict(rel['source'], rel['target'], rel['type'], json.loads(row[0]) if row else {}))
+        return [found[node_id] for node_id in node_ids if node_id in found], links
+
+    def search(self, term, limit=10, offset=0):
+        tokens = term.split()
+        if not tokens:
+            return []
+        with self._transaction() as conn:
+            # trigram 索引只能匹配至少 3 个字符的词，更短的词 (例如两个汉字) 使用 LIKE 扫描；
+            # 其余查询只使用全文索引，未命中即没有结果
+            if self.fts and all(len(token) >= 3 for token in tokens):
+                weights = ', '.join('2.0' if field == 'name' else '1.0' for field in Config.SEARCH_FIELDS)
+                query = ' '.join(_quote(token) for token in tokens)
+                rows = conn.execute(f"""
+                    SELECT nodes.id, nodes.name, nodes.labels, nodes.properties,
+                           -bm25(node_search, {weights}) AS score
+                    FROM node_search JOIN nodes ON nodes.id = node_search.rowid
+                    WHERE node_search MATCH ?
+                    ORDER BY score DESC
+                    LIMIT ? OFFSET ?
+                """, (query, limit, offset)).fetchall()
+                return [self._scored(row) for row in rows]
+
+            # 存在短词或全文索引不可用: 在索引字段上做不区分大小写的 LIKE 匹配，名称完全匹配的排在前面
+            stripped = term.strip()
+            conditions = ' OR '.join(f"{_field_expression(field, 'nodes')} LIKE :pattern ESCAPE '\\'"
+                                     for field in Config.SEARCH_FIELDS)
+            rows = conn.execute(f"""
+                SELECT {NODE_COLUMNS}, CASE WHEN lower(name) = lower(:term) THEN 1.0 ELSE 0.5 END AS score
+                FROM nodes
+                WHERE {conditions}
+                ORDER BY score DESC, id
+                LIMIT :limit OFFSET :offset
+            """, {"term": stripped, "pattern": _like_pattern(stripped), "limit": limit, "offset": offset}).fetchall()
+            return [self._scored(row) for row in rows]
+
+    @staticmethod
+    def _scored(row):
+        node = row_to_node(row[:4])
+        node['score'] = row[4]
+        return node
+
+    def label_counts(self):
+        with self._transaction() as conn:
+            nodes = conn.execute("""
+                SELECT json_extract(labels, '$[0]') AS label, count(*) FROM nodes GROUP BY label
+            """).fetchall()
+            links = conn.execute("""
+                SELECT json_extract(a.labels, '$[0]'), json_extract(b.labels, '$[0]'), r.type, count(*)
+                FROM relationships r
+                JOIN nodes a ON a.id = r.source_id
+                JOIN nodes b ON b.id = r.target_id
+                GROUP BY 1, 2, 3
+            """).fetchall()
+        return nodes, links
+
+    def topology(self):
+        with self._transaction() as conn:
+            version = conn.execute("SELECT value FROM meta WHERE key = 'graph_version'").fetchone()[0]
+            nodes = conn.execute("SELECT id, name FROM nodes").fetchall()
+            relations = conn.execute("SELECT source_id, target_id, type FROM relationships").fetchall()
+        return version, nodes, relations
+
+    def edge_weights(self, prop):
+        # 只返回数值 (JSON 的 true / false 在 json_extract 中会变成 1 / 0，因此按 json_type 过滤)
+        path = property_path(prop)
+        with self._transaction() as conn:
+            return conn.execute("""
+                SELECT source_id, target_id, type, json_extract(properties, :path) FROM relationships
+                WHERE json_type(properties, :path) IN ('integer', 'real')
+            """, {"path": path}).fetchall()
+
+    def export_nodes(self):
+        with self._transaction() as conn:
+            for node_id, name, labels, properties in conn.execute(f"SELECT {NODE_COLUMNS} FROM nodes ORDER BY id"):
+                yield node_id, name, json.loads(labels), json.loads(properties)
+
+    def export_relationships(self):
+        # 按主键 (source_id, target_id, type) 顺序读取，即按源节点 id 顺序输出各节点的出边
+        with self._transaction() as conn:
+            for source_id, target_id, rel_type, properties in conn.execute(
+                    "SELECT source_id, target_id, type, properties FROM relationships"):
+                yield source_id, target_id, rel_type, json.loads(properties)
+
+    def export_nodes_by_id(self, node_ids):
+        with self._transaction() as conn:
+            for node_id, name, labels, properties in conn.execute(
+                    f"SELECT {NODE_COLUMNS} FROM nodes WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps(list(node_ids)),)):
+                yield node_id, name, json.loads(labels), json.loads(properties)
+
+    def export_relationships_between(self, pairs):
+        # 每对节点按主键前缀 (source_id, target_id) 查找
+        with self._transaction() as conn:
+            for source_id, target_id in pairs:
+                for rel_type, properties in conn.execute(
+                        "SELECT type, properties FROM relationships WHERE source_id = ? AND target_id = ?",
+                        (source_id, target_id)):
+                    yield source_id, target_id, rel_type, json.loads(properties)
+
+    # ---------- 修改 ----------
+
+    def create_node(self, name, label=None, properties=None):
+        with self._transaction(write=True) as conn:
+            new_id = allocate_ids(conn, 1)[0]
+            conn.execute(INSERT_NODE, (new_id, name, json.dumps([label] if label else [], ensure_ascii=False),
+                                       clean_properties(properties or {})))
+            return new_id, bump_version(conn)
+
+    def delete_node(self, node_id):
+        # 外键 ON DELETE CASCADE 同时删除节点的所有关系
+        return self._change("DELETE FROM nodes WHERE id = ?", (node_id,))
+
+    def add_label(self, node_id, label):
+        return self._change(ADD_LABEL, (label, BASE_LABEL, label, label, node_id))
+
+    def remove_label(self, node_id, label):
+        return self._change(REMOVE_LABEL, (label, node_id))
+
+    def set_node_property(self, node_id, key, value):
+        if key == 'name':
+            return self._change("UPDATE nodes SET name = ? WHERE id = ?", (value, node_id))
+        if value is None:
+            return self.remove_node_property(node_id, key)
+        return self._change("UPDATE nodes SET properties = json_set(properties, ?, json(?)) WHERE id = ?",
+                            (property_path(key), json.dumps(value, ensure_ascii=False), node_id))
+
+    def remove_node_property(self, node_id, key):
+        return self._change("UPDATE nodes SET properties = json_remove(properties, ?) WHERE id = ?",
+                            (property_path(key), node_id))
+
+    def create_relationship(self, source_id, target_id, rel_type, properties=None):
+        return self._change(MERGE_RELATIONSHIP, {"source_id": source_id, "target_id": target_id, "type": rel_type,
+                                                 "props": json.dumps(properties or {}, ensure_ascii=False)})
+
+    def delete_relationship(self, source_id, target_id, rel_type=None):
+        if rel_type:
+            return self._change(DELETE_RELATIONSHIP, (source_id, target_id, rel_type))
+        return self._change(DELETE_RELATIONSHIPS, (source_id, target_id))
+
+    def set_relationship_property(self, source_id, target_id, rel_type, key, value):
+        if value is None:
+            return self.remove_relationship_property(source_id, target_id, rel_type, key)
+        return self._change("""
+            UPDATE relationships SET properties = json_set(properties, ?, json(?))
+            WHERE source_id = ? AND target_id = ? AND type = ?
+        """, (property_path(key), json.dumps(value, ensure_ascii=False), source_id, target_id, rel_type))
+
+    def remove_relationship_property(self, source_id, target_id, rel_type, key):
+        return self._change("""
+            UPDATE relationships SET properties = json_remove(properties, ?)
+            WHERE source_id = ? AND target_id = ? AND type = ?
+        """, (property_path(key), source_id, target_id, rel_type))
+
+    def apply_batch(self, compiler, groups):
+        # 新节点 id 与所有修改在同一个写事务中分配和执行，任何一步出错即整体回滚
+        with self._transaction(write=True) as conn:
+            new_ids = allocate_ids(conn, compiler.create_count) if compiler.create_count else []
+            bind_ids(groups, new_ids)
+            for _, rows, strict, index, (action, name) in groups:
+                matched = sum(self._apply_row(conn, action, name, row) for row in rows)
+                if strict and matched < len(rows):
+                    raise BatchError("Node or relationship not found", index, status=404)
+            version = bump_version(conn)
+        return new_ids, version
+
+    @staticmethod
+    def _apply_row(conn, action, name, row):
+        """执行批量操作中的一行 (action 见 batch_ops.BatchCompiler.compile)，返回命中的行数"""
+        if action == 'create_node':
+            props = row["props"]
+            conn.execute(INSERT_NODE, (props["id"], props["name"], json.dumps([name] if name else [], ensure_ascii=False),
+                                       clean_properties(props)))
+            return 1
+        if action == 'delete_node':
+            return conn.execute("DELETE FROM nodes WHERE id = ?", (row["id"],)).rowcount
+        if action == 'add_label':
+            return conn.execute(ADD_LABEL, (name, BASE_LABEL, name, name, row["id"])).rowcount
+        if action == 'remove_label':
+            return conn.execute(REMOVE_LABEL, (name, row["id"])).rowcount
+        if action == 'node_properties':
+            props = dict(row["props"])
+            has_name = 'name' in props
+            return conn.execute(PATCH_NODE, {"id": row["id"], "has_name": has_name, "name": props.pop('name', None),
+                                             "props": json.dumps(props, ensure_ascii=False)}).rowcount
+        if action == 'merge_relationship':
+            return conn.execute(MERGE_RELATIONSHIP, {"source_id": row["source_id"], "target_id": row["target_id"],
+                                                     "type": name,
+                                                     "props": json.dumps(row["props"], ensure_ascii=False)}).rowcount
+        if action == 'relationship_properties':
+            return conn.execute(PATCH_RELATIONSHIP, (json.dumps(row["props"], ensure_ascii=False),
+                                                     row["source_id"], row["target_id"], name)).rowcount
+        # delete_relationship
+        if name:
+            return conn.execute(DELETE_RELATIONSHIP, (row["source_id"], row["target_id"], name)).rowcount
+        return conn.execute(DELETE_RELATIONSHIPS, (row["source_id"], row["target_id"])).rowcount
+
+    # ---------- 批量导入 ----------
+
+    def loader(self, mode='full', batch_size=None, workers=None):
+        # SQLite 同一时间只有一个写事务，workers 参数被忽略
+        return SQLiteLoader(self, mode, batch_size)
+
+
+class SQLiteLoader(GraphLoader):
+    """
+    SQLite 批量导入器
+    整个导入在一个写事务中执行 (commit 时提交，失败时整体回滚，不会留下导入了一半的图)，
+    行按 batch_size 缓冲后以 executemany 写入
+    - full 模式: 清空图数据并删除全文索引触发器，导入完成后一次性重建全文索引
+    - diff 模式: 按 id / (source_id, target_id, type) 逐行比较，只写入差异；
+      出现过的键记录在临时表中，最后删除 CSV 中已不存在的节点和关系
+    统计信息的格式与 loader.BulkLoader / diff_import.DiffImporter 相同
+    """
+
+    def __init__(self, store, mode, batch_size=None):
+        self.store = store
+        self.mode = mode
+        self.batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+        self.batch_count = 0
+        self.elapsed = 0.0
+        if mode == 'diff':
+            self.counts = {
+                "nodes": {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0},
+                "relationships": {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0},
+            }
+        else:
+            self.counts = {"nodes": 0, "relationships": 0}
+        self.conn = store._acquire()
+        started = time.perf_counter()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            if mode == 'diff':
+                self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen_nodes (id INTEGER PRIMARY KEY)")
+                self.conn.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS seen_relationships (
+                        source_id INTEGER, target_id INTEGER, type TEXT,
+                        PRIMARY KEY (source_id, target_id, type)
+                    ) WITHOUT ROWID
+                """)
+                self.conn.execute("DELETE FROM temp.seen_nodes")
+                self.conn.execute("DELETE FROM temp.seen_relationships")
+            else:
+                if store.fts:
+                    drop_search_triggers(self.conn)
+                    self.conn.execute("DELETE FROM node_search")
+                self.conn.execute("DELETE FROM relationships")
+                self.conn.execute("DELETE FROM nodes")
+        except Exception:
+            self.close()
+            raise
+        self.elapsed += time.perf_counter() - started
+
+    def _write(self, sql, rows):
+        """以 executemany 写入一批行"""
+        if rows:
+            self.conn.executemany(sql, rows)
+            self.batch_count += 1
+
+    def _buffered(self, buffers, sql, row):
+        """把一行加入 sql 对应的缓冲区，攒满 batch_size 时立即写入"""
+        buffer = buffers.setdefault(sql, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self._write(sql, buffer)
+            buffers[sql] = []
+
+    def _flush(self, buffers):
+        for sql, rows in buffers.items():
+            self._write(sql, rows)
+        buffers.clear()
+
+    def load_entities(self, rows):
+        started = time.perf_counter()
+        buffers = {}
+        counts = self.counts['nodes'] if self.mode == 'diff' else None
+        for row in rows:
+            labels, properties = parse_entity_row(row)
+            node_id, name = properties['id'], properties['name']
+            labels_json = json.dumps(list(labels), ensure_ascii=False)
+            props_json = clean_properties(properties)
+            if counts is None:
+                self._buffered(buffers, INSERT_NODE, (node_id, name, labels_json, props_json))
+                self.counts['nodes'] += 1
+                continue
+
+            self._buffered(buffers, "INSERT OR IGNORE INTO temp.seen_nodes (id) VALUES (?)", (node_id,))
+            current = self.conn.execute("SELECT name, labels, properties FROM nodes WHERE id = ?",
+                                        (node_id,)).fetchone()
+            if current is None:
+                self._buffered(buffers, INSERT_NODE, (node_id, name, labels_json, props_json))
+                counts['inserted'] += 1
+            elif (current[0] == name and set(json.loads(current[1])) == set(labels)
+                  and json.loads(current[2]) == json.loads(props_json)):
+                counts['unchanged'] += 1
+            else:
+                self._buffered(buffers, "UPDATE nodes SET name = ?, labels = ?, properties = ? WHERE id = ?",
+                               (name, labels_json, props_json, node_id))
+                counts['updated'] += 1
+        self._flush(buffers)
+
+        if counts is not None:
+            # CSV 中已不存在的节点 (连同其关系) 一并删除
+            counts['deleted'] += self.conn.execute(
+                "DELETE FROM nodes WHERE id NOT IN (SELECT id FROM temp.seen_nodes)").rowcount
+            self.batch_count += 1
+        self.elapsed += time.perf_counter() - started
+
+    def load_relations(self, rows):
+        started = time.perf_counter()
+        buffers = {}
+        counts = self.counts['relationships'] if self.mode == 'diff' else None
+        for row in rows:
+            rel_type, item = parse_relation_row(row)
+            params = {"source_id": item['source_id'], "target_id": item['target_id'], "type": rel_type,
+                      "props": json.dumps(item['props'], ensure_ascii=False)}
+            if counts is None:
+                self._buffered(buffers, MERGE_RELATIONSHIP, params)
+                self.counts['relationships'] += 1
+                continue
+
+            key = (item['source_id'], item['target_id'], rel_type)
+            self._buffered(buffers, """
+                INSERT OR IGNORE INTO temp.seen_relationships (source_id, target_id, type) VALUES (?, ?, ?)
+            """, key)
+            current = self.conn.execute("""
+                SELECT properties FROM relationships WHERE source_id = ? AND target_id = ? AND type = ?
+            """, key).fetchone()
+            props_json = clean_properties(item['props'])
+            if current is None:
+                self._buffered(buffers, MERGE_RELATIONSHIP, params)
+                counts['inserted'] += 1
+            elif json.loads(current[0]) == json.loads(props_json):
+                counts['unchanged'] += 1
+            else:
+                # 整体替换关系属性
+                self._buffered(buffers, """
+                    UPDATE relationships SET properties = ? WHERE source_id = ? AND target_id = ? AND type = ?
+                """, (props_json,) + key)
+                counts['updated'] += 1
+        self._flush(buffers)
+
+        if counts is not None:
+            counts['deleted'] += self.conn.execute("""
+                DELETE FROM relationships WHERE NOT EXISTS (
+                    SELECT 1 FROM temp.seen_relationships s
+                    WHERE s.source_id = relationships.source_id AND s.target_id = relationships.target_id
+                      AND s.type = relationships.type
+                )
+            """).rowcount
+            self.batch_count += 1
+        self.elapsed += time.perf_counter() - started
+
+    def stats(self):
+        if self.mode == 'diff':
+            return {
+                **self.counts,
+                "batches": self.batch_count,
+                "batch_size": self.batch_size,
+                "seconds": round(self.elapsed, 3),
+            }
+        total = self.counts['nodes'] + self.counts['relationships']
+        return {
+            **self.counts,
+            "batches": self.batch_count,
+            "batch_size": self.batch_size,
+            "seconds": round(self.elapsed, 3),
+            "rows_per_second": round(total / self.elapsed, 1) if self.elapsed > 0 else None,
+        }
+
+    def commit(self):
+        started = time.perf_counter()
+        if self.mode != 'diff' and self.store.fts:
+            rebuild_search(self.conn)
+            for trigger in search_trigger_statements():
+                self.conn.execute(trigger)
+        version = bump_version(self.conn)
+        self.conn.execute("COMMIT")
+        self.elapsed += time.perf_counter() - started
+        return version
+
+    def close(self):
+        conn, self.conn = self.conn, None
+        if conn is None:
+            return
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        if self.mode == 'diff':
+            conn.execute("DROP TABLE IF EXISTS temp.seen_nodes")
+            conn.execute("DROP TABLE IF EXISTS temp.seen_relationships")
+        self.store._release(conn)
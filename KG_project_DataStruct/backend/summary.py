@@ -0,0 +1,244 @@
+"""
+图摘要模块 (level-of-detail)
+节点很多时完整的 /api/graph 无法在浏览器中渲染，/api/graph?view=... 返回规模有界、但仍有意义的摘要:
+  top:         按度数或 PageRank 取前 k 个节点，以及它们之间的关系
+  labels:      每个标签一个超级节点，关系按 (起点标签, 终点标签, 类型) 聚合计数
+  communities: 用标签传播 (label propagation) 划分社区，取最大的 k 个社区，每个社区一个超级节点
+度数 / PageRank / 社区划分在邻接索引导出的 CSR 拓扑上计算，结果按图版本号缓存 (不同 k 共用一次计算)
+"""
+import heapq
+import random
+import threading
+from collections import Counter
+from config import Config
+from adjacency import numpy
+
+# 摘要视图与排序方式
+VIEWS = ('top', 'labels', 'communities')
+RANKINGS = ('degree', 'pagerank')
+
+# 没有业务标签的节点归入的分组名
+UNLABELED = '未分类'
+
+
+def summary_params(args):
+    """解析摘要参数，返回 (view, by, k)；不合法时抛出 ValueError"""
+    view = args.get('view')
+    if view not in VIEWS:
+        raise ValueError(f"Invalid view, expected one of {VIEWS}")
+    by = args.get('by', 'degree')
+    if by not in RANKINGS:
+        raise ValueError(f"Invalid by, expected one of {RANKINGS}")
+    k = args.get('k', Config.SUMMARY_TOP_K, type=int)
+    if not 1 <= k <= Config.SUMMARY_MAX_K:
+        raise ValueError(f"k must be between 1 and {Config.SUMMARY_MAX_K}")
+    return view, by, k
+
+
+# ---------- 整图算法 ----------
+
+def degrees(topology):
+    """每个节点的度数 (不区分方向，自环计两次)"""
+    if numpy is not None:
+        return numpy.diff(topology.offsets)
+    offsets = topology.offsets.tolist()
+    return [offsets[u + 1] - offsets[u] for u in range(len(topology))]
+
+
+def pagerank(topology, damping=None, iterations=None, tolerance=1e-6):
+    """
+    无向图上的 PageRank (幂迭代)，每条关系在两个方向上各传递一次权重
+    没有邻居的节点把权重均匀分给所有节点；L1 变化量小于 tolerance 时提前结束
+    """
+    damping = Config.PAGERANK_DAMPING if damping is None else damping
+    iterations = iterations or Config.PAGERANK_ITERATIONS
+    n = len(topology)
+    if n == 0:
+        return []
+
+    if numpy is not None:
+        degree = numpy.diff(topology.offsets)
+        heads = numpy.repeat(numpy.arange(n), degree)
+        isolated = degree == 0
+        rank = numpy.full(n, 1.0 / n)
+        for _ in range(iterations):
+            share = numpy.divide(rank, degree, out=numpy.zeros(n), where=~isolated)
+            spread = numpy.bincount(topology.targets, weights=share[heads], minlength=n)
+            new = (1 - damping) / n + damping * (spread + rank[isolated].sum() / n)
+            delta = numpy.abs(new - rank).sum()
+            rank = new
+            if delta < tolerance:
+                break
+        return rank
+
+    offsets = topology.offsets.tolist()
+    targets = topology.targets.tolist()
+    rank = [1.0 / n] * n
+    for _ in range(iterations):
+        spread = [0.0] * n
+        dangling = 0.0
+        for u in range(n):
+            a, b = offsets[u], offsets[u + 1]
+            if a == b:
+                dangling += rank[u]
+                continue
+            share = rank[u] / (b - a)
+            for j in range(a, b):
+                spread[targets[j]] += share
+        base = (1 - damping) / n + damping * dangling / n
+        new = [base + damping * x for x in spread]
+        delta = sum(abs(x - y) for x, y in zip(new, rank))
+        rank = new
+        if delta < tolerance:
+            break
+    return rank
+
+
+def communities(topology, iterations=None, seed=0):
+    """
+    标签传播社区划分: 每轮以随机顺序 (固定种子，结果可复现) 依次把每个节点的社区改为邻居中最多的社区
+    (并列时随机选取，使并列的小块社区能够合并)；所有节点的社区都已是邻居中最多者之一，或达到迭代轮数时结束
+    返回每个节点的社区编号 (为社区中某个节点的下标)
+    """
+    iterations = iterations or Config.COMMUNITY_ITERATIONS
+    n = len(topology)
+    if numpy is not None:
+        return _communities_numpy(topology, iterations, seed)
+    offsets = topology.offsets.tolist()
+    targets = topology.targets.tolist()
+    labels = list(range(n))
+    order = [u for u in range(n) if offsets[u] != offsets[u + 1]]
+    rng = random.Random(seed)
+    for _ in range(iterations):
+        rng.shuffle(order)
+        changed = False
+        for u in order:
+            counts = Counter(labels[v] for v in targets[offsets[u]:offsets[u + 1]])
+            top = max(counts.values())
+            if counts.get(labels[u]) != top:
+                changed = True
+            labels[u] = rng.choice(sorted(label for label, count in counts.items() if count == top))
+        if not changed:
+            break
+    return labels
+
+
+def _communities_numpy(topology, iterations, seed):
+    """
+    标签传播的向量化版本: 每轮统计所有节点的邻居社区计数，随机选取一半节点 (半同步) 更新为计数最多的社区，
+    避免全部节点同时更新导致的二部结构振荡；停止条件与逐点版本相同
+    """
+    n = len(topology)
+    degree = numpy.diff(topology.offsets)
+    heads = numpy.repeat(numpy.arange(n, dtype=numpy.int64), degree)
+    targets = numpy.asarray(topology.targets)
+    labels = numpy.arange(n, dtype=numpy.int64)
+    rng = numpy.random.default_rng(seed)
+    for _ in range(iterations):
+        keys, counts = numpy.unique(heads * n + labels[targets], return_counts=True)
+        owners, candidates = keys // n, keys % n
+        # keys 已按节点排序: 每个节点的区间内取计数最多的社区，并列时由随机扰动决定
+        scores = counts + rng.random(len(counts)) * 0.5
+        starts = numpy.flatnonzero(numpy.append(True, owners[1:] != owners[:-1]))
+        best = numpy.maximum.reduceat(scores, starts)
+        last = numpy.flatnonzero(scores == numpy.repeat(best, numpy.diff(numpy.append(starts, len(scores)))))
+        current = numpy.zeros(n, dtype=counts.dtype)
+        mine = candidates == labels[owners]
+        current[owners[mine]] = counts[mine]
+        nodes = owners[last]
+        if not (current[nodes] < counts[last]).any():
+            break
+        update = rng.random(len(nodes)) < 0.5
+        labels[nodes[update]] = candidates[last][update]
+    return labels.tolist()
+
+
+class _ResultCache:
+    """整图算法结果按 (名称, 图版本号) 缓存，每种算法只保留最新版本的结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def get(self, name, topology, compute):
+        with self._lock:
+            cached = self._results.get(name)
+            if cached is not None and cached[0] == topology.version:
+                return cached[1]
+        value = compute(topology)
+        with self._lock:
+            self._results[name] = (topology.version, value)
+        return value
+
+
+_results = _ResultCache()
+
+
+def _top(scores, k):
+    """得分最高的 k 个下标 (得分相同时下标小的优先)"""
+    if numpy is not None:
+        return numpy.argsort(-numpy.asarray(scores), kind='stable')[:k].tolist()
+    return heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
+
+
+# ---------- 摘要视图 ----------
+
+def top_nodes(topology, by, k):
+    """
+    top 视图: 按度数或 PageRank 取前 k 个节点
+    返回 (节点 id 列表, {节点 id: 得分}, 这些节点之间的关系 [{"source", "target", "type"}])
+    """
+    scores = _results.get(by, topology, degrees if by == 'degree' else pagerank)
+    top = _top(scores, k)
+    chosen = set(top)
+    ids = topology.ids
+    relationships = []
+    for u in top:
+        a, b = int(topology.offsets[u]), int(topology.offsets[u + 1])
+        for v, kind, out in zip(topology.targets[a:b].tolist(), topology.edge_types[a:b].tolist(),
+                                topology.edge_out[a:b].tolist()):
+            if out and v in chosen:
+                relationships.append({"source": ids[u], "target": ids[v], "type": topology.type_names[kind]})
+    return [ids[u] for u in top], {ids[u]: float(scores[u]) for u in top}, relationships
+
+
+def community_summary(topology, k):
+    """
+    communities 视图: 最大的 k 个社区，每个社区一个超级节点
+    超级节点以社区中度数最大的节点作为代表 (id / name 取代表节点的)，size 为社区节点数；
+    社区之间的关系按 (起点社区, 终点社区, 类型) 聚合为 count
+    """
+    labels = _results.get('communities', topology, communities)
+    degree = _results.get('degree', topology, degrees)
+    sizes = Counter(labels)
+    chosen = sorted(sizes, key=lambda c: (-sizes[c], c))[:k]
+    representative = {}
+    for u, c in enumerate(labels):
+        if c not in representative or degree[u] > degree[representative[c]]:
+            representative[c] = u
+
+    ids, names = topology.ids, topology.names
+    chosen_set = set(chosen)
+    nodes = [{"id": ids[representative[c]], "name": names[representative[c]], "category": "community",
+              "size": sizes[c]} for c in chosen]
+    counts = Counter()
+    for u, v, kind in topology.relationships():
+        cu, cv = labels[u], labels[v]
+        if cu != cv and cu in chosen_set and cv in chosen_set:
+            counts[(cu, cv, kind)] += 1
+    links = [{"source": ids[representative[cu]], "target": ids[representative[cv]],
+              "name": topology.type_names[kind], "count": count}
+             for (cu, cv, kind), count in sorted(counts.items())]
+    return {"nodes": nodes, "links": links, "communities": len(sizes)}
+
+
+def label_summary(label_nodes, label_links):
+    """
+    labels 视图，每个标签一个超级节点，关系按 (起点标签, 终点标签, 类型) 聚合
+    参数为 GraphStore.label_counts() 的返回值 (在存储中聚合的计数)
+    """
+    nodes = [{"id": label or UNLABELED, "name": label or UNLABELED, "category": label or UNLABELED, "size": size}
+             for label, size in label_nodes]
+    links = [{"source": source or UNLABELED, "target": target or UNLABELED, "name": rel_type, "count": count}
+             for source, target, rel_type, count in label_links]
+    return {"nodes": nodes, "links": links}
@@ -0,0 +1,4 @@
+"""
+后端测试 (pytest)
+在 SQLite 存储后端上运行，不需要 Neo4j 服务器: 在 backend 目录下执行 python -m pytest -q
+"""
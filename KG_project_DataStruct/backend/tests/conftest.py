@@ -0,0 +1,80 @@
+"""
+测试公共配置与夹具
+导入任何后端模块之前先把存储后端切换为 SQLite，并把数据库、修改日志、检查点目录指向临时目录，
+模块级的全局实例 (storage.store、changelog.change_log 等) 因此不会读写 data 目录或连接 Neo4j
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix='kg-tests-')
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+os.environ.update(
+    STORAGE_BACKEND='sqlite',
+    SQLITE_PATH=os.path.join(_scratch, 'graph.sqlite3'),
+    CHANGELOG_DIR=os.path.join(_scratch, 'changelog'),
+    CHECKPOINT_DIR=os.path.join(_scratch, 'checkpoint'),
+)
+
+import pytest
+import adjacency
+from adjacency import AdjacencyIndex
+from changelog import ChangeLog
+from storage.sqlite_store import SQLiteStore
+
+# 测试图: 节点 1-4 两两相连 (关系带 weight 属性)，5-7 构成三角形，4 -> 5 连接两部分，8 为孤立节点
+ENTITIES = [
+    (1, 'A', 'Algorithm'),
+    (2, 'B', 'Algorithm'),
+    (3, 'C', 'Concept'),
+    (4, 'D', 'Concept'),
+    (5, 'E', 'Data'),
+    (6, 'F', 'Data'),
+    (7, 'G', 'Data'),
+    (8, 'H', ''),
+]
+RELATIONS = [
+    (1, 2, 'R', 1),
+    (2, 4, 'R', 1),
+    (1, 3, 'R', 5),
+    (3, 4, 'R', 1),
+    (1, 4, 'R', 10),
+    (2, 3, 'R', 1),
+    (4, 5, 'S', 1),
+    (5, 6, 'T', 1),
+    (6, 7, 'T', 1),
+    (7, 5, 'T', 1),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    """导入了测试图的 SQLite 存储 (每个测试一个独立的数据库文件)"""
+    graph = SQLiteStore(str(tmp_path / 'graph.sqlite3'))
+    loader = graph.loader('full')
+    try:
+        loader.load_entities({"id": str(node_id), "name": name, "labels": label, "properties": '{"level": 1}'}
+                             for node_id, name, label in ENTITIES)
+        loader.load_relations({"source_id": str(source_id), "target_id": str(target_id), "type": rel_type,
+                               "properties": '{"weight": %d}' % weight}
+                              for source_id, target_id, rel_type, weight in RELATIONS)
+        loader.commit()
+    finally:
+        loader.close()
+    return graph
+
+
+@pytest.fixture
+def change_log(tmp_path):
+    """写入临时目录的修改日志"""
+    return ChangeLog(directory=str(tmp_path / 'changelog'), enabled=True)
+
+
+@pytest.fixture
+def graph_index(store, monkeypatch):
+    """在测试图上构建的邻接索引"""
+    monkeypatch.setattr(adjacency, 'store', store)
+    index = AdjacencyIndex(refresh_seconds=0)
+    index.ensure_fresh()
+    return index
@@ -0,0 +1,48 @@
+"""邻接索引: Yen k 最短路径与限制跳数的 Dijkstra"""
+
+
+def paths(results):
+    return [(cost, ids) for cost, ids, _ in results]
+
+
+def test_shortest_path_counts_relationships(graph_index):
+    assert paths(graph_index.find_paths(1, 4)) == [(1, [1, 4])]
+
+
+def test_yen_returns_loopless_paths_in_cost_order(graph_index):
+    results = paths(graph_index.find_paths(1, 4, k=4))
+
+    assert [cost for cost, _ in results] == [1, 2, 2, 3]
+    assert results[0] == (1, [1, 4])
+    assert sorted(ids for _, ids in results[1:3]) == [[1, 2, 4], [1, 3, 4]]
+    assert results[3][1] in ([1, 2, 3, 4], [1, 3, 2, 4])
+    assert all(len(set(ids)) == len(ids) for _, ids in results)
+
+
+def test_paths_ignore_direction_but_report_original_direction(graph_index):
+    (cost, ids, relationships), = graph_index.find_paths(5, 1, max_depth=2)
+
+    assert (cost, ids) == (2, [5, 4, 1])
+    assert relationships == [{"source": 4, "target": 5, "type": "S"}, {"source": 1, "target": 4, "type": "R"}]
+
+
+def test_weighted_yen(graph_index):
+    weights = graph_index.edge_weights('weight')
+
+    assert paths(graph_index.find_paths(1, 4, k=3, weights=weights)) == [
+        (2.0, [1, 2, 4]), (3.0, [1, 2, 3, 4]), (6.0, [1, 3, 4])]
+
+
+def test_dijkstra_respects_max_depth(graph_index):
+    weights = graph_index.edge_weights('weight')
+
+    # 只允许一跳时只能走权重为 10 的直连关系；两跳以内时排除更便宜但需要三跳的 1-2-3-4
+    assert paths(graph_index.find_paths(1, 4, weights=weights, max_depth=1)) == [(10.0, [1, 4])]
+    assert paths(graph_index.find_paths(1, 4, k=3, weights=weights, max_depth=2)) == [
+        (2.0, [1, 2, 4]), (6.0, [1, 3, 4]), (10.0, [1, 4])]
+
+
+def test_type_filter_and_unreachable_nodes(graph_index):
+    assert graph_index.find_paths(1, 5, types=['R']) == []
+    assert graph_index.find_paths(1, 8) == []
+    assert paths(graph_index.find_paths('a', 'e')) == [(2, [1, 4, 5])]
@@ -0,0 +1,90 @@
+"""批量修改: 操作分组、新建节点 id 绑定与 $引用 解析"""
+import pytest
+from batch_ops import BatchCompiler, BatchError, bind_ids, change_records
+
+
+def compile_operations(operations):
+    compiler = BatchCompiler(operations)
+    return compiler, compiler.compile()
+
+
+def test_adjacent_operations_share_a_group_in_submission_order():
+    _, groups = compile_operations([
+        {"op": "set_property", "id": 1, "key": "color", "value": "red"},
+        {"op": "set_property", "id": 2, "key": "color", "value": "blue"},
+        {"op": "add_label", "id": 1, "label": "Hot"},
+        {"op": "set_property", "id": 3, "key": "color", "value": "green"},
+    ])
+
+    # 只合并相邻的相同语句，第 4 个操作不会被提前到 add_label 之前
+    assert [len(rows) for _, rows, _, _, _ in groups] == [2, 1, 1]
+    assert [index for _, _, _, index, _ in groups] == [0, 2, 3]
+    assert [row["id"] for row in groups[0][1]] == [1, 2]
+    assert groups[0][0] == groups[2][0]
+
+
+def test_bind_ids_replaces_slots_and_references():
+    compiler, groups = compile_operations([
+        {"op": "create_node", "name": "x", "ref": "a"},
+        {"op": "create_node", "name": "y", "ref": "b"},
+        {"op": "create_relationship", "source_id": "$a", "target_id": "$b", "type": "R"},
+        {"op": "set_property", "id": "$b", "key": "k", "value": 1},
+    ])
+    assert compiler.create_count == 2
+    assert compiler.refs == {"a": 0, "b": 1}
+
+    bind_ids(groups, [101, 102])
+
+    created = groups[0][1]
+    assert [row["props"] for row in created] == [{"name": "x", "id": 101}, {"name": "y", "id": 102}]
+    assert all("slot" not in row for row in created)
+    assert groups[1][1][0]["source_id"] == 101
+    assert groups[1][1][0]["target_id"] == 102
+    assert groups[2][1][0]["id"] == 102
+
+
+def test_unknown_reference_is_rejected():
+    with pytest.raises(BatchError, match=r"Operation 1: Unknown reference '\$missing'"):
+        compile_operations([
+            {"op": "create_node", "name": "x", "ref": "a"},
+            {"op": "delete_node", "id": "$missing"},
+        ])
+
+
+@pytest.mark.parametrize("operations", [None, [], {"op": "delete_node", "id": 1}])
+def test_operations_must_be_a_non_empty_list(operations):
+    with pytest.raises(BatchError, match="operations must be a non-empty list"):
+        BatchCompiler(operations)
+
+
+def test_apply_batch_resolves_references(store):
+    compiler, groups = compile_operations([
+        {"op": "create_node", "name": "new", "label": "Concept", "ref": "n"},
+        {"op": "create_relationship", "source_id": 1, "target_id": "$n", "type": "USES", "properties": {"w": 2}},
+    ])
+    before = store.version()
+
+    new_ids, version = store.apply_batch(compiler, groups)
+
+    assert version == before + 1
+    assert new_ids == [9]
+    assert (1, 9, 'USES', {"w": 2}) in list(store.export_relationships())
+    assert change_records(groups) == [
+        {"op": "node_created", "id": 9, "name": "new", "labels": ["Concept"], "properties": {}},
+        {"op": "relationship_created", "source": 1, "target": 9, "type": "USES", "properties": {"w": 2}},
+    ]
+
+
+def test_apply_batch_rolls_back_when_a_node_is_missing(store):
+    compiler, groups = compile_operations([
+        {"op": "create_node", "name": "new"},
+        {"op": "delete_node", "id": 999},
+    ])
+    before = store.version()
+
+    with pytest.raises(BatchError) as error:
+        store.apply_batch(compiler, groups)
+
+    assert error.value.status == 404
+    assert store.version() == before
+    assert [node[0] for node in store.export_nodes()] == [1, 2, 3, 4, 5, 6, 7, 8]
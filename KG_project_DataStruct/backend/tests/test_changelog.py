@@ -0,0 +1,78 @@
+"""修改日志: 顺序读取、重置标记与图版本号缺口检测"""
+import pytest
+import incremental_checkpoint
+from changelog import ChangeLog
+
+
+@pytest.fixture
+def checkpoint_log(change_log, monkeypatch):
+    """增量检查点读取的修改日志"""
+    monkeypatch.setattr(incremental_checkpoint, 'change_log', change_log)
+    return change_log
+
+
+def dirty(since, seq, since_version, version):
+    return incremental_checkpoint.IncrementalCheckpoint._dirty(since, seq, since_version, version)
+
+
+def test_read_pages_through_records_in_order(change_log):
+    assert change_log.append(1, 'node_created', id=1, name='A', labels=[], properties={}) == 1
+    assert change_log.extend(2, [{"op": "label_added", "id": 1, "label": "X"},
+                                 {"op": "node_deleted", "id": 2}]) == [2, 3]
+
+    page = change_log.read(0, limit=2)
+    assert [(c["seq"], c["version"], c["op"]) for c in page["changes"]] == [(1, 1, 'node_created'),
+                                                                             (2, 2, 'label_added')]
+    assert (page["next"], page["latest"], page["reset"]) == (2, 3, False)
+
+    page = change_log.read(page["next"])
+    assert [c["seq"] for c in page["changes"]] == [3]
+    assert change_log.read(3) == {"changes": [], "next": 3, "latest": 3, "reset": False}
+
+
+def test_read_resets_when_records_were_pruned(tmp_path):
+    log = ChangeLog(directory=str(tmp_path), segment_bytes=1, max_segments=2, enabled=True)
+    for version in range(1, 5):
+        log.append(version, 'node_deleted', id=version)
+
+    # 每条记录一个段，只保留最后两段
+    assert [first for first, _ in log.segments()] == [3, 4]
+    assert log.read(0)["reset"] is True
+    assert log.read(2)["reset"] is False
+    assert log.read(10)["reset"] is True
+
+
+def test_failed_write_is_reported_as_changes_lost(change_log, monkeypatch):
+    change_log.append(1, 'node_deleted', id=1)
+    with monkeypatch.context() as patch:
+        patch.setattr(change_log, '_write', lambda version, changes: 1 / 0)
+        assert change_log.append(2, 'node_deleted', id=2) is None
+    change_log.append(3, 'node_deleted', id=3)
+
+    page = change_log.read(1)
+    assert [c["op"] for c in page["changes"]] == ['changes_lost', 'node_deleted']
+    assert page["reset"] is True
+
+
+def test_dirty_collects_changed_nodes_and_pairs(checkpoint_log):
+    checkpoint_log.append(2, 'node_updated', id=1, properties={"k": 1})
+    checkpoint_log.extend(3, [{"op": "relationship_created", "source": 1, "target": 2, "type": "R",
+                               "properties": {}},
+                              {"op": "label_added", "id": 3, "label": "X"}])
+
+    assert dirty(0, 3, 1, 3) == ({1, 3}, {(1, 2)})
+
+
+def test_dirty_detects_version_gap(checkpoint_log):
+    checkpoint_log.append(2, 'node_updated', id=1, properties={"k": 1})
+    # 版本 3 的修改已提交但没有写入日志
+    checkpoint_log.append(4, 'node_deleted', id=2)
+
+    assert dirty(0, 2, 1, 4) is None
+    assert dirty(1, 2, 3, 4) == ({2}, set())
+
+
+def test_dirty_requires_full_save_after_graph_replaced(checkpoint_log):
+    checkpoint_log.append(2, 'graph_replaced', mode='full', source='upload')
+
+    assert dirty(0, 1, 1, 2) is None
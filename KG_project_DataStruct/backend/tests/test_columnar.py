@@ -0,0 +1,77 @@
+"""列式 MessagePack 响应格式"""
+import sys
+from array import array
+import pytest
+from columnar import FORMAT, encode_columnar
+
+msgpack = pytest.importorskip('msgpack')
+
+
+def decode(payload):
+    return msgpack.unpackb(encode_columnar(payload), raw=False)
+
+
+def unpack(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tolist()
+
+
+def test_nodes_and_links_are_encoded_as_columns():
+    document = decode({
+        "nodes": [
+            {"id": 1, "name": "A", "category": "Algorithm", "labels": ["Algorithm", "Sorting"],
+             "properties": {"id": 1, "name": "A", "level": 2}},
+            {"id": 2, "name": "B", "category": "Concept", "labels": ["Concept"], "properties": {}},
+        ],
+        "links": [
+            {"source": 1, "target": 2, "name": "USES", "properties": {"weight": 1}},
+            {"source": 2, "target": 9, "name": "USES", "properties": {}},
+        ],
+        "next": 2,
+    })
+
+    assert document["format"] == FORMAT
+    assert document["next"] == 2
+    strings = document["strings"]
+    nodes, links = document["nodes"], document["links"]
+    assert unpack('q', nodes["ids"]) == [1, 2]
+    assert nodes["names"] == ["A", "B"]
+    assert [strings[i] for i in unpack('i', nodes["category"])] == ["Algorithm", "Concept"]
+    assert unpack('i', nodes["label_offsets"]) == [0, 2, 3]
+    assert [strings[i] for i in unpack('i', nodes["labels"])] == ["Algorithm", "Sorting", "Concept"]
+    assert nodes["properties"] == [{"level": 2}, {}]
+
+    # 不在本页节点中的端点 (9) 追加在节点表之后
+    assert unpack('q', document["external_ids"]) == [9]
+    assert unpack('i', links["source"]) == [0, 1]
+    assert unpack('i', links["target"]) == [1, 2]
+    assert [strings[i] for i in unpack('i', links["type"])] == ["USES", "USES"]
+    assert links["properties"] == [{"weight": 1}, {}]
+
+
+def test_extra_fields_do_not_collide_with_reserved_columns():
+    document = decode({
+        "nodes": [
+            {"id": 1, "name": "A", "count": 7, "ids": "x", "score": 0.5},
+            {"id": 2, "name": "B", "size": 3},
+        ],
+        "links": [{"source": 1, "target": 2, "name": "R", "count": 4, "type": "dup"}],
+    })
+
+    nodes, links = document["nodes"], document["links"]
+    assert nodes["count"] == 2
+    assert unpack('q', nodes["ids"]) == [1, 2]
+    assert nodes["extra"] == {"count": [7, None], "ids": ["x", None], "score": [0.5, None], "size": [None, 3]}
+    assert links["count"] == 1
+    assert unpack('i', links["type"]) == [document["strings"].index("R")]
+    assert links["extra"] == {"count": [4], "type": ["dup"]}
+
+
+def test_string_ids_are_kept_as_a_list():
+    document = decode({"nodes": [{"id": "Algorithm", "name": "Algorithm", "size": 2}], "links": []})
+
+    assert document["nodes"]["ids"] == ["Algorithm"]
+    assert document["nodes"]["extra"] == {"size": [2]}
@@ -0,0 +1,147 @@
+"""增量检查点: 增量段叠加恢复、缺口时全量保存与合并"""
+import csv
+import json
+import os
+import pytest
+import incremental_checkpoint
+from checkpoint import open_checkpoint
+from config import Config
+from incremental_checkpoint import IncrementalCheckpoint, Overlay
+
+
+@pytest.fixture
+def checkpoints(tmp_path, change_log, monkeypatch):
+    """临时目录中的增量检查点 (默认不触发后台合并)"""
+    monkeypatch.setattr(incremental_checkpoint, 'change_log', change_log)
+    monkeypatch.setattr(Config, 'CHECKPOINT_MAX_DELTAS', 100)
+    monkeypatch.setattr(Config, 'CHECKPOINT_COMPACT_RATIO', 100.0)
+    return IncrementalCheckpoint(str(tmp_path / 'checkpoint'))
+
+
+def modify(store, change_log):
+    """与对应路由相同: 修改提交后写入修改日志"""
+    version = store.set_node_property(1, 'color', 'red')
+    change_log.append(version, 'node_updated', id=1, properties={"color": "red"})
+    version = store.delete_node(8)
+    change_log.append(version, 'node_deleted', id=8)
+    version = store.create_relationship(5, 1, 'U', {"weight": 3})
+    change_log.append(version, 'relationship_created', source=5, target=1, type='U', properties={"weight": 3})
+    version = store.delete_relationship(1, 4, 'R')
+    change_log.append(version, 'relationship_deleted', source=1, target=4, type='R')
+
+
+def current(store):
+    """存储中的全部节点和关系，格式与 restored 相同"""
+    nodes = sorted((node_id, name, labels, props) for node_id, name, labels, props in store.export_nodes())
+    relations = sorted(store.export_relationships())
+    return nodes, relations
+
+
+def restored(checkpoints):
+    """按 /api/init 的方式读取检查点: 基础快照的行流过各增量段"""
+    with checkpoints.restore() as (entity_path, relation_path, overlay):
+        with open_checkpoint(entity_path) as f:
+            nodes = sorted((int(row['id']), row['name'], row['labels'].split('|'), json.loads(row['properties']))
+                           for row in overlay.entities(csv.DictReader(f)))
+        with open_checkpoint(relation_path) as f:
+            relations = sorted((int(row['source_id']), int(row['target_id']), row['type'],
+                                json.loads(row['properties'])) for row in overlay.relations(csv.DictReader(f)))
+    return nodes, relations
+
+
+def test_first_save_is_full(store, checkpoints):
+    info = checkpoints.save(store)
+
+    assert (info["type"], info["nodes"], info["relationships"], info["deltas"]) == ("full", 8, 10, 0)
+    assert restored(checkpoints) == current(store)
+
+
+def test_delta_overlays_changes_on_the_base(store, change_log, checkpoints):
+    checkpoints.save(store)
+    modify(store, change_log)
+
+    info = checkpoints.save(store)
+
+    assert (info["type"], info["nodes"], info["relationships"], info["deltas"]) == ("delta", 2, 2, 1)
+    assert restored(checkpoints) == current(store)
+    nodes, relations = restored(checkpoints)
+    assert (1, 'A', ['Algorithm'], {"level": 1, "color": "red"}) in nodes
+    assert 8 not in [node[0] for node in nodes]
+    assert (5, 1, 'U', {"weight": 3}) in relations
+    assert (1, 4, 'R', {"weight": 10}) not in relations
+
+
+def test_save_without_changes_only_advances_the_sequence(store, checkpoints):
+    checkpoints.save(store)
+
+    info = checkpoints.save(store)
+
+    assert (info["type"], info["nodes"], info["relationships"], info["deltas"]) == ("delta", 0, 0, 0)
+
+
+def test_unlogged_change_forces_full_save(store, change_log, checkpoints):
+    checkpoints.save(store)
+    modify(store, change_log)
+    # 提交了但没有写入修改日志的修改 (图版本号出现缺口)
+    store.set_node_property(2, 'color', 'blue')
+
+    info = checkpoints.save(store)
+
+    assert info["type"] == "full"
+    assert checkpoints.manifest()["deltas"] == []
+    assert restored(checkpoints) == current(store)
+
+
+def test_compact_merges_deltas_into_a_new_base(store, change_log, checkpoints):
+    checkpoints.save(store)
+    modify(store, change_log)
+    checkpoints.save(store)
+    version = store.set_node_property(3, 'color', 'green')
+    change_log.append(version, 'node_updated', id=3, properties={"color": "green"})
+    checkpoints.save(store)
+    before = checkpoints.manifest()
+
+    assert checkpoints.compact() == 2
+
+    manifest = checkpoints.manifest()
+    assert manifest["deltas"] == []
+    assert manifest["base"]["entity"] == f"base-{before['deltas'][-1]['generation']}-entity.csv"
+    assert (manifest["base"]["nodes"], manifest["base"]["relationships"]) == (7, 10)
+    assert restored(checkpoints) == current(store)
+    # 不再引用的旧基础快照和增量段已被删除
+    assert sorted(name for name in os.listdir(checkpoints.directory)
+                  if name.startswith(('base-', 'delta-'))) == [manifest["base"]["entity"],
+                                                              manifest["base"]["relation"]]
+
+
+def test_save_starts_background_compaction(store, change_log, checkpoints, monkeypatch):
+    checkpoints.save(store)
+    modify(store, change_log)
+    monkeypatch.setattr(Config, 'CHECKPOINT_MAX_DELTAS', 1)
+
+    assert checkpoints.save(store)["type"] == "delta"
+
+    checkpoints._compactor.join(timeout=10)
+    assert checkpoints.manifest()["deltas"] == []
+    assert restored(checkpoints) == current(store)
+
+
+def test_overlay_later_deltas_win(tmp_path):
+    first, second = tmp_path / 'delta-1.jsonl', tmp_path / 'delta-2.jsonl'
+    first.write_text(json.dumps({"node": 1, "name": "old", "labels": [], "properties": {}}) + '\n'
+                     + json.dumps({"pair": [1, 2], "relationships": [{"type": "R", "properties": {}}]}) + '\n',
+                     encoding='utf-8')
+    second.write_text(json.dumps({"node": 1, "name": "new", "labels": ["X"], "properties": {"k": 1}}) + '\n'
+                      + json.dumps({"node": 2, "deleted": True}) + '\n', encoding='utf-8')
+    overlay = Overlay()
+    overlay.load(str(first))
+    overlay.load(str(second))
+
+    entities = list(overlay.entities([{"id": "1", "name": "base"}, {"id": "3", "name": "kept"}]))
+    relations = list(overlay.relations([{"source_id": "3", "target_id": "1", "type": "R"},
+                                        {"source_id": "2", "target_id": "3", "type": "R"}]))
+
+    assert [(row["id"], row["name"]) for row in entities] == [("3", "kept"), (1, "new")]
+    assert entities[1]["labels"] == "X"
+    # 节点 2 已删除，与它相连的关系 (包括增量段中的 1 -> 2) 都被去掉
+    assert relations == [{"source_id": "3", "target_id": "1", "type": "R"}]
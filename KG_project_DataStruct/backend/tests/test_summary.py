@@ -0,0 +1,49 @@
+"""图摘要: 标签聚合、社区聚合与 top 视图"""
+import pytest
+import summary as summary_module
+from summary import UNLABELED, community_summary, label_summary, top_nodes
+
+
+@pytest.fixture(autouse=True)
+def fresh_results(monkeypatch):
+    """整图算法结果按图版本号缓存，各测试的图版本号相同，因此每个测试使用新的缓存"""
+    monkeypatch.setattr(summary_module, '_results', summary_module._ResultCache())
+
+
+def test_label_summary_aggregates_nodes_and_links_by_label(store):
+    summary = label_summary(*store.label_counts())
+
+    sizes = {node["id"]: node["size"] for node in summary["nodes"]}
+    assert sizes == {"Algorithm": 2, "Concept": 2, "Data": 3, "Unknown": 1}
+    counts = {(link["source"], link["target"], link["name"]): link["count"] for link in summary["links"]}
+    assert counts == {
+        ("Algorithm", "Algorithm", "R"): 1,
+        ("Algorithm", "Concept", "R"): 4,
+        ("Concept", "Concept", "R"): 1,
+        ("Concept", "Data", "S"): 1,
+        ("Data", "Data", "T"): 3,
+    }
+
+
+def test_label_summary_groups_nodes_without_label():
+    summary = label_summary([(None, 3)], [(None, "Data", "R", 2)])
+
+    assert summary["nodes"] == [{"id": UNLABELED, "name": UNLABELED, "category": UNLABELED, "size": 3}]
+    assert summary["links"] == [{"source": UNLABELED, "target": "Data", "name": "R", "count": 2}]
+
+
+def test_community_summary_merges_dense_clusters(graph_index):
+    summary = community_summary(graph_index.topology(), 2)
+
+    # 1-4 与 5-7 各为一个社区，代表节点为社区内度数最大的节点；孤立节点 8 单独成为第三个社区
+    assert summary["communities"] == 3
+    assert [(node["id"], node["name"], node["size"]) for node in summary["nodes"]] == [(4, "D", 4), (5, "E", 3)]
+    assert summary["links"] == [{"source": 4, "target": 5, "name": "S", "count": 1}]
+
+
+def test_top_nodes_by_degree(graph_index):
+    ids, scores, relationships = top_nodes(graph_index.topology(), 'degree', 1)
+
+    assert ids == [4]
+    assert scores == {4: 4.0}
+    assert relationships == []
@@ -0,0 +1,107 @@
+"""
+流式上传解析模块
+直接从 request.stream 增量解析 multipart/form-data 请求体，
+每个文件字段以数据块迭代器的形式交给调用方，边接收边解析 CSV，
+上传文件不会在内存中完整保存 (也不会触发 Flask 对 request.files 的整体解析)
+"""
+import io
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NEED_DATA
+
+# 每次从请求流读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadError(ValueError):
+    """上传请求格式不正确 (返回 400)"""
+
+
+class UploadPart:
+    """
+    multipart 请求中的一个字段
+    name: 字段名，filename: 文件名 (普通表单字段为 None)
+    chunks(): 按顺序产出字段内容的字节块，必须在读取下一个字段前读完 (或调用 drain())
+    """
+
+    def __init__(self, name, filename, events):
+        self.name = name
+        self.filename = filename
+        self._events = events
+        self._done = False
+
+    def chunks(self):
+        while not self._done:
+            event = next(self._events, None)
+            if not isinstance(event, Data):
+                raise UploadError("Malformed multipart body")
+            if event.data:
+                yield event.data
+            if not event.more_data:
+                self._done = True
+
+    def drain(self):
+        """丢弃字段中尚未读取的内容"""
+        for _ in self.chunks():
+            pass
+
+
+def iter_parts(stream, boundary, chunk_size=CHUNK_SIZE):
+    """按到达顺序逐个产出请求体中的字段 (UploadPart)"""
+    decoder = MultipartDecoder(boundary)
+    events = _iter_events(stream, decoder, chunk_size)
+    for event in events:
+        if isinstance(event, (Field, File)):
+            part = UploadPart(event.name, getattr(event, 'filename', None), events)
+            yield part
+            part.drain()
+
+
+def _iter_events(stream, decoder, chunk_size):
+    """从请求流中读取数据并产出解码事件，直到 multipart 结束标记"""
+    finished = False
+    while True:
+        event = decoder.next_event()
+        if event is NEED_DATA:
+            if finished:
+                raise UploadError("Unexpected end of multipart body")
+            chunk = stream.read(chunk_size)
+            decoder.receive_data(chunk or None)
+            finished = not chunk
+            continue
+        if isinstance(event, Epilogue):
+            return
+        yield event
+
+
+class _ChunkReader(io.RawIOBase):
+    """把字节块迭代器包装成可读的原始流，供 TextIOWrapper 按行解码"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            self._pending = next(self._chunks, None)
+            if self._pending is None:
+                self._pending = b''
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def open_text(chunks):
+    """以 UTF-8 文本流打开字节块迭代器 (自动去掉 Excel 写入的 BOM)"""
+    return io.TextIOWrapper(io.BufferedReader(_ChunkReader(chunks), CHUNK_SIZE),
+                            encoding='utf-8-sig', newline='')
+
+
+def tee_lines(lines, out):
+    """逐行产出文本，同时写入 out (用于一边导入一边保存上传的文件)"""
+    for line in lines:
+        out.write(line)
+        yield line
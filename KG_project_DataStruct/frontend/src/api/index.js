@@ -15,11 +15,21 @@ export default {
         return apiClient.get('/graph');
     },
 
+    // 获取图摘要 (params: view = top / labels / communities, by, k)
+    getGraphSummary(params) {
+        return apiClient.get('/graph', { params });
+    },
+
     // 搜索节点
     searchNodes(query) {
         return apiClient.get('/search', { params: { q: query } });
     },
 
+    // 获取节点的 k 跳邻域 (分页，params: depth, types, fanout, limit, after)
+    getNeighbors(id, params) {
+        return apiClient.get(`/node/${id}/neighbors`, { params });
+    },
+
     // 查找最短路径
     findPath(start, end) {
         return apiClient.get('/path', { params: { start, end } });
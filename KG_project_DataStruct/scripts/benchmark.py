@@ -0,0 +1,216 @@
+"""
+导入性能基准测试
+对每个规模生成合成数据 (generate_data.generate_synthetic)，然后依次计时:
+- POST /api/import: 上传生成的 CSV 并全量导入
+- POST /api/save:   把数据库导出为检查点 (mode=full)
+- POST /api/batch + POST /api/save: 修改 --edits 个节点后增量保存 (只写入被修改的节点)
+- POST /api/init:   从刚保存的检查点 (基础快照 + 增量段) 重新导入
+最后输出结果表 (可用 --csv 追加到文件中，便于比较不同版本的吞吐量)
+
+注意: 测试会清空目标数据库，并覆盖后端 data 目录下的 entity.csv / relation.csv 和保存的检查点，
+请只对测试环境运行，并加上 --yes 确认
+"""
+# 导入必要的库
+import argparse  # 用于解析命令行参数
+import csv       # 用于写入结果文件
+import json      # 用于解析接口返回的 JSON
+import os        # 用于路径处理
+import sys       # 用于退出程序
+import tempfile  # 用于存放生成的数据
+import time      # 用于计时
+import uuid      # 用于生成 multipart 分隔符
+import urllib.error
+import urllib.request
+
+from generate_data import count, generate_synthetic
+
+# 结果表的列: (列名, 字段)
+COLUMNS = [
+    ("nodes", "nodes"),
+    ("rels", "relationships"),
+    ("MB", "mb"),
+    ("gen s", "generate_s"),
+    ("import s", "import_s"),
+    ("import rows/s", "import_rows_s"),
+    ("save s", "save_s"),
+    ("save rows/s", "save_rows_s"),
+    ("delta save s", "delta_save_s"),
+    ("init s", "init_s"),
+    ("init rows/s", "init_rows_s"),
+]
+
+# 上传时每次读取的字节数
+CHUNK_SIZE = 1 << 20
+
+
+def multipart_body(files, boundary):
+    """
+    流式构造 multipart/form-data 请求体 (files 为 [(字段名, 文件路径)])
+    返回 (逐块产生请求体的迭代器, 请求体总长度)，上传大文件时不需要整个读入内存
+    """
+    parts = []
+    length = 0
+    for field, path in files:
+        head = (f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="{field}"; filename="{os.path.basename(path)}"\r\n'
+                f'Content-Type: text/csv\r\n\r\n').encode('utf-8')
+        parts.append((head, path))
+        length += len(head) + os.path.getsize(path) + 2
+    tail = f'--{boundary}--\r\n'.encode('utf-8')
+    length += len(tail)
+
+    def chunks():
+        for head, path in parts:
+            yield head
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            yield b'\r\n'
+        yield tail
+
+    return chunks(), length
+
+
+def post(url, body=None, headers=None, timeout=None):
+    """发送 POST 请求，返回 (耗时秒数, 响应 JSON)；非 2xx 响应时抛出 RuntimeError"""
+    request = urllib.request.Request(url, data=body if body is not None else b'', headers=headers or {},
+                                     method='POST')
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            data = response.read()
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"POST {url} failed with {e.code}: {e.read().decode('utf-8', 'replace')}") from e
+    return time.perf_counter() - start, json.loads(data or b'{}')
+
+
+def query_string(args):
+    params = []
+    if args.batch_size:
+        params.append(f"batch_size={args.batch_size}")
+    if args.workers:
+        params.append(f"workers={args.workers}")
+    return '?' + '&'.join(params) if params else ''
+
+
+def run_scale(args, nodes, data_dir):
+    """对一个规模执行生成、导入、保存、恢复，返回一行结果"""
+    print(f"[{nodes} nodes] generating...")
+    generated = generate_synthetic(nodes, os.path.join(data_dir, str(nodes)), args.degree, args.exponent,
+                                   seed=args.seed, progress=False)
+    rows = generated["nodes"] + generated["relationships"]
+    result = {
+        "nodes": generated["nodes"],
+        "relationships": generated["relationships"],
+        "mb": round(generated["bytes"] / 1e6, 1),
+        "generate_s": generated["seconds"],
+    }
+
+    print(f"[{nodes} nodes] POST /import ...")
+    boundary = uuid.uuid4().hex
+    body, length = multipart_body([('entity_file', generated["entity_file"]),
+                                   ('relation_file', generated["relation_file"])], boundary)
+    headers = {'Content-Type': f'multipart/form-data; boundary={boundary}', 'Content-Length': str(length)}
+    seconds, _ = post(f"{args.url}/import{query_string(args)}", body, headers, args.timeout)
+    result["import_s"] = round(seconds, 3)
+
+    print(f"[{nodes} nodes] POST /save ...")
+    seconds, _ = post(f"{args.url}/save?mode=full", timeout=args.timeout)
+    result["save_s"] = round(seconds, 3)
+
+    print(f"[{nodes} nodes] POST /batch ({args.edits} edits) + POST /save ...")
+    if args.edits:
+        # 修改均匀分布在各节点上 (合成数据的节点 id 为 1..nodes)
+        step = max(generated["nodes"] // args.edits, 1)
+        operations = [{"op": "set_property", "id": node_id, "key": "level", "value": 0}
+                      for node_id in range(1, generated["nodes"] + 1, step)][:args.edits]
+        post(f"{args.url}/batch", json.dumps({"operations": operations}).encode('utf-8'),
+             {'Content-Type': 'application/json'}, args.timeout)
+    seconds, _ = post(f"{args.url}/save", timeout=args.timeout)
+    result["delta_save_s"] = round(seconds, 3)
+
+    print(f"[{nodes} nodes] POST /init ...")
+    seconds, _ = post(f"{args.url}/init{query_string(args)}", timeout=args.timeout)
+    result["init_s"] = round(seconds, 3)
+
+    # 吞吐量按客户端计时 (含上传 / 传输时间) 计算
+    for step in ('import', 'save', 'init'):
+        elapsed = result[f"{step}_s"]
+        result[f"{step}_rows_s"] = round(rows / elapsed, 1) if elapsed > 0 else None
+    return result
+
+
+def print_table(results):
+    """以 Markdown 表格输出结果"""
+    header = [name for name, _ in COLUMNS]
+    body = [["" if r[key] is None else str(r[key]) for _, key in COLUMNS] for r in results]
+    widths = [max(len(row[i]) for row in [header] + body) for i in range(len(header))]
+    print("| " + " | ".join(h.ljust(w) for h, w in zip(header, widths)) + " |")
+    print("| " + " | ".join("-" * w for w in widths) + " |")
+    for row in body:
+        print("| " + " | ".join(c.rjust(w) for c, w in zip(row, widths)) + " |")
+
+
+def append_csv(path, results, args):
+    """把结果追加到 CSV 文件 (文件不存在时先写表头)，附带运行时间和参数"""
+    fields = ["timestamp", "url", "degree", "exponent", "batch_size", "workers"] + [key for _, key in COLUMNS]
+    new_file = not os.path.exists(path)
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        if new_file:
+            writer.writeheader()
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+        for r in results:
+            writer.writerow(dict(r, timestamp=timestamp, url=args.url, degree=args.degree, exponent=args.exponent,
+                                 batch_size=args.batch_size or "", workers=args.workers or ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对 /api/import、/api/save、/api/init 做多规模的导入性能测试")
+    parser.add_argument('--url', default="http://127.0.0.1:5000/api", help="后端 API 地址 (默认 http://127.0.0.1:5000/api)")
+    parser.add_argument('--scales', default="1e3,1e4,1e5",
+                        help="逗号分隔的节点数 (默认 1e3,1e4,1e5，最大可到 1e7)")
+    parser.add_argument('--degree', type=float, default=5.0, help="平均出边数 (默认 5)")
+    parser.add_argument('--exponent', type=float, default=2.5, help="度数分布的幂律指数 (默认 2.5)")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子 (默认 42)")
+    parser.add_argument('--batch-size', type=int, help="传给接口的 batch_size 参数")
+    parser.add_argument('--workers', type=int, help="传给接口的 workers 参数")
+    parser.add_argument('--edits', type=int, default=100, help="增量保存前修改的节点数 (默认 100，最多 BATCH_MAX_OPERATIONS)")
+    parser.add_argument('--timeout', type=float, default=3600, help="单个请求的超时秒数 (默认 3600)")
+    parser.add_argument('--data-dir', help="生成数据的目录 (默认使用临时目录，测试结束后删除)")
+    parser.add_argument('--csv', help="把结果追加到该 CSV 文件")
+    parser.add_argument('--yes', action='store_true', help="确认测试会清空数据库并覆盖后端的数据文件和检查点")
+    args = parser.parse_args()
+
+    try:
+        scales = [count(s) for s in args.scales.split(',') if s.strip()]
+    except (ValueError, argparse.ArgumentTypeError):
+        parser.error(f"invalid --scales: {args.scales}")
+    if not args.yes:
+        parser.error("the benchmark clears the database and overwrites the backend data files; "
+                     "run it against a test instance and pass --yes")
+    args.url = args.url.rstrip('/')
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='kg-benchmark-') as tmp:
+        data_dir = args.data_dir or tmp
+        for nodes in scales:
+            try:
+                results.append(run_scale(args, nodes, data_dir))
+            except (RuntimeError, OSError) as e:
+                print(f"[{nodes} nodes] failed: {e}", file=sys.stderr)
+                break
+
+    if results:
+        print()
+        print_table(results)
+        if args.csv:
+            append_csv(args.csv, results, args)
+    return 0 if len(results) == len(scales) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
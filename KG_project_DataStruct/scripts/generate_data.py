@@ -2,7 +2,10 @@
 import csv   # 用于读写 CSV 文件
 import os    # 用于操作系统相关功能，如路径处理
 import json  # 用于处理 JSON 数据格式
-import random # 用于生成随机数（虽然本脚本暂未使用，但常用于数据生成）
+import math  # 用于求最大公约数
+import random # 用于生成随机数（合成数据）
+import argparse  # 用于解析命令行参数
+import time  # 用于统计生成耗时
 
 # 定义文件路径
 # __file__ 表示当前脚本文件的路径
@@ -112,5 +115,176 @@ def generate_data():
     print(f"Relationships generated: {len(relationships)}")
     print("Done.")
 
+
+# ---------- 合成数据 (规模测试用) ----------
+# 不带参数运行时生成上面的手写数据；指定 --nodes 时生成规模可调的合成图，
+# 格式与手写数据相同 (id,name,labels,properties / source_id,target_id,type,properties)，
+# 逐行写入磁盘，内存占用与规模无关，可生成 10^3 到 10^7 个节点
+
+SYNTHETIC_DIR = os.path.join(DATA_DIR, 'synthetic')
+
+# 合成数据的关系类型及其出现权重
+SYNTHETIC_REL_TYPES = ['包含', '属于', '依赖', '相关', '实现', '应用于']
+SYNTHETIC_REL_WEIGHTS = [30, 25, 15, 15, 10, 5]
+
+# 属性中 description 文本的取材
+SYNTHETIC_TEXT = "数据结构与算法知识图谱节点描述线性表栈队列树图排序查找哈希堆递归动态规划贪心分治回溯复杂度" * 4
+
+# 每次写入的行数
+WRITE_BATCH = 10000
+
+
+def power_law_sampler(n, exponent, rng):
+    """
+    返回一个函数，每次调用按幂律权重抽取一个节点序号 (0..n-1)，序号越小被抽中的概率越大
+    第 i 个节点的权重为 (i+1)^(-a)，a = 1/(exponent-1)，按权重抽取端点时节点度数近似服从指数为 exponent 的幂律分布
+    用权重累积分布的积分近似求逆，每次抽样 O(1)，不需要保存 n 个权重
+    """
+    a = 1.0 / (exponent - 1.0)
+    b = 1.0 - a
+    total = ((n + 1) ** b - 1.0) / b
+    inverse = 1.0 / b
+    random_ = rng.random
+
+    def sample():
+        return min(int((random_() * total * b + 1.0) ** inverse - 1.0), n - 1)
+
+    return sample
+
+
+def id_permutation(n):
+    """
+    返回把序号 (0..n-1) 打散为节点 id (1..n) 的双射
+    高权重节点因此不会集中在最小的几个 id 上 (乘以一个与 n 互素的数再取模)
+    乘数取接近 n * 0.618 (黄金分割) 的数，相邻序号映射到的 id 相距约 0.382n，在整个 id 区间上分布均匀；
+    固定的大乘数对 n 取模后可能很小 (如 1000003 % 1000 == 3)，高权重节点仍会挤在小 id 附近
+    """
+    step = max(1, round(n * 0.6180339887))
+    while math.gcd(step, n) != 1:
+        step += 1
+    return lambda rank: rank * step % n + 1
+
+
+def generate_synthetic(nodes, output_dir=SYNTHETIC_DIR, avg_degree=5.0, exponent=2.5,
+                       label_count=12, payload=32, seed=42, progress=True):
+    """
+    生成合成图并写入 output_dir/entity.csv 与 output_dir/relation.csv
+    - nodes: 节点数
+    - avg_degree: 平均每个节点的出边数 (关系数 = nodes * avg_degree)
+    - exponent: 度数分布的幂律指数 (须大于 2，越小度数越集中在少数中心节点)
+    - label_count: 标签池大小，每个节点有一个主标签 (同样按幂律分布) 和 0-2 个附加标签
+    - payload: 每个节点 description 属性的字符数
+    - seed: 随机种子，相同参数生成相同的文件
+    允许重复关系 (同一对节点之间可能有多条关系)，不生成自环
+    返回生成结果的统计信息
+    """
+    if nodes < 2:
+        raise ValueError("nodes must be at least 2")
+    if exponent <= 2:
+        raise ValueError("exponent must be greater than 2")
+    if label_count < 1:
+        raise ValueError("label_count must be at least 1")
+    if payload < 0:
+        raise ValueError("payload must not be negative")
+
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    entity_file = os.path.join(output_dir, 'entity.csv')
+    relation_file = os.path.join(output_dir, 'relation.csv')
+    node_id = id_permutation(nodes)
+    labels = [f"类别{i:02d}" for i in range(1, label_count + 1)]
+    pick_label = power_law_sampler(label_count, 2.5, rng)
+    start = time.perf_counter()
+
+    # 1. 生成实体：按 id 顺序写出，标签与属性随机生成
+    with open(entity_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'name', 'labels', 'properties'])
+        rows = []
+        for i in range(1, nodes + 1):
+            node_labels = [labels[pick_label()]]
+            for _ in range(rng.choices((0, 1, 2), (6, 3, 1))[0]):
+                extra = labels[rng.randrange(label_count)]
+                if extra not in node_labels:
+                    node_labels.append(extra)
+            offset = rng.randrange(len(SYNTHETIC_TEXT) - payload) if payload < len(SYNTHETIC_TEXT) else 0
+            props = {
+                "description": SYNTHETIC_TEXT[offset:offset + payload],
+                "score": round(rng.random(), 4),
+                "level": rng.randint(1, 5),
+            }
+            rows.append([i, f"实体{i}", "|".join(node_labels), json.dumps(props, ensure_ascii=False)])
+            if len(rows) >= WRITE_BATCH:
+                writer.writerows(rows)
+                rows.clear()
+        writer.writerows(rows)
+    if progress:
+        print(f"Entities generated: {nodes}")
+
+    # 2. 生成关系：起点和终点都按幂律权重抽取，出度与入度都是长尾分布
+    relationships = int(nodes * avg_degree)
+    pick_node = power_law_sampler(nodes, exponent, rng)
+    rel_types = rng.choices(SYNTHETIC_REL_TYPES, SYNTHETIC_REL_WEIGHTS, k=1024)
+    with open(relation_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['source_id', 'target_id', 'type', 'properties'])
+        rows = []
+        for k in range(relationships):
+            source, target = pick_node(), pick_node()
+            while target == source:
+                target = pick_node()
+            props = '{"weight": %.3f}' % rng.random()
+            rows.append([node_id(source), node_id(target), rel_types[k & 1023], props])
+            if len(rows) >= WRITE_BATCH:
+                writer.writerows(rows)
+                rows.clear()
+                if progress and (k + 1) % (WRITE_BATCH * 100) == 0:
+                    print(f"  relationships: {k + 1}/{relationships}")
+        writer.writerows(rows)
+    if progress:
+        print(f"Relationships generated: {relationships}")
+
+    return {
+        "nodes": nodes,
+        "relationships": relationships,
+        "entity_file": entity_file,
+        "relation_file": relation_file,
+        "bytes": os.path.getsize(entity_file) + os.path.getsize(relation_file),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def count(value):
+    """解析数量参数，支持 1e6 这样的写法"""
+    number = float(value)
+    if number != int(number) or number < 0:
+        raise argparse.ArgumentTypeError(f"invalid count: {value}")
+    return int(number)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成知识图谱 CSV 数据 (不带参数时生成手写的示例数据)")
+    parser.add_argument('--nodes', type=count, help="生成合成数据的节点数，如 1e5")
+    parser.add_argument('--degree', type=float, default=5.0, help="平均出边数 (默认 5)")
+    parser.add_argument('--exponent', type=float, default=2.5, help="度数分布的幂律指数，须大于 2 (默认 2.5)")
+    parser.add_argument('--labels', type=int, default=12, help="标签池大小 (默认 12)")
+    parser.add_argument('--payload', type=int, default=32, help="每个节点 description 属性的字符数 (默认 32)")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子 (默认 42)")
+    parser.add_argument('--output', default=SYNTHETIC_DIR, help="合成数据的输出目录 (默认 data/synthetic)")
+    args = parser.parse_args()
+
+    if args.nodes is None:
+        generate_data()
+        return
+    print("Generating synthetic data...")
+    try:
+        result = generate_synthetic(args.nodes, args.output, args.degree, args.exponent,
+                                    args.labels, args.payload, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Written to {args.output} ({result['bytes'] / 1e6:.1f} MB, {result['seconds']} s)")
+    print("Done.")
+
+
 if __name__ == '__main__':
-    generate_data()
+    main()